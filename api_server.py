@@ -3,19 +3,37 @@ AskDB AI - Simplified Backend API Server
 Provides REST API endpoints for direct SQL execution (Query Builder)
 """
 
-from flask import Flask, request, jsonify
+from lazy_loader import lazy_import, mark_ready, startup_report, log_startup_report
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import pymysql
 import os
+import sys
 from dotenv import load_dotenv
 import time
+import functools
+import metrics
+from structured_log import get_logger, new_request_id, request_id_var, should_sample, log_fields, logging_stats
+from db_pool import get_pool, pool_stats, PoolTimeout
+from db_router import get_router, statement_timeout
+from schema_cache import get_schema_cache
+from question_cache import get_question_cache, question_cache_stats
+from result_cache import ResultCache
+from pagination import paginate_sql, next_cursor
+from llm_gateway import get_llm_gateway, LLMError
+from nl_pipeline import (Pipeline, PipelineError, QuestionCacheLookup, SchemaStage, PromptStage,
+                         LLMStage, SanitizeStage, RouteStage, GuardStage, ExecuteStage, FormatStage,
+                         RememberStage, MAX_RESULT_ROWS, STREAM_CHUNK_ROWS, clean_generated_sql,
+                         fetch_rows as pipeline_fetch_rows)
+from result_format import format_nl_answer, nl_answer_chunks
+from sql_guard import QueryRejected, check_statement, guard as guard_sql
 
-# Import LangChain helper for AI queries
-try:
-    from langchain_helper import get_few_shot_db_chain
-    LANGCHAIN_AVAILABLE = True
-except ImportError:
-    LANGCHAIN_AVAILABLE = False
+# LangChain helper for AI queries. It pulls in torch, sentence-transformers and
+# FAISS, so it is imported on first use (or in the background with
+# AI_WARMUP=background) instead of on the worker's import path.
+ai_helper = lazy_import('langchain_helper', requires=('langchain_community', 'faiss'))
+LANGCHAIN_AVAILABLE = ai_helper.available()
+if not LANGCHAIN_AVAILABLE:
     print("⚠️  LangChain not available - AI queries will be disabled")
 
 # Load environment variables
@@ -24,6 +42,9 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
+# Structured, queue-backed request logging (see structured_log.py)
+log = get_logger('api')
+
 # Database configuration
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
@@ -33,20 +54,273 @@ DB_CONFIG = {
     'database': os.getenv('DB_NAME', 'atliq_tshirts'),
 }
 
+# Read-only traffic goes to the DB_REPLICAS read replicas when configured,
+# the primary otherwise (see db_router.py)
+read_router = get_router(DB_CONFIG)
+
+# Query Builder result cache, invalidated via the schema cache's per-table
+# CREATE_TIME/UPDATE_TIME (RESULT_CACHE_BACKEND=sqlite shares it across workers).
+# Versions older than RESULT_CACHE_MAX_STALENESS seconds are re-read before a
+# hit is served, so a result can outlive a write to its tables by at most that.
+RESULT_CACHE_MAX_STALENESS = float(os.getenv('RESULT_CACHE_MAX_STALENESS', 1))
+result_cache = ResultCache(
+    lambda: get_schema_cache(DB_CONFIG).table_versions(max_age=RESULT_CACHE_MAX_STALENESS))
+
 def get_db_connection():
-    """Create database connection"""
-    return pymysql.connect(**DB_CONFIG)
+    """Check out a pooled database connection (use as a context manager)"""
+    return get_pool(DB_CONFIG).connection()
+
+def _loaded_embeddings():
+    """Few-shot embeddings already in this process, or None: those of a built
+    chain, else a model the gunicorn master preloaded (EMBEDDING_PRELOAD).
+    Never loads the model or imports the AI stack."""
+    if ai_helper.loaded:
+        return ai_helper.get_loaded_embeddings()
+    # Preloading imported embedding_service in the master; no import here
+    service = sys.modules.get('embedding_service')
+    return service.loaded_embeddings() if service is not None else None
+
+def _question_embedder():
+    """embed_query of the loaded few-shot embeddings, or None.
+
+    Without it the question cache only does exact (normalized) matches; we
+    never load the embedding model just for the cache.
+    """
+    embeddings = _loaded_embeddings()
+    return embeddings.embed_query if embeddings is not None else None
+
+def _question_batch_embedder():
+    """embed_documents of the loaded few-shot embeddings (one call per batch), or None"""
+    embeddings = _loaded_embeddings()
+    return embeddings.embed_documents if embeddings is not None else None
+
+def fetch_rows(sql, max_rows=MAX_RESULT_ROWS, db_config=None):
+    """Execute SQL on db_config (default DB_CONFIG); returns (rows, truncated).
+    See nl_pipeline.fetch_rows."""
+    return pipeline_fetch_rows(db_config or DB_CONFIG, sql, max_rows)
 
 def execute_sql_query(sql):
     """Execute SQL query and return results"""
-    connection = get_db_connection()
+    results, _ = fetch_rows(sql)
+    return results
+
+def stream_sql_query(sql, output_format, max_rows=MAX_RESULT_ROWS, db_config=None):
+    """Execute SQL and return a generator streaming its rows.
+
+    The statement runs before the generator is returned so SQL errors still
+    surface as a normal error response. output_format is 'ndjson' (one JSON
+    object per line: columns, rows, then an end record) or 'json' (a single
+    document shaped like the buffered /api/execute-sql response). Memory is
+    bounded by STREAM_CHUNK_ROWS regardless of result size. db_config
+    defaults to DB_CONFIG.
+    """
+    start_time = time.time()
+    pool = get_pool(db_config or DB_CONFIG)
+    connection = pool.acquire()
+    try:
+        cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+        cursor.execute(sql)
+    except pymysql.err.ProgrammingError:
+        pool.release(connection)
+        raise
+    except Exception:
+        pool.release(connection, discard=True)
+        raise
+
+    encode = app.json.dumps
+
+    def generate():
+        count = 0
+        complete = False
+        try:
+            columns = [col[0] for col in cursor.description or []]
+            if output_format == 'ndjson':
+                yield encode({'type': 'columns', 'columns': columns}) + '\n'
+            else:
+                yield '{"columns":' + encode(columns) + ',"results":['
+            while count < max_rows:
+                batch = cursor.fetchmany(min(STREAM_CHUNK_ROWS, max_rows - count))
+                if not batch:
+                    complete = True
+                    break
+                if output_format == 'ndjson':
+                    yield ''.join(encode({'type': 'row', 'data': row}) + '\n' for row in batch)
+                else:
+                    yield (',' if count else '') + ','.join(encode(row) for row in batch)
+                count += len(batch)
+            else:
+                complete = cursor.fetchone() is None
+
+            trailer = {
+                'row_count': count,
+                'truncated': not complete,
+                'execution_time': int((time.time() - start_time) * 1000)
+            }
+            if output_format == 'ndjson':
+                yield encode(dict(type='end', **trailer)) + '\n'
+            else:
+                yield '],' + encode(trailer)[1:]
+        finally:
+            if complete:
+                cursor.close()
+            pool.release(connection, discard=not complete)
+
+    return generate()
+
+# ----------------------------------------------------------------------------
+# NL -> SQL pipeline (also run by asgi_server.py, with async LLM and SQL stages)
+# ----------------------------------------------------------------------------
+NL_MODEL = "llama-3.3-70b-versatile"
+
+def build_nl_prompt(schema, question):
+    """Prompt asking the LLM for a single SELECT over t_shirts"""
+    schema_text = "Database: atliq_tshirts\\nTable: t_shirts\\nColumns:\\n"
+    for col in schema:
+        schema_text += f"- {col[0]} ({col[1]})\\n"
+    
+    return f"""You are a MySQL expert. Given a database schema and a question, generate a SQL query and execute it.
+
+{schema_text}
+
+Question: {question}
+
+Generate ONLY a valid MySQL SELECT query. Do not include any explanation, just the SQL query."""
+
+def _learn_example(question, sql_query, answer):
+    """Feed the few-shot example store, but only once the AI stack is loaded"""
+    if ai_helper.loaded:
+        ai_helper.learn_example(question, sql_query, answer)
+
+# /api/query: single-table schema prompt, no few-shot retrieval
+nl_query_pipeline = Pipeline([
+    QuestionCacheLookup(DB_CONFIG['database'], embedder=_question_embedder,
+                        batch_embedder=_question_batch_embedder),
+    SchemaStage(lambda ctx: get_schema_cache(DB_CONFIG).columns('t_shirts')),
+    PromptStage(lambda ctx: build_nl_prompt(ctx.schema, ctx.question)),
+    LLMStage(get_llm_gateway, NL_MODEL, temperature=0.2, max_tokens=200),
+    SanitizeStage(),
+    RouteStage(read_router),
+    GuardStage(DB_CONFIG, MAX_RESULT_ROWS, max_execution_ms=statement_timeout('query')),
+    ExecuteStage(DB_CONFIG, MAX_RESULT_ROWS),
+    FormatStage(format_nl_answer, chunks=nl_answer_chunks),
+    RememberStage(DB_CONFIG['database'], learn=_learn_example),
+])
+
+# Server-sent events for "stream": true on /api/query (shared with asgi_server.py)
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+
+def nl_answer_events(question, use_cache=True):
+    """SSE text for one question as nl_query_pipeline.stream() produces it.
+
+    Events: token (LLM output as generated), sql, guard, columns, rows (a
+    chunk at a time, every row up to MAX_RESULT_ROWS), answer (text pieces),
+    then done with the timings, or error. The HTTP status is already sent by
+    then, so failures carry their status in the error event.
+    """
     try:
-        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
-            cursor.execute(sql)
-            results = cursor.fetchall()
-            return results
-    finally:
-        connection.close()
+        for event, data in nl_query_pipeline.stream(question, use_cache=use_cache):
+            if event in ('token', 'answer'):
+                yield _sse(event, {'text': data})
+            elif event == 'sql':
+                yield _sse(event, {'sql': data})
+            elif event == 'guard':
+                yield _sse(event, data)
+            elif event == 'columns':
+                yield _sse(event, {'columns': [name for name, _ in data or []]})
+            elif event == 'rows':
+                yield _sse(event, {'rows': data})
+            elif event == 'done':
+                yield _sse(event, {
+                    'sql': data.sql,
+                    'execution_time': int(data.timings['total']),
+                    'timings': data.timings,
+                    'query': question,
+                    'cache': data.cache_tier or 'miss',
+                    'row_count': len(data.rows),
+                    'truncated': data.truncated,
+                })
+    except Exception as e:
+        message, status = _nl_error_message(e)
+        failed = getattr(e, 'query_context', None)
+        # track_query logged the request at its first byte; log the failure too
+        log.warning('streamed query failed', extra=log_fields(endpoint='nl', status=status, query=question,
+                                                               stage=getattr(failed, 'failed_stage', None),
+                                                               error=str(e)))
+        yield _sse('error', {'error': message, 'status': status,
+                             'stage': failed.failed_stage if failed is not None else None,
+                             'guard': failed.guard if failed is not None else None})
+
+# ============================================================================
+# INSTRUMENTATION
+# ============================================================================
+
+@app.before_request
+def assign_request_id():
+    g.request_id = new_request_id(request.headers.get('X-Request-ID'))
+    g.request_id_token = request_id_var.set(g.request_id)
+
+@app.after_request
+def add_request_id_header(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.teardown_request
+def clear_request_id(exc=None):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        request_id_var.reset(token)
+
+def client_address():
+    forwarded = request.headers.get('X-Forwarded-For', '')
+    return forwarded.split(',')[0].strip() or request.remote_addr
+
+def track_query(endpoint):
+    """Time a query endpoint and log it to metrics, the recent-queries buffer
+    and the request log (errors always, successes at the endpoint's sample rate).
+
+    Views fill in g.query_log (query, rows, cache, error). Streamed responses
+    are timed to the first byte.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            g.query_log = {}
+            start = time.perf_counter()
+            response = app.make_response(view(*args, **kwargs))
+            elapsed = time.perf_counter() - start
+            query_log = g.query_log
+            status = 'success' if response.status_code < 400 else 'error'
+            metrics.record_query(
+                endpoint,
+                query_log.get('query', ''),
+                status,
+                elapsed,
+                rows=query_log.get('rows', 0),
+                cache=query_log.get('cache'),
+                client=client_address(),
+                error=query_log.get('error'),
+            )
+            if status == 'error' or should_sample(endpoint):
+                fields = log_fields(endpoint=endpoint, status=response.status_code,
+                                    duration_ms=round(elapsed * 1000, 1), **query_log)
+                if status == 'error':
+                    log.warning('query failed', extra=fields)
+                else:
+                    log.info('query', extra=fields)
+            return response
+        return wrapper
+    return decorator
+
+def timed_jsonify(payload):
+    """jsonify, recording the time spent serializing the result"""
+    start = time.perf_counter()
+    response = jsonify(payload)
+    metrics.observe_stage('serialize', time.perf_counter() - start)
+    return response
 
 # ============================================================================
 # API ENDPOINTS
@@ -61,194 +335,272 @@ def health_check():
 # Direct SQL Execution (for Query Builder)
 # ----------------------------------------------------------------------------
 @app.route('/api/execute-sql', methods=['POST'])
+@track_query('sql')
 def execute_sql():
     """Execute raw SQL query directly"""
     try:
-        print("=" * 60)
-        print("📥 Received SQL execution request")
-        print(f"Content-Type: {request.content_type}")
-        print(f"Request data: {request.data}")
-        
         data = request.json
-        print(f"Parsed JSON: {data}")
-        
         if data is None:
-            print("❌ ERROR: request.json is None")
             return jsonify({'error': 'Invalid JSON in request body'}), 400
         
         sql = data.get('sql', '')
-        print(f"SQL Query: {sql}")
+        g.query_log['query'] = sql
         
         if not sql:
-            print("❌ ERROR: SQL query is empty")
             return jsonify({'error': 'SQL query is required'}), 400
         
-        # Security: Only allow SELECT queries
-        sql_upper = sql.strip().upper()
-        if not sql_upper.startswith('SELECT'):
-            print(f"❌ ERROR: Non-SELECT query blocked: {sql_upper[:50]}")
-            return jsonify({'error': 'Only SELECT queries are allowed'}), 403
+        # Security: one read-only SELECT only
+        try:
+            check_statement(sql)
+        except ValueError as e:
+            g.query_log['error'] = 'non-SELECT query blocked'
+            return jsonify({'error': str(e)}), 403
+        
+        # A read replica when configured; per-route statement timeout
+        db_config = read_router.read_config()
+        timeout_ms = statement_timeout('execute-sql')
         
-        # Execute query
-        print("✅ Executing query...")
+        # Streaming mode: rows are written as they arrive from MySQL
+        stream = data.get('stream')
+        if stream:
+            output_format = 'ndjson' if stream == 'ndjson' else 'json'
+            sql, decision = guard_sql(db_config, sql, limit=MAX_RESULT_ROWS + 1, max_execution_ms=timeout_ms)
+            rows = read_router.run(lambda config: stream_sql_query(sql, output_format, db_config=config), db_config)
+            g.query_log['cache'] = 'stream'
+            mimetype = 'application/x-ndjson' if output_format == 'ndjson' else 'application/json'
+            return Response(stream_with_context(rows), mimetype=mimetype,
+                            headers={'X-SQL-Guard': app.json.dumps(decision)})
+        
+        # Pagination: page_size plus the opaque cursor from the previous page;
+        # order_by switches from offset to keyset paging
+        page_size = data.get('page_size')
+        page_state = None
+        if page_size:
+            page_size = min(int(page_size), MAX_RESULT_ROWS)
+            order_by = data.get('order_by')
+            sql, page_state = paginate_sql(sql, page_size, data.get('cursor'), order_by)
+        
+        # Cost guard on the statement that will run: LIMIT, MAX_EXECUTION_TIME,
+        # EXPLAIN estimate against the budget
+        sql, decision = guard_sql(db_config, sql, limit=MAX_RESULT_ROWS + 1, max_execution_ms=timeout_ms)
+        
+        # Serve identical SELECTs from the result cache unless "cache": false
         start_time = time.time()
-        results = execute_sql_query(sql)
+        use_cache = data.get('cache', True) is not False
+        cached = result_cache.get(sql) if use_cache else None
+        if cached is not None:
+            results, saved_ms = cached
+            truncated = False
+            cache_status = 'hit'
+        else:
+            # Execute query, remembering which server answered (failover may
+            # move it from a replica to the primary)
+            served_by = []
+            def read(config):
+                served_by.append(config)
+                return fetch_rows(sql, db_config=config)
+            results, truncated = read_router.run(read, db_config)
+            metrics.observe_stage('execute', time.time() - start_time)
+            saved_ms = 0
+            cache_status = 'miss' if use_cache else 'bypass'
+            # Entries carry the primary's table versions: store only what the
+            # primary returned, never a possibly lagging replica's rows
+            if use_cache and not truncated and read_router.is_primary(served_by[-1]):
+                result_cache.put(sql, results, int((time.time() - start_time) * 1000))
         execution_time = int((time.time() - start_time) * 1000)
+        metrics.record_cache('result', cache_status)
+        g.query_log.update(rows=len(results), cache=cache_status)
         
-        print(f"✅ Query executed successfully! {len(results)} rows returned in {execution_time}ms")
-        print("=" * 60)
-        
-        return jsonify({
+        response = {
             'results': results,
             'execution_time': execution_time,
-            'row_count': len(results)
-        })
+            'row_count': len(results),
+            'truncated': truncated,
+            'cache': cache_status,
+            'saved_ms': saved_ms,
+            'guard': decision
+        }
+        if cache_status == 'hit':
+            # Writes newer than this may not be reflected yet
+            response['max_staleness_s'] = RESULT_CACHE_MAX_STALENESS
+        if page_state is not None:
+            results, cursor = next_cursor(results, page_size, page_state, order_by)
+            response.update(results=results, row_count=len(results), page_size=page_size, next_cursor=cursor)
+        return timed_jsonify(response)
     
+    except QueryRejected as e:
+        metrics.record_error('sql', 'guard')
+        g.query_log['error'] = str(e)
+        return jsonify({'error': str(e), 'guard': e.decision}), e.status
+    except PoolTimeout as e:
+        metrics.record_error('sql', 'pool')
+        g.query_log['error'] = str(e)
+        return jsonify({'error': str(e)}), 503
     except pymysql.Error as e:
-        print(f"❌ Database error: {str(e)}")
-        print("=" * 60)
+        metrics.record_error('sql', 'execute')
+        g.query_log['error'] = str(e)
         return jsonify({'error': f'Database error: {str(e)}'}), 400
+    except ValueError as e:
+        g.query_log['error'] = str(e)
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        print(f"❌ Unexpected error: {str(e)}")
-        print("=" * 60)
+        log.exception('unexpected error in /api/execute-sql')
+        g.query_log['error'] = str(e)
         return jsonify({'error': str(e)}), 500
 
 # ----------------------------------------------------------------------------
 # Natural Language Query (AI-powered)
 # ----------------------------------------------------------------------------
+QUERY_BATCH_MAX = int(os.getenv('QUERY_BATCH_MAX', 50))
+
+def _nl_error_message(error):
+    if isinstance(error, PipelineError):
+        return str(error), error.status
+    if isinstance(error, LLMError):
+        return f'Groq API error: {str(error)}', 503 if error.status == 503 else 500
+    return f'AI processing failed: {str(error)}', 500
+
+def nl_error_response(error):
+    """(body, status) for a failed /api/query run (shared with asgi_server.py)"""
+    message, status = _nl_error_message(error)
+    failed = getattr(error, 'query_context', None)
+    if failed is not None and failed.guard is not None:
+        # Cost guard rejections say what was estimated and why
+        return {'error': message, 'sql': failed.sql, 'guard': failed.guard}, status
+    return {'error': message}, status
+
+def nl_answer_response(ctx):
+    """/api/query body for a finished QueryContext (shared with asgi_server.py)"""
+    return {
+        'answer': ctx.answer,
+        'sql': ctx.sql,
+        'execution_time': int(ctx.timings['total']),
+        'timings': ctx.timings,
+        'query': ctx.question,
+        'cache': ctx.cache_tier or 'miss',
+        'guard': ctx.guard,
+        'truncated': ctx.truncated,
+        'results': ctx.rows[:10]  # Include first 10 results
+    }
+
 @app.route('/api/query', methods=['POST'])
+@track_query('nl')
 def process_natural_language_query():
     """Process natural language query using AI"""
     try:
-        print("=" * 60)
-        print("🤖 Received natural language query")
-        
         data = request.json
         if data is None:
             return jsonify({'error': 'Invalid JSON in request body'}), 400
         
         question = data.get('query', '')
-        print(f"Question: {question}")
+        g.query_log['query'] = question
         
         if not question:
             return jsonify({'error': 'Query is required'}), 400
         
-        # Use direct Groq API call
-        import requests as req
+        # Question cache → schema → prompt → Groq → execute → format.
+        # Clients pass "cache": false to force a fresh LLM call.
+        use_cache = data.get('cache', True) is not False
         
-        groq_api_key = os.getenv("GROQ_API_KEY")
-        if not groq_api_key:
-            return jsonify({'error': 'Groq API key not configured'}), 503
+        # "stream": true - server-sent events from the first LLM token on
+        if data.get('stream') or 'text/event-stream' in request.headers.get('Accept', ''):
+            g.query_log['cache'] = 'stream'
+            return Response(stream_with_context(nl_answer_events(question, use_cache)),
+                            mimetype='text/event-stream', headers=SSE_HEADERS)
+        try:
+            ctx = nl_query_pipeline.run(question, use_cache=use_cache)
+        except (PipelineError, LLMError) as e:
+            g.query_log['error'] = str(e)
+            body, status = nl_error_response(e)
+            return jsonify(body), status
+        g.query_log.update(rows=len(ctx.rows), cache=ctx.cache_tier or 'miss', sql=ctx.sql, timings=ctx.timings)
         
-        # Get database schema
-        connection = get_db_connection()
-        with connection.cursor() as cursor:
-            cursor.execute("SHOW TABLES")
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            # Get schema for t_shirts table
-            cursor.execute("DESCRIBE t_shirts")
-            schema = cursor.fetchall()
-        connection.close()
-        
-        schema_text = "Database: atliq_tshirts\\nTable: t_shirts\\nColumns:\\n"
-        for col in schema:
-            schema_text += f"- {col[0]} ({col[1]})\\n"
-        
-        # Create prompt for Groq
-        prompt = f"""You are a MySQL expert. Given a database schema and a question, generate a SQL query and execute it.
-
-{schema_text}
+        return timed_jsonify(nl_answer_response(ctx))
+    
+    except Exception as e:
+        log.exception('AI query failed')
+        g.query_log['error'] = str(e)
+        return jsonify({'error': f'AI processing failed: {str(e)}'}), 500
 
-Question: {question}
+@app.route('/api/query/batch', methods=['POST'])
+@track_query('batch')
+def process_natural_language_batch():
+    """Answer several questions in one request.
 
-Generate ONLY a valid MySQL SELECT query. Do not include any explanation, just the SQL query."""
-        
-        # Call Groq API
-        print("🔗 Calling Groq API...")
-        start_time = time.time()
-        
-        groq_response = req.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {groq_api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": "llama-3.3-70b-versatile",
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.2,
-                "max_tokens": 200
-            },
-            timeout=30
-        )
-        
-        if groq_response.status_code != 200:
-            return jsonify({'error': f'Groq API error: {groq_response.text}'}), 500
-        
-        sql_query = groq_response.json()['choices'][0]['message']['content'].strip()
-        # Remove markdown code blocks if present
-        sql_query = sql_query.replace('```sql', '').replace('```', '').strip()
-        
-        print(f"Generated SQL: {sql_query}")
+    The schema context is built once, question-cache embeddings are computed
+    in one call, and LLM calls and SQL execution run concurrently (bounded by
+    QUERY_BATCH_CONCURRENCY and the LLM gateway's own limit). Each question
+    succeeds or fails on its own.
+    """
+    try:
+        data = request.json
+        if data is None:
+            return jsonify({'error': 'Invalid JSON in request body'}), 400
         
-        # Execute the SQL
-        results = execute_sql_query(sql_query)
-        execution_time = int((time.time() - start_time) * 1000)
+        questions = data.get('queries')
+        if not isinstance(questions, list) or not questions:
+            return jsonify({'error': 'queries must be a non-empty list of questions'}), 400
+        if len(questions) > QUERY_BATCH_MAX:
+            return jsonify({'error': f'At most {QUERY_BATCH_MAX} questions per batch'}), 400
+        if not all(isinstance(q, str) and q.strip() for q in questions):
+            return jsonify({'error': 'Every query must be a non-empty string'}), 400
+        g.query_log['query'] = f'[batch of {len(questions)}] {questions[0]}'
         
-        # Format the answer
-        if len(results) == 0:
-            answer = "No results found."
-        elif len(results) == 1 and len(results[0]) == 1:
-            # Single value result
-            answer = f"The answer is: {list(results[0].values())[0]}"
-        else:
-            # Multiple results - format as text
-            answer = f"Found {len(results)} results:\\n"
-            for i, row in enumerate(results[:5], 1):
-                answer += f"{i}. {', '.join([f'{k}: {v}' for k, v in row.items()])}\\n"
-            if len(results) > 5:
-                answer += f"... and {len(results) - 5} more"
+        start_time = time.perf_counter()
+        contexts = nl_query_pipeline.run_batch(questions, use_cache=data.get('cache', True) is not False)
         
-        print(f"✅ Query executed successfully in {execution_time}ms")
-        print(f"Answer: {answer[:200]}...")
-        print("=" * 60)
+        answers = []
+        for ctx in contexts:
+            if ctx.error is not None:
+                message, status = _nl_error_message(ctx.error)
+                answers.append({'query': ctx.question, 'error': message, 'status': status,
+                                'stage': ctx.failed_stage, 'guard': ctx.guard, 'timings': ctx.timings})
+                continue
+            answers.append({
+                'query': ctx.question,
+                'answer': ctx.answer,
+                'sql': ctx.sql,
+                'cache': ctx.cache_tier or 'miss',
+                'guard': ctx.guard,
+                'timings': ctx.timings,
+                'results': ctx.rows[:10],
+                'status': 200,
+            })
+        failed = sum(1 for a in answers if a['status'] != 200)
+        g.query_log.update(rows=sum(len(ctx.rows or []) for ctx in contexts), failed=failed)
         
-        return jsonify({
-            'answer': answer,
-            'sql': sql_query,
-            'execution_time': execution_time,
-            'query': question,
-            'results': results[:10]  # Include first 10 results
+        return timed_jsonify({
+            'results': answers,
+            'count': len(answers),
+            'failed': failed,
+            'execution_time': int((time.perf_counter() - start_time) * 1000),
         })
     
     except Exception as e:
-        print(f"❌ AI Query Error: {str(e)}")
-        print("=" * 60)
-        import traceback
-        traceback.print_exc()
+        log.exception('AI batch query failed')
+        g.query_log['error'] = str(e)
         return jsonify({'error': f'AI processing failed: {str(e)}'}), 500
 
 # ----------------------------------------------------------------------------
 # Database Info
 # ----------------------------------------------------------------------------
+def _total_rows(db_config):
+    """Estimated rows across the database's tables, under the metadata timeout"""
+    with get_pool(db_config).connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT /*+ MAX_EXECUTION_TIME({statement_timeout('metadata')}) */ SUM(TABLE_ROWS) "
+                           f"FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s", (db_config['database'],))
+            result = cursor.fetchone()
+            return result[0] if result and result[0] else 0
+
 @app.route('/api/database/info', methods=['GET'])
 def get_database_info():
     """Get database information"""
     try:
-        connection = get_db_connection()
-        with connection.cursor() as cursor:
-            # Get table count
-            cursor.execute("SHOW TABLES")
-            tables = cursor.fetchall()
-            table_count = len(tables)
-            
-            # Get total row count
-            cursor.execute(f"SELECT SUM(TABLE_ROWS) as total FROM information_schema.TABLES WHERE TABLE_SCHEMA = '{DB_CONFIG['database']}'")
-            result = cursor.fetchone()
-            total_rows = result[0] if result and result[0] else 0
-            
-        connection.close()
+        # Get table count
+        table_count = len(get_schema_cache(DB_CONFIG).tables())
+        
+        total_rows = read_router.run(_total_rows)
         
         return jsonify({
             'tables': table_count,
@@ -263,11 +615,7 @@ def get_database_info():
 def get_tables():
     """Get list of database tables"""
     try:
-        connection = get_db_connection()
-        with connection.cursor() as cursor:
-            cursor.execute("SHOW TABLES")
-            tables = [row[0] for row in cursor.fetchall()]
-        connection.close()
+        tables = get_schema_cache(DB_CONFIG).tables()
         
         return jsonify({'tables': tables})
     
@@ -275,35 +623,132 @@ def get_tables():
         return jsonify({'error': str(e)}), 500
 
 # ----------------------------------------------------------------------------
-# Metrics (Mock data for now)
+# Metrics (this worker, see metrics.py)
 # ----------------------------------------------------------------------------
+def _format_duration(seconds):
+    minutes, _ = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+def _format_ms(ms):
+    return f"{ms}ms" if ms < 1000 else f"{ms / 1000:.1f}s"
+
+def _recent_window(seconds):
+    cutoff = time.time() - seconds
+    return [q for q in metrics.recent_queries(metrics.RECENT_QUERIES) if q['timestamp'] >= cutoff]
+
+@app.route('/api/metrics', methods=['GET'])
+def get_prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/metrics/queries', methods=['GET'])
 def get_query_metrics():
-    return jsonify({'value': '1,284', 'change': '+12.5%', 'changeType': 'increase'})
+    total = metrics.queries_total.value()
+    last_hour = len(_recent_window(3600))
+    return jsonify({'value': f'{total:,}', 'change': f'+{last_hour} last hour',
+                    'changeType': 'increase' if last_hour else 'neutral'})
 
 @app.route('/api/metrics/users', methods=['GET'])
 def get_user_metrics():
-    return jsonify({'value': '32', 'change': '+4 today', 'changeType': 'increase'})
+    """Distinct client addresses (X-Forwarded-For aware) seen in the last 24h"""
+    last_hour = metrics.active_clients(3600)
+    return jsonify({'value': str(metrics.active_clients()), 'change': f'{last_hour} in last hour',
+                    'changeType': 'increase' if last_hour else 'neutral'})
 
 @app.route('/api/metrics/response-time', methods=['GET'])
 def get_response_time():
-    return jsonify({'value': '0.8s', 'change': '-15%', 'changeType': 'increase'})
+    """Median request latency across query endpoints, with p95 as the detail"""
+    latencies = sorted(q['executionTime'] for q in metrics.recent_queries(metrics.RECENT_QUERIES))
+    if not latencies:
+        return jsonify({'value': '-', 'change': 'no queries yet', 'changeType': 'neutral'})
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return jsonify({'value': _format_ms(p50), 'change': f'p95 {_format_ms(p95)}', 'changeType': 'neutral'})
 
 @app.route('/api/metrics/uptime', methods=['GET'])
 def get_uptime():
-    return jsonify({'value': '99.9%', 'change': '30 days', 'changeType': 'neutral'})
+    """Share of query requests that succeeded, and how long this worker has been up"""
+    total = metrics.queries_total.value()
+    succeeded = metrics.queries_total.value(status='success')
+    value = f'{100.0 * succeeded / total:.1f}%' if total else '100%'
+    return jsonify({'value': value, 'change': f'up {_format_duration(metrics.uptime_seconds())}',
+                    'changeType': 'neutral'})
+
+@app.route('/api/metrics/cache', methods=['GET'])
+def get_cache_metrics():
+    """Question->SQL and result cache hit rates for this worker"""
+    return jsonify({
+        'pid': os.getpid(),
+        'question_cache': question_cache_stats(),
+        'result_cache': result_cache.stats()
+    })
+
+@app.route('/api/metrics/llm', methods=['GET'])
+def get_llm_metrics():
+    """LLM gateway latency, token, retry and coalescing counters for this worker"""
+    return jsonify({'pid': os.getpid(), 'llm': get_llm_gateway().stats()})
+
+@app.route('/api/metrics/pool', methods=['GET'])
+def get_pool_metrics():
+    """Connection pool metrics for this worker"""
+    return jsonify({'pid': os.getpid(), 'pools': pool_stats()})
+
+@app.route('/api/metrics/replicas', methods=['GET'])
+def get_replica_metrics():
+    """Read replica health and routing counts for this worker"""
+    return jsonify({'pid': os.getpid(), 'replicas': read_router.stats()})
+
+@app.route('/api/metrics/logging', methods=['GET'])
+def get_logging_metrics():
+    """Request-log queue depth, dropped records and sampling settings for this worker"""
+    return jsonify({'pid': os.getpid(), 'logging': logging_stats()})
+
+@app.route('/api/metrics/startup', methods=['GET'])
+def get_startup_metrics():
+    """Startup profile for this worker: time to ready, lazy imports, warm-up"""
+    return jsonify(startup_report())
 
 # ----------------------------------------------------------------------------
-# Recent Queries (Mock data for now)
+# Recent Queries
 # ----------------------------------------------------------------------------
+def _time_ago(timestamp):
+    seconds = time.time() - timestamp
+    if seconds < 60:
+        return 'just now'
+    if seconds < 3600:
+        return f'{int(seconds // 60)} min ago'
+    if seconds < 86400:
+        hours = int(seconds // 3600)
+        return f'{hours} hour{"s" if hours > 1 else ""} ago'
+    return f'{int(seconds // 86400)} days ago'
+
 @app.route('/api/queries/recent', methods=['GET'])
 def get_recent_queries():
+    """Latest queries handled by this worker (?limit=, default 10)"""
+    limit = max(0, min(request.args.get('limit', 10, type=int), metrics.RECENT_QUERIES))
     return jsonify([
-        {'query': 'SELECT * FROM t_shirts WHERE brand = "Nike"', 'time': '2 min ago', 'status': 'success', 'executionTime': 1450, 'rows': 15},
-        {'query': 'SELECT COUNT(*) FROM t_shirts', 'time': '15 min ago', 'status': 'success', 'executionTime': 567, 'rows': 1},
-        {'query': 'SELECT * FROM t_shirts WHERE stock_quantity < 50', 'time': '1 hour ago', 'status': 'success', 'executionTime': 892, 'rows': 12},
+        {'query': q['query'], 'time': _time_ago(q['timestamp']), 'status': q['status'],
+         'executionTime': q['executionTime'], 'rows': q['rows'], 'type': q['endpoint'], 'cache': q['cache']}
+        for q in metrics.recent_queries(limit)
     ])
 
+# ============================================================================
+# STARTUP
+# ============================================================================
+
+mark_ready()
+if LANGCHAIN_AVAILABLE and os.getenv('AI_WARMUP', 'lazy').lower() == 'background':
+    # Build the few-shot chain while SQL-only endpoints are already serving
+    ai_helper.warm_up(then=lambda helper: helper.warm_up_chain(background=False))
+if os.getenv('STARTUP_PROFILE', 'false').lower() == 'true':
+    log_startup_report()
+
 # ============================================================================
 # RUN SERVER
 # ============================================================================
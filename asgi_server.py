@@ -0,0 +1,230 @@
+"""
+AskDB AI - Async API Server (ASGI)
+Serves the LLM-bound /api/query endpoint on asyncio (aiomysql + httpx), so one
+process can hold hundreds of questions waiting on Groq. Every other endpoint is
+the existing Flask app, mounted through a WSGI adapter.
+
+/api/query runs the Flask API's own nl_query_pipeline (nl_pipeline.py) with
+Pipeline.run_async(): the LLM call goes through the async gateway and the SQL
+through aiomysql, while the other stages (question cache, schema, guard,
+format, remember) run in worker threads.
+
+Run:
+    uvicorn asgi_server:app --host 0.0.0.0 --port 8000 --workers 2
+"""
+
+import asyncio
+import contextlib
+import os
+import time
+
+import aiomysql
+import pymysql
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import api_server
+import metrics
+from api_server import DB_CONFIG, MAX_RESULT_ROWS, nl_answer_response, nl_error_response, nl_query_pipeline
+from llm_gateway import get_async_llm_gateway, LLMError
+from nl_pipeline import ExecuteStage, LLMStage, PipelineError
+from result_format import description_columns
+from structured_log import (get_logger, new_request_id, request_id_var, should_sample, log_fields,
+                            log_slow_query)
+
+log = get_logger('asgi')
+
+# aiomysql pools by host:port, created in the worker's event loop: the
+# primary's in lifespan(), read replicas' on first use
+db_pools = {}
+_db_pools_lock = None
+
+
+class FlaskJSONResponse(JSONResponse):
+    """Serialize with Flask's provider so Decimal/datetime match the sync API"""
+
+    def render(self, content):
+        return api_server.app.json.dumps(content).encode('utf-8')
+
+
+async def _create_db_pool(db_config):
+    return await aiomysql.create_pool(
+        host=db_config['host'],
+        port=db_config['port'],
+        user=db_config['user'],
+        password=db_config['password'],
+        db=db_config['database'],
+        connect_timeout=db_config.get('connect_timeout'),
+        autocommit=True,
+        minsize=1,
+        maxsize=int(os.getenv('ASYNC_DB_POOL_SIZE', 20)),
+        pool_recycle=int(float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))),
+    )
+
+
+async def _db_pool(db_config):
+    key = (db_config['host'], db_config['port'])
+    pool = db_pools.get(key)
+    if pool is None:
+        async with _db_pools_lock:
+            pool = db_pools.get(key)
+            if pool is None:
+                pool = db_pools[key] = await _create_db_pool(db_config)
+    return pool
+
+
+async def fetch_result_async(db_config, sql, max_rows=MAX_RESULT_ROWS):
+    """nl_pipeline.fetch_result on db_config's aiomysql pool: (rows, truncated, columns).
+
+    Unbuffered like the sync version; a truncated connection is closed rather
+    than draining the rest of the result set.
+    """
+    pool = await _db_pool(db_config)
+    connection = await pool.acquire()
+    complete = False
+    try:
+        start = time.perf_counter()
+        cursor = await connection.cursor(aiomysql.SSDictCursor)
+        await cursor.execute(sql)
+        columns = description_columns(cursor.description)
+        rows = await cursor.fetchmany(max_rows + 1)
+        complete = len(rows) <= max_rows
+        if complete:
+            await cursor.close()
+        log_slow_query(db_config, sql, time.perf_counter() - start, len(rows[:max_rows]))
+        return rows[:max_rows], not complete, columns
+    except pymysql.err.ProgrammingError:
+        # Bad SQL: the connection itself is fine
+        complete = True
+        raise
+    finally:
+        if not complete:
+            connection.close()
+        pool.release(connection)
+
+
+def _async_pipeline(pipeline):
+    """pipeline with its LLM call and SQL execution awaited on the loop"""
+    llm, execute = pipeline.stage('llm'), pipeline.stage('execute')
+    return pipeline.replace(
+        'llm', LLMStage(llm.gateway, llm.model, llm.temperature, llm.max_tokens,
+                        async_gateway=get_async_llm_gateway),
+    ).replace(
+        'execute', ExecuteStage(execute.db_config, execute.max_rows, fetch_async=fetch_result_async),
+    )
+
+
+# /api/query: the Flask API's own pipeline
+nl_query_pipeline_async = _async_pipeline(nl_query_pipeline)
+
+
+# ============================================================================
+# API ENDPOINTS
+# ============================================================================
+
+async def health_check(request):
+    return FlaskJSONResponse({'status': 'ok', 'message': 'API is running', 'server': 'asgi'})
+
+
+async def process_natural_language_query(request):
+    """Async twin of api_server.process_natural_language_query"""
+    start = time.perf_counter()
+    request_id = new_request_id(request.headers.get('x-request-id'))
+    token = request_id_var.set(request_id)
+    try:
+        response = await _answer_question(request)
+        elapsed = time.perf_counter() - start
+        query_log = request.state.query_log
+        status = 'success' if response.status_code < 400 else 'error'
+        metrics.record_query('nl', query_log.get('query', ''), status, elapsed,
+                             rows=query_log.get('rows', 0), cache=query_log.get('cache'),
+                             client=request.headers.get('x-forwarded-for', '').split(',')[0].strip()
+                             or (request.client.host if request.client else None),
+                             error=query_log.get('error'))
+        if status == 'error' or should_sample('nl'):
+            fields = log_fields(endpoint='nl', status=response.status_code,
+                                duration_ms=round(elapsed * 1000, 1), **query_log)
+            (log.warning if status == 'error' else log.info)('query', extra=fields)
+        response.headers['X-Request-ID'] = request_id
+        return response
+    finally:
+        request_id_var.reset(token)
+
+
+async def _answer_question(request):
+    request.state.query_log = query_log = {}
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        if data is None:
+            return FlaskJSONResponse({'error': 'Invalid JSON in request body'}, status_code=400)
+
+        question = data.get('query', '')
+        query_log['query'] = question
+        if not question:
+            return FlaskJSONResponse({'error': 'Query is required'}, status_code=400)
+
+        use_cache = data.get('cache', True) is not False
+        if data.get('stream') or 'text/event-stream' in request.headers.get('accept', ''):
+            # Server-sent events from the sync pipeline, iterated in the threadpool
+            query_log['cache'] = 'stream'
+            return StreamingResponse(api_server.nl_answer_events(question, use_cache),
+                                     media_type='text/event-stream', headers=api_server.SSE_HEADERS)
+
+        try:
+            ctx = await nl_query_pipeline_async.run_async(question, use_cache=use_cache)
+        except (PipelineError, LLMError) as e:
+            query_log['error'] = str(e)
+            body, status = nl_error_response(e)
+            return FlaskJSONResponse(body, status_code=status)
+        query_log.update(rows=len(ctx.rows), cache=ctx.cache_tier or 'miss', sql=ctx.sql, timings=ctx.timings)
+        return FlaskJSONResponse(nl_answer_response(ctx))
+
+    except Exception as e:
+        log.exception('AI query failed')
+        query_log['error'] = str(e)
+        return FlaskJSONResponse({'error': f'AI processing failed: {str(e)}'}, status_code=500)
+
+
+async def get_llm_metrics(request):
+    return FlaskJSONResponse({'pid': os.getpid(), 'llm': get_async_llm_gateway().stats()})
+
+
+# ============================================================================
+# APP
+# ============================================================================
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global _db_pools_lock
+    _db_pools_lock = asyncio.Lock()
+    await _db_pool(DB_CONFIG)
+    try:
+        yield
+    finally:
+        for pool in db_pools.values():
+            pool.close()
+        for pool in db_pools.values():
+            await pool.wait_closed()
+        db_pools.clear()
+        await get_async_llm_gateway().aclose()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/health', health_check, methods=['GET']),
+        Route('/api/query', process_natural_language_query, methods=['POST']),
+        Route('/api/metrics/llm', get_llm_metrics, methods=['GET']),
+        # Everything else (SQL execution, metadata, metrics) runs on the Flask
+        # app in a thread pool
+        Mount('/', app=WSGIMiddleware(api_server.app)),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan,
+)
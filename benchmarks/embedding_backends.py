@@ -0,0 +1,190 @@
+"""
+AskDB AI - Embedding Backend Comparison
+Compares the torch (HuggingFaceEmbeddings) and ONNX Runtime embedding
+backends: few-shot retrieval parity against torch, single-question latency,
+batch throughput, resident memory and startup time. Each backend runs in its
+own subprocess so RSS and import time aren't shared.
+
+Usage:
+    python benchmarks/embedding_backends.py
+    python benchmarks/embedding_backends.py --backends huggingface,onnx:int8 --check --json
+
+--check exits non-zero when a backend's retrieval differs from torch more than
+--min-topk-agreement / --min-cosine allow.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+# Paraphrases of the few-shot questions plus unrelated ones, as users ask them
+PARITY_QUESTIONS = [
+    "How many Nike t-shirts in XS and white are left?",
+    "What is the inventory value of all small t-shirts?",
+    "Total revenue from selling every Levi's shirt after discounts",
+    "Revenue for all Levi's t-shirts without any discount",
+    "How many white Levi's shirts are in stock?",
+    "Sales amount for all large Nike t-shirts after discount",
+    "Which brand has the most t-shirts in stock?",
+    "How many red Adidas shirts in medium size do we have?",
+    "What is the average price of Van Heusen t-shirts?",
+    "List the discounts available for Nike",
+    "Total stock quantity for black t-shirts",
+    "How much money would we make selling all XL shirts today?",
+    "Count of t-shirts per color",
+    "Which size sells for the highest price?",
+    "Do we have any blue Levi's in XS?",
+    "What is the cheapest t-shirt we carry?",
+]
+
+
+def _rss_mb():
+    """Current resident set size (Linux), falling back to peak RSS"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def run_backend(spec, model, rounds, vectors_file):
+    """In-process measurement of one backend; writes its vectors for parity"""
+    import numpy as np
+
+    backend, _, variant = spec.partition(':')
+    if variant:
+        os.environ['ONNX_VARIANT'] = variant
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    from embedding_service import load_embeddings
+    from few_shot_index import example_text
+    from few_shots import few_shots
+    embeddings = load_embeddings(model, backend)
+    embeddings.embed_query('warm-up')
+    startup = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(rounds):
+        for question in PARITY_QUESTIONS:
+            t0 = time.perf_counter()
+            embeddings.embed_query(question)
+            latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+
+    batch = [example_text(e) for e in few_shots] + PARITY_QUESTIONS
+    batch = (batch * (64 // len(batch) + 1))[:64]
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        embeddings.embed_documents(batch)
+    batch_per_sec = 64 * rounds / (time.perf_counter() - t0)
+
+    np.savez(vectors_file,
+             examples=np.asarray(embeddings.embed_documents([example_text(e) for e in few_shots]), dtype=np.float32),
+             questions=np.asarray(embeddings.embed_documents(PARITY_QUESTIONS), dtype=np.float32))
+    return {
+        'backend': spec,
+        'startup_s': round(startup, 2),
+        'rss_mb': round(_rss_mb(), 1),
+        'rss_model_mb': round(_rss_mb() - rss_before, 1),
+        'query_p50_ms': round(latencies[len(latencies) // 2], 2),
+        'query_p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        'batch64_per_sec': round(batch_per_sec, 1),
+    }
+
+
+def retrieval_parity(reference, candidate, k=2):
+    """Agreement of top-k few-shot examples per question, and vector cosine similarity"""
+    import numpy as np
+
+    def top_k(vectors):
+        distances = ((vectors['questions'][:, None, :] - vectors['examples'][None, :, :]) ** 2).sum(axis=2)
+        return np.argsort(distances, axis=1)[:, :k]
+
+    ref_top, cand_top = top_k(reference), top_k(candidate)
+    same_sets = sum(set(a) == set(b) for a, b in zip(ref_top, cand_top))
+    cosine = (reference['questions'] * candidate['questions']).sum(axis=1)
+    return {
+        'topk_agreement': round(same_sets / len(ref_top), 3),
+        'top1_agreement': round(float((ref_top[:, 0] == cand_top[:, 0]).mean()), 3),
+        'min_cosine': round(float(cosine.min()), 5),
+    }
+
+
+def _measure(spec, model, rounds, vectors_file):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', spec, '--model', model,
+         '--rounds', str(rounds), '--vectors', vectors_file],
+        capture_output=True, text=True, cwd=ROOT)
+    if output.returncode != 0:
+        return {'backend': spec, 'error': output.stderr.strip().splitlines()[-1:] or ['failed']}
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare embedding backends for the few-shot selector')
+    parser.add_argument('--backends', default='huggingface,onnx:fp32,onnx:int8',
+                        help='comma-separated; the first is the parity reference')
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--check', action='store_true', help='fail on retrieval differences')
+    parser.add_argument('--min-topk-agreement', type=float, default=0.9)
+    parser.add_argument('--min-cosine', type=float, default=0.98)
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--vectors', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.model, args.rounds, args.vectors)))
+        sys.exit(0)
+
+    import numpy as np
+    from langchain_helper import EMBEDDING_MODEL
+
+    model = args.model or EMBEDDING_MODEL
+    specs = [s.strip() for s in args.backends.split(',') if s.strip()]
+    results, failed = [], False
+    with tempfile.TemporaryDirectory() as tmp:
+        reference = None
+        for spec in specs:
+            vectors_file = os.path.join(tmp, spec.replace(':', '-') + '.npz')
+            result = _measure(spec, model, args.rounds, vectors_file)
+            if 'error' not in result:
+                vectors = np.load(vectors_file)
+                if reference is None:
+                    reference = vectors
+                else:
+                    result.update(retrieval_parity(reference, vectors))
+                    if (result['topk_agreement'] < args.min_topk_agreement
+                            or result['min_cosine'] < args.min_cosine):
+                        result['parity'] = 'FAIL'
+                        failed = True
+                    else:
+                        result['parity'] = 'ok'
+            else:
+                failed = True
+            results.append(result)
+
+    if args.json:
+        print(json.dumps({'model': model, 'reference': specs[0], 'results': results}))
+    else:
+        print(f"Model {model}, parity reference {specs[0]}\n")
+        print(f"{'backend':<14}{'startup s':>10}{'RSS MB':>9}{'p50 ms':>9}{'p95 ms':>9}"
+              f"{'batch/s':>10}{'top-k':>8}{'cosine':>9}  parity")
+        for r in results:
+            if 'error' in r:
+                print(f"{r['backend']:<14} error: {' '.join(r['error'])}")
+                continue
+            print(f"{r['backend']:<14}{r['startup_s']:>10}{r['rss_mb']:>9}{r['query_p50_ms']:>9}"
+                  f"{r['query_p95_ms']:>9}{r['batch64_per_sec']:>10}{r.get('topk_agreement', '-'):>8}"
+                  f"{r.get('min_cosine', '-'):>9}  {r.get('parity', 'reference')}")
+    if args.check and failed:
+        sys.exit(1)
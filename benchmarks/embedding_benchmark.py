@@ -0,0 +1,141 @@
+"""
+AskDB AI - Embedding Throughput Benchmark
+Embeddings/sec of the few-shot embedding model on CPU at batch sizes 1-64,
+and of the micro-batching service (embedding_service.py) under concurrent
+single-question callers, plus batched vs one-at-a-time FAISS search.
+
+Usage:
+    python benchmarks/embedding_benchmark.py --texts 512
+    python benchmarks/embedding_benchmark.py --batch-sizes 1,8,64 --concurrency 1,16,64 --json
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from embedding_service import MicroBatchEmbedder, normalize_rows  # noqa: E402
+from few_shots import few_shots  # noqa: E402
+
+
+def sample_texts(count):
+    """Distinct question-like texts built from the few-shot questions"""
+    questions = [e['Question'] for e in few_shots]
+    return [f"{questions[i % len(questions)]} (variant {i})" for i in range(count)]
+
+
+def bench_batch_sizes(embeddings, texts, batch_sizes):
+    """Encode all texts in chunks of each batch size; {size: embeddings/sec}"""
+    encoder = MicroBatchEmbedder(embeddings, max_batch=max(batch_sizes))
+    encoder.embed_documents(texts[:8])   # warm-up (lazy init, thread pools)
+    results = {}
+    for size in batch_sizes:
+        start = time.perf_counter()
+        for offset in range(0, len(texts), size):
+            encoder._encode(texts[offset:offset + size])
+        results[size] = round(len(texts) / (time.perf_counter() - start), 1)
+    return results
+
+
+def bench_micro_batching(embeddings, texts, concurrency_levels, window_ms=2):
+    """Threads each calling embed_query; {threads: {'per_sec', 'avg_batch'}}"""
+    results = {}
+    for threads in concurrency_levels:
+        encoder = MicroBatchEmbedder(embeddings, window_ms=window_ms)
+        encoder.embed_query(texts[0])
+        next_index = iter(range(len(texts)))
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    i = next(next_index, None)
+                if i is None:
+                    return
+                encoder.embed_query(texts[i])
+
+        start = time.perf_counter()
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - start
+        stats = encoder.stats()
+        results[threads] = {'per_sec': round(len(texts) / elapsed, 1), 'avg_batch': stats['avg_batch']}
+    return results
+
+
+def bench_search(embeddings, texts, k=2):
+    """Queries/sec against a flat index of the few-shot examples: single vs batched search"""
+    base = normalize_rows(embeddings.embed_documents([" ".join(e.values()) for e in few_shots]))
+    index = faiss.IndexFlatL2(base.shape[1])
+    index.add(base)
+    queries = normalize_rows(embeddings.embed_documents(texts))
+
+    start = time.perf_counter()
+    for row in queries:
+        index.search(row[np.newaxis, :], k)
+    single = len(queries) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    index.search(queries, k)
+    batched = len(queries) / (time.perf_counter() - start)
+    return {'single_per_sec': round(single, 1), 'batched_per_sec': round(batched, 1)}
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(',') if x.strip()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Embedding throughput at different batch sizes')
+    parser.add_argument('--model', default=None, help='sentence-transformers model (default: the app model)')
+    parser.add_argument('--texts', type=int, default=512)
+    parser.add_argument('--batch-sizes', type=_int_list, default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--concurrency', type=_int_list, default=[1, 8, 32, 64])
+    parser.add_argument('--json', action='store_true', help='print one JSON document')
+    args = parser.parse_args()
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from langchain_helper import EMBEDDING_MODEL
+
+    model = args.model or EMBEDDING_MODEL
+    torch_threads = None
+    try:
+        import torch
+        torch_threads = torch.get_num_threads()
+    except ImportError:
+        pass
+
+    embeddings = HuggingFaceEmbeddings(model_name=model)
+    texts = sample_texts(args.texts)
+    report = {
+        'model': model,
+        'texts': len(texts),
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch_threads,
+        'batch_sizes': bench_batch_sizes(embeddings, texts, args.batch_sizes),
+        'micro_batching': bench_micro_batching(embeddings, texts, args.concurrency),
+        'faiss_search': bench_search(embeddings, texts),
+    }
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print(f"Model {model}, {len(texts)} texts, {report['cpu_count']} CPUs, torch threads {torch_threads}")
+        print("\nBatch size    embeddings/sec")
+        for size, rate in report['batch_sizes'].items():
+            print(f"{size:>10}    {rate:>14.1f}")
+        print("\nThreads (embed_query)    embeddings/sec    avg batch")
+        for threads, data in report['micro_batching'].items():
+            print(f"{threads:>21}    {data['per_sec']:>14.1f}    {data['avg_batch']:>9}")
+        search = report['faiss_search']
+        print(f"\nFAISS search: {search['single_per_sec']:.0f}/s one at a time, "
+              f"{search['batched_per_sec']:.0f}/s batched")
@@ -0,0 +1,171 @@
+"""
+AskDB AI - Result Formatting Benchmark
+Times the columnar formatters in result_format.py against the row-by-row
+formatters they replaced, on synthetic t_shirts results (100k rows by
+default), and checks both produce identical text.
+
+Usage:
+    python benchmarks/format_benchmark.py --rows 100000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pymysql.constants import FIELD_TYPE  # noqa: E402
+
+from result_format import format_chain_answer, format_nl_answer  # noqa: E402
+
+BRANDS = ['Van Huesen', 'Levi', 'Nike', 'Adidas']
+COLORS = ['Red', 'Blue', 'Black', 'White']
+SIZES = ['XS', 'S', 'M', 'L', 'XL']
+
+
+# ============================================================================
+# PREVIOUS IMPLEMENTATIONS (for comparison)
+# ============================================================================
+
+def legacy_format_chain_answer(rows):
+    rows = [tuple(row.values()) for row in rows]
+    column_count = len(rows[0]) if rows else 0
+
+    if not rows:
+        return "No results found."
+
+    if len(rows) == 1 and len(rows[0]) == 1:
+        value = rows[0][0]
+        return f"**{value}**"
+
+    if len(rows) > 1 and column_count > 1:
+        result_lines = []
+        total_stock = 0
+
+        for row in rows:
+            try:
+                if column_count == 2:
+                    item = row[0]
+                    value = row[1]
+                    if isinstance(value, (int, float)):
+                        total_stock += value
+                        result_lines.append(f"Size {item}: {int(value)} items available")
+                    else:
+                        result_lines.append(f"{item}: {value}")
+                elif column_count >= 6:
+                    size = row[3]
+                    stock = row[5]
+                    total_stock += stock if isinstance(stock, (int, float)) else 0
+                    result_lines.append(f"Size {size}: {int(stock)} items available")
+                else:
+                    numeric_vals = [v for v in row if isinstance(v, (int, float))]
+                    if numeric_vals:
+                        total_stock += sum(numeric_vals)
+                    result_lines.append(" | ".join(map(str, row)))
+            except:  # noqa: E722
+                result_lines.append(str(row))
+
+        formatted_output = "\n".join(result_lines)
+        if total_stock > 0:
+            formatted_output += f"\n\n**Total Stock: {int(total_stock)}**"
+        return formatted_output
+
+    if len(rows) <= 5:
+        return "\n".join([f"- {', '.join(map(str, row))}" for row in rows])
+    else:
+        return f"Found {len(rows)} results"
+
+
+def legacy_format_nl_answer(results):
+    if len(results) == 0:
+        return "No results found."
+    if len(results) == 1 and len(results[0]) == 1:
+        return f"The answer is: {list(results[0].values())[0]}"
+    answer = f"Found {len(results)} results:\\n"
+    for i, row in enumerate(results[:5], 1):
+        answer += f"{i}. {', '.join([f'{k}: {v}' for k, v in row.items()])}\\n"
+    if len(results) > 5:
+        answer += f"... and {len(results) - 5} more"
+    return answer
+
+
+# ============================================================================
+# DATA
+# ============================================================================
+
+def make_results(shape, count, seed=7):
+    """(rows, columns) shaped like the chat's typical result sets"""
+    rng = random.Random(seed)
+    if shape == 'size_stock':
+        columns = [('size', FIELD_TYPE.VAR_STRING), ('stock', FIELD_TYPE.LONGLONG)]
+        rows = [{'size': rng.choice(SIZES), 'stock': rng.randint(0, 100)} for _ in range(count)]
+    elif shape == 'full_table':
+        columns = [('t_shirt_id', FIELD_TYPE.LONG), ('brand', FIELD_TYPE.STRING), ('color', FIELD_TYPE.STRING),
+                   ('size', FIELD_TYPE.STRING), ('price', FIELD_TYPE.LONG), ('stock_quantity', FIELD_TYPE.LONG)]
+        rows = [{'t_shirt_id': i, 'brand': rng.choice(BRANDS), 'color': rng.choice(COLORS),
+                 'size': rng.choice(SIZES), 'price': rng.randint(10, 50), 'stock_quantity': rng.randint(0, 100)}
+                for i in range(count)]
+    elif shape == 'mixed':
+        columns = [('brand', FIELD_TYPE.VAR_STRING), ('color', FIELD_TYPE.VAR_STRING),
+                   ('revenue', FIELD_TYPE.NEWDECIMAL), ('stock', FIELD_TYPE.LONGLONG)]
+        rows = [{'brand': rng.choice(BRANDS), 'color': rng.choice(COLORS),
+                 'revenue': Decimal(rng.randint(100, 99999)) / 100, 'stock': rng.randint(0, 100)}
+                for _ in range(count)]
+    elif shape == 'nulls':
+        columns = [('size', FIELD_TYPE.VAR_STRING), ('stock', FIELD_TYPE.LONGLONG)]
+        rows = [{'size': rng.choice(SIZES), 'stock': None if rng.random() < 0.01 else rng.randint(0, 100)}
+                for _ in range(count)]
+    else:
+        raise ValueError(shape)
+    return rows, columns
+
+
+SHAPES = ('size_stock', 'full_table', 'mixed', 'nulls')
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Columnar vs row-by-row result formatting')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    report = []
+    for shape in SHAPES:
+        rows, columns = make_results(shape, args.rows)
+        legacy_text, new_text = legacy_format_chain_answer(rows), format_chain_answer(rows, columns)
+        legacy = best_of(lambda: legacy_format_chain_answer(rows), args.repeat)
+        columnar = best_of(lambda: format_chain_answer(rows, columns), args.repeat)
+        report.append({'formatter': 'chat', 'shape': shape, 'rows': len(rows),
+                       'legacy_ms': round(legacy * 1000, 1), 'columnar_ms': round(columnar * 1000, 1),
+                       'speedup': round(legacy / columnar, 2), 'identical': legacy_text == new_text})
+
+    rows, columns = make_results('full_table', args.rows)
+    legacy = best_of(lambda: legacy_format_nl_answer(rows), args.repeat)
+    columnar = best_of(lambda: format_nl_answer(rows, columns), args.repeat)
+    report.append({'formatter': 'api', 'shape': 'full_table', 'rows': len(rows),
+                   'legacy_ms': round(legacy * 1000, 3), 'columnar_ms': round(columnar * 1000, 3),
+                   'speedup': round(legacy / columnar, 2),
+                   'identical': legacy_format_nl_answer(rows) == format_nl_answer(rows, columns)})
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print(f"{'formatter':<10}{'shape':<12}{'rows':>8}{'legacy ms':>11}{'columnar ms':>13}{'speedup':>9}  identical")
+        for r in report:
+            print(f"{r['formatter']:<10}{r['shape']:<12}{r['rows']:>8}{r['legacy_ms']:>11}"
+                  f"{r['columnar_ms']:>13}{r['speedup']:>9}  {r['identical']}")
+    if not all(r['identical'] for r in report):
+        sys.exit(1)
@@ -0,0 +1,122 @@
+"""
+AskDB AI - HTTP Load Benchmark
+Drives an endpoint at fixed concurrency and reports throughput and latency
+percentiles. Used to compare the sync (gunicorn api_server:app) and async
+(uvicorn asgi_server:app) deployments of /api/query. With --stream the
+questions ask for server-sent events, and time to the first event (what the
+user waits for before anything appears) is reported as well.
+
+Usage:
+    python benchmarks/load_benchmark.py --url http://127.0.0.1:8000/api/query \\
+        --concurrency 200 --requests 2000 [--stream]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from few_shots import few_shots  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def nl_body(i):
+    """Distinct question per request so neither the question cache nor the
+    gateway's single-flight coalescing hides the LLM latency"""
+    question = few_shots[i % len(few_shots)]['Question']
+    return {'query': f'{question} (run {i})', 'cache': False}
+
+
+async def _post_stream(client, url, body, start):
+    """(ok, seconds to the first event) for a streamed request, read to the end"""
+    first_event = None
+    ok = True
+    async with client.stream('POST', url, json=body) as response:
+        if response.status_code != 200:
+            return False, None
+        async for line in response.aiter_lines():
+            if line.startswith('event:'):
+                if first_event is None:
+                    first_event = time.perf_counter() - start
+                ok = ok and line != 'event: error'
+    return ok, first_event
+
+
+async def run_load(url, concurrency, total, make_body=nl_body, timeout=120.0, stream=False):
+    """Send total POSTs at the given concurrency; returns a summary dict"""
+    latencies = []
+    first_events = []
+    errors = 0
+    next_index = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        async def worker():
+            nonlocal next_index, errors
+            while next_index < total:
+                i = next_index
+                next_index += 1
+                start = time.perf_counter()
+                try:
+                    if stream:
+                        ok, first_event = await _post_stream(client, url, dict(make_body(i), stream=True), start)
+                        if ok:
+                            first_events.append(first_event)
+                    else:
+                        response = await client.post(url, json=make_body(i))
+                        ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    summary = {
+        'url': url,
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'wall_s': round(wall, 2),
+        'rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+    if stream:
+        summary.update(first_event_p50_ms=round(percentile(first_events, 50) * 1000, 1),
+                       first_event_p95_ms=round(percentile(first_events, 95) * 1000, 1))
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fixed-concurrency HTTP load benchmark')
+    parser.add_argument('--url', required=True, action='append',
+                        help='endpoint to drive; repeat to compare deployments')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--stream', action='store_true', help='ask for server-sent events')
+    args = parser.parse_args()
+
+    for url in args.url:
+        summary = asyncio.run(run_load(url, args.concurrency, args.requests, stream=args.stream))
+        print(json.dumps(summary))
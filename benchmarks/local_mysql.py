@@ -0,0 +1,159 @@
+"""
+AskDB AI - Local MySQL for Benchmarks
+Starts a throwaway MySQL or MariaDB server and seeds it with the schema from
+database/db_setup.sql, scaled to any number of t_shirts rows:
+
+    local    mysqld / mariadbd from PATH, data directory in a temp dir
+    docker   a mysql:8.0 (or --image) container, removed on stop
+
+Seeding drops and recreates atliq_tshirts and fills it with the synthetic data
+generator (database/generate_data.py).
+
+Usage:
+    python benchmarks/local_mysql.py --mode local --port 3307 --rows 2000000
+    python benchmarks/local_mysql.py --mode docker --port 3307 --rows 2000000
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import pymysql
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database'))
+import generate_data  # noqa: E402
+
+DATABASE = 'atliq_tshirts'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class LocalMySQL:
+    """A disposable MySQL/MariaDB server on 127.0.0.1:port (root, no password)"""
+
+    def __init__(self, mode='local', port=None, image='mysql:8.0'):
+        self.mode = mode
+        self.port = port or free_port()
+        self.image = image
+        self.datadir = None
+        self.process = None
+        self.container = None
+
+    def config(self, database=DATABASE):
+        """DB_CONFIG-style connection settings"""
+        return {'host': '127.0.0.1', 'port': self.port, 'user': 'root', 'password': '', 'database': database}
+
+    def start(self, timeout=120):
+        if self.mode == 'docker':
+            self._start_docker()
+        else:
+            self._start_local()
+        self._wait(timeout)
+        return self
+
+    def stop(self):
+        if self.container:
+            subprocess.run(['docker', 'rm', '-f', self.container], capture_output=True)
+            self.container = None
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+        if self.datadir:
+            shutil.rmtree(self.datadir, ignore_errors=True)
+            self.datadir = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _start_docker(self):
+        self.container = f'askdb-bench-{self.port}'
+        subprocess.run(['docker', 'run', '-d', '--rm', '--name', self.container,
+                        '-p', f'127.0.0.1:{self.port}:3306',
+                        '-e', 'MYSQL_ALLOW_EMPTY_PASSWORD=yes', '-e', 'MYSQL_ROOT_HOST=%',
+                        self.image, '--local-infile=1'],
+                       check=True, capture_output=True)
+
+    def _start_local(self):
+        server = shutil.which('mariadbd') or shutil.which('mysqld')
+        if server is None:
+            raise RuntimeError('No mysqld or mariadbd on PATH; use --mode docker or an existing server')
+        self.datadir = tempfile.mkdtemp(prefix='askdb-mysql-')
+        data = os.path.join(self.datadir, 'data')
+        mariadb = 'mariadb' in os.path.basename(server) or 'MariaDB' in subprocess.run(
+            [server, '--version'], capture_output=True, text=True).stdout
+        if mariadb:
+            install = shutil.which('mariadb-install-db') or shutil.which('mysql_install_db')
+            subprocess.run([install, '--no-defaults', f'--datadir={data}', '--auth-root-authentication-method=normal',
+                            '--skip-test-db'], check=True, capture_output=True)
+        else:
+            subprocess.run([server, '--no-defaults', '--initialize-insecure', f'--datadir={data}'],
+                           check=True, capture_output=True)
+        self.process = subprocess.Popen(
+            [server, '--no-defaults', f'--datadir={data}', f'--port={self.port}', '--bind-address=127.0.0.1',
+             f'--socket={os.path.join(self.datadir, "mysql.sock")}', '--local-infile=1',
+             '--innodb-buffer-pool-size=512M', '--skip-log-bin', '--user=' + (os.getenv('USER') or 'root')],
+            stdout=subprocess.DEVNULL, stderr=open(os.path.join(self.datadir, 'error.log'), 'w'))
+
+    def _wait(self, timeout):
+        deadline = time.time() + timeout
+        while True:
+            try:
+                pymysql.connect(**self.config(database=None)).close()
+                return
+            except pymysql.err.OperationalError:
+                if self.process is not None and self.process.poll() is not None:
+                    raise RuntimeError(f'MySQL exited during startup, see {self.datadir}/error.log')
+                if time.time() > deadline:
+                    raise RuntimeError(f'MySQL did not accept connections within {timeout}s')
+                time.sleep(0.5)
+
+
+# ============================================================================
+# SEEDING
+# ============================================================================
+
+def seed(config, rows, tables=('t_shirts', 'discounts'), method='insert', writers=None):
+    """Recreate atliq_tshirts from db_setup.sql and fill it with
+    database/generate_data.py; returns rows/sec of the load. Servers started
+    here accept method='load-data'."""
+    writers = writers or min(4, os.cpu_count() or 1)
+    report = generate_data.generate(config, rows, tables, method=method, writers=writers, recreate=True)
+    return report['rows_per_s']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Start and seed a throwaway MySQL for benchmarks')
+    parser.add_argument('--mode', choices=('local', 'docker'), default='local')
+    parser.add_argument('--port', type=int, default=3307)
+    parser.add_argument('--image', default='mysql:8.0')
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    server = LocalMySQL(args.mode, args.port, args.image).start()
+    try:
+        rate = seed(server.config(), args.rows, method='load-data')
+        print(f"🗄️  MySQL on 127.0.0.1:{server.port} (root, no password), "
+              f"{args.rows:,} t_shirts loaded at {rate:,.0f} rows/s. Ctrl-C to stop.")
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        sys.exit(0)
@@ -0,0 +1,142 @@
+"""
+AskDB AI - Schema Linking Benchmark
+Prompt schema size with and without schema linking (schema_linking.py) on a
+synthetic schema: the real t_shirts / discounts tables plus --tables filler
+tables from common business domains. Reports estimated tokens of the whole
+schema vs the linked one, whether each question's tables were picked
+(recall), index build time and per-question linking latency.
+
+Usage:
+    python benchmarks/schema_linking.py --tables 300 --top-k 5
+    python benchmarks/schema_linking.py --backend onnx --json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from embedding_service import load_embeddings  # noqa: E402
+from schema_cache import SchemaCache  # noqa: E402
+from schema_linking import SchemaLinker  # noqa: E402
+
+ATLIQ_COLUMNS = {
+    't_shirts': [('t_shirt_id', 'int', 'PRI', ''),
+                 ('brand', "enum('Van Huesen','Levi','Nike','Adidas')", '', ''),
+                 ('color', "enum('Red','Blue','Black','White')", '', ''),
+                 ('size', "enum('XS','S','M','L','XL')", '', ''),
+                 ('price', 'int', '', ''),
+                 ('stock_quantity', 'int', '', '')],
+    'discounts': [('discount_id', 'int', 'PRI', ''),
+                  ('t_shirt_id', 'int', 'MUL', ''),
+                  ('pct_discount', 'decimal(5,2)', '', '')],
+}
+ATLIQ_FOREIGN_KEYS = [('discounts', 't_shirt_id', 't_shirts', 't_shirt_id')]
+
+DOMAINS = ['customer', 'order', 'invoice', 'payment', 'shipment', 'supplier', 'warehouse', 'employee',
+           'department', 'campaign', 'ticket', 'subscription', 'refund', 'review', 'store', 'vendor_contract']
+ATTRIBUTES = ['name', 'email', 'phone', 'address', 'city', 'country', 'status', 'created_at', 'updated_at',
+              'amount', 'currency', 'notes', 'priority', 'score', 'region', 'channel', 'quantity', 'due_date']
+
+# (question, tables it needs)
+QUESTIONS = [
+    ("How many white color Levi's shirt I have?", {'t_shirts'}),
+    ("How much is the total price of the inventory for all S-size t-shirts?", {'t_shirts'}),
+    ("If we have to sell all the Levi's T-shirts today with discounts applied. "
+     "How much revenue our store will generate (post discounts)?", {'t_shirts', 'discounts'}),
+    ("Which t-shirts have a discount above 10 percent?", {'t_shirts', 'discounts'}),
+    ("How many Nike t-shirts are there in stock in size XS?", {'t_shirts'}),
+]
+
+
+class StaticSchemaCache(SchemaCache):
+    """SchemaCache over in-memory metadata instead of information_schema"""
+
+    def __init__(self, details):
+        super().__init__({'database': 'benchmark'}, ttl=float('inf'), poll_interval=float('inf'))
+        self._static = details
+
+    def _fetch(self):
+        details = self._static
+        tables = list(details['tables'])
+        columns = {t: [(name, column_type) for name, column_type, _, _ in details['columns'][t]] for t in tables}
+        fingerprint = tuple((t, None, None) for t in tables)
+        return fingerprint, (tuple((t, None) for t in tables), ()), tables, columns, details
+
+
+def synthetic_schema(filler_tables, seed=7):
+    """SchemaCache.details()-shaped metadata: the atliq tables plus filler"""
+    rng = random.Random(seed)
+    columns = dict(ATLIQ_COLUMNS)
+    foreign_keys = list(ATLIQ_FOREIGN_KEYS)
+    names = []
+    for i in range(filler_tables):
+        table = f"{DOMAINS[i % len(DOMAINS)]}_{i // len(DOMAINS)}" if i >= len(DOMAINS) else DOMAINS[i]
+        table_columns = [(f'{table}_id', 'int', 'PRI', '')]
+        for attribute in rng.sample(ATTRIBUTES, rng.randint(6, len(ATTRIBUTES))):
+            table_columns.append((attribute, rng.choice(['varchar(64)', 'int', 'datetime', 'decimal(10,2)']), '', ''))
+        if names and rng.random() < 0.5:
+            parent = rng.choice(names)
+            table_columns.append((f'{parent}_id', 'int', 'MUL', ''))
+            foreign_keys.append((table, f'{parent}_id', parent, f'{parent}_id'))
+        columns[table] = table_columns
+        names.append(table)
+    return {'tables': {t: '' for t in columns}, 'columns': columns, 'foreign_keys': foreign_keys}
+
+
+def run(embeddings, filler_tables, top_k):
+    cache = StaticSchemaCache(synthetic_schema(filler_tables))
+    linker = SchemaLinker(cache, embeddings, 'benchmark', top_k=top_k, min_tables=0)
+
+    start = time.perf_counter()
+    index = linker.index()
+    build_s = time.perf_counter() - start
+
+    questions = []
+    for question, expected in QUESTIONS:
+        start = time.perf_counter()
+        linked = linker.link(question)
+        elapsed = time.perf_counter() - start
+        if linked is None:      # below SCHEMA_LINK_MIN_SCORE: the whole schema is sent
+            questions.append({'question': question, 'tables': [], 'recall': True, 'tokens': index.full_tokens,
+                              'link_ms': round(elapsed * 1000, 1)})
+            continue
+        questions.append({'question': question, 'tables': linked.tables, 'recall': expected <= set(linked.tables),
+                          'tokens': linked.tokens, 'link_ms': round(elapsed * 1000, 1)})
+    return {
+        'tables': len(index),
+        'documents': len(index.vectors),
+        'index_build_s': round(build_s, 2),
+        'full_tokens': index.full_tokens,
+        'linked_tokens_avg': round(sum(q['tokens'] for q in questions) / len(questions)),
+        'recall': sum(q['recall'] for q in questions) / len(questions),
+        'questions': questions,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Prompt schema tokens with and without schema linking')
+    parser.add_argument('--tables', type=int, default=300, help='filler tables besides t_shirts/discounts')
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--model', default='sentence-transformers/all-MiniLM-L6-v2')
+    parser.add_argument('--backend', default=None, help='huggingface|onnx (default: EMBEDDING_BACKEND)')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    report = run(load_embeddings(args.model, args.backend), args.tables, args.top_k)
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print(f"{report['tables']} tables, {report['documents']} embedded documents, "
+              f"index built in {report['index_build_s']}s")
+        print(f"schema tokens: full {report['full_tokens']}, linked {report['linked_tokens_avg']} on average "
+              f"({report['full_tokens'] / max(1, report['linked_tokens_avg']):.0f}x smaller), "
+              f"recall {report['recall']:.0%}")
+        print(f"{'link ms':>8}{'tokens':>8}  recall  tables / question")
+        for q in report['questions']:
+            print(f"{q['link_ms']:>8}{q['tokens']:>8}  {str(q['recall']):<6}  {', '.join(q['tables']) or '(whole schema)'}")
+            print(f"{'':>26}{q['question'][:70]}")
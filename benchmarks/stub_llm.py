@@ -0,0 +1,115 @@
+"""
+AskDB AI - Stub LLM Server
+OpenAI-compatible /v1/chat/completions endpoint with configurable latency that
+answers with the SQL of the closest question in few_shots.py. Point the API at
+it with LLM_BASE_URL=http://127.0.0.1:<port>/v1. Requests with "stream": true
+get server-sent events: the first token after --first-token seconds, the rest
+spread over the remaining latency.
+
+Usage:
+    python benchmarks/stub_llm.py --port 9100 --latency 1.5 --first-token 0.3
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from few_shots import few_shots  # noqa: E402
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def _words(text):
+    return set(_WORD.findall(text.lower()))
+
+
+def pick_sql(prompt):
+    """SQL of the few-shot example sharing the most words with the prompt's question"""
+    question = prompt.rsplit('Question:', 1)[-1]
+    words = _words(question)
+    best = max(few_shots, key=lambda example: len(words & _words(example['Question'])))
+    return ' '.join(best['SQLQuery'].split())
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 1.0
+    first_token = 0.3
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        prompt = body.get('messages', [{}])[-1].get('content', '')
+        if body.get('stream'):
+            self._stream(body, prompt)
+            return
+        time.sleep(self.latency)
+        sql = pick_sql(prompt)
+        payload = json.dumps({
+            'id': 'stub',
+            'object': 'chat.completion',
+            'model': body.get('model', 'stub'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': sql}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': len(prompt.split()), 'completion_tokens': len(sql.split()),
+                      'total_tokens': len(prompt.split()) + len(sql.split())},
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, body, prompt):
+        first_token = min(self.first_token, self.latency)
+        time.sleep(first_token)
+        sql = pick_sql(prompt)
+        tokens = re.findall(r'\S+\s*', sql)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep((self.latency - first_token) / max(1, len(tokens) - 1))
+            chunk = {'id': 'stub', 'object': 'chat.completion.chunk', 'model': body.get('model', 'stub'),
+                     'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+        usage = {'prompt_tokens': len(prompt.split()), 'completion_tokens': len(tokens),
+                 'total_tokens': len(prompt.split()) + len(tokens)}
+        final = {'id': 'stub', 'object': 'chat.completion.chunk', 'model': body.get('model', 'stub'),
+                 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}], 'usage': usage}
+        self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+
+def serve(port, latency, host='127.0.0.1', first_token=0.3):
+    """Start the stub server; returns the ThreadingHTTPServer (call serve_forever)"""
+    handler = type('Handler', (StubHandler,), {'latency': latency, 'first_token': first_token})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stub OpenAI-compatible LLM server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds to wait before answering')
+    parser.add_argument('--first-token', type=float, default=0.3, help='seconds to the first streamed token')
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.host, args.first_token)
+    print(f"🧪 Stub LLM on http://{args.host}:{args.port}/v1 ({args.latency}s latency)")
+    server.serve_forever()
@@ -0,0 +1,331 @@
+"""
+AskDB AI - Benchmark Suite
+One reproducible run of the whole stack, with nothing external:
+
+    1. MySQL     a throwaway server (local_mysql.py) seeded with --rows t_shirts,
+                 or an existing one (--db external, DB_* environment); with
+                 --replicas N, N more identically seeded servers serve the reads
+                 (DB_REPLICAS, db_router.py)
+    2. LLM       the stub server (stub_llm.py) answering with few-shot SQL after --llm-latency
+    3. API       gunicorn api_server:app with --workers workers against both
+    4. load      /api/execute-sql, /api/query and SQLExecutionChain.run() at
+                 --concurrency, reporting throughput, p50/p95/p99 and RSS/PSS
+
+Results can be saved as a named baseline (benchmarks/baselines/<name>.json)
+and later runs compared against it; --compare exits non-zero when throughput,
+latency or memory regress beyond --tolerance.
+
+Usage:
+    python benchmarks/suite.py --rows 2000000 --save-baseline main
+    python benchmarks/suite.py --rows 2000000 --compare main
+    python benchmarks/suite.py --db external --workloads execute-sql --requests 5000
+    python benchmarks/suite.py --rows 1000000 --replicas 1 --workloads execute-sql,query
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCHMARKS, '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS)
+import stub_llm  # noqa: E402
+from load_benchmark import nl_body, percentile, run_load  # noqa: E402
+from local_mysql import LocalMySQL, free_port, seed  # noqa: E402
+from worker_memory import _children, memory  # noqa: E402
+
+BASELINE_DIR = os.path.join(BENCHMARKS, 'baselines')
+WORKLOADS = ('execute-sql', 'query', 'chain')
+
+# Query Builder style statements for /api/execute-sql
+SQL_WORKLOAD = [
+    "SELECT size, SUM(stock_quantity) AS stock FROM t_shirts WHERE brand = 'Nike' GROUP BY size",
+    "SELECT * FROM t_shirts WHERE brand = 'Levi' AND color = 'White' LIMIT 100",
+    "SELECT COUNT(*) AS shirts FROM t_shirts WHERE price > 40",
+    "SELECT t.brand, AVG(d.pct_discount) AS avg_discount FROM t_shirts t "
+    "JOIN discounts d ON d.t_shirt_id = t.t_shirt_id GROUP BY t.brand",
+]
+
+# Compared against baselines: (field, True when higher is better)
+COMPARED = (('rps', True), ('p50_ms', False), ('p95_ms', False), ('p99_ms', False), ('rss_mb', False))
+
+
+def sql_body(i):
+    return {'sql': SQL_WORKLOAD[i % len(SQL_WORKLOAD)], 'cache': False}
+
+
+# ============================================================================
+# SERVERS
+# ============================================================================
+
+def start_stub_llm(latency):
+    port = free_port()
+    server = stub_llm.serve(port, latency)
+    threading.Thread(target=server.serve_forever, name='stub-llm', daemon=True).start()
+    return server, f'http://127.0.0.1:{port}/v1'
+
+
+def server_env(db_config, llm_url, replicas=()):
+    env = dict(os.environ)
+    env.update({
+        'DB_HOST': db_config['host'], 'DB_PORT': str(db_config['port']), 'DB_USER': db_config['user'],
+        'DB_PASSWORD': db_config['password'], 'DB_NAME': db_config['database'],
+        'LLM_BASE_URL': llm_url, 'GROQ_API_KEY': 'stub',
+        'DB_REPLICAS': ','.join(f"{r['host']}:{r['port']}" for r in replicas),
+    })
+    # Measure the full path: full scans of a seeded table would otherwise be
+    # rejected by the cost guard in a few milliseconds
+    env.setdefault('SQL_GUARD', 'report')
+    env.setdefault('LOG_LEVEL', 'WARNING')
+    return env
+
+
+def start_api(env, workers, timeout=120):
+    """gunicorn api_server:app on a free port; returns (process, base_url)"""
+    port = free_port()
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-w', str(workers), '-k', 'gthread',
+                                '--threads', '8', '-b', f'127.0.0.1:{port}', 'api_server:app'],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            if httpx.get(f'{base_url}/api/health', timeout=2).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f'API did not answer /api/health within {timeout}s')
+
+
+def process_memory(pid):
+    """Summed RSS/PSS of a process and its children (gunicorn master + workers)"""
+    pids = [pid] + _children(pid)
+    usage = [memory(p) for p in pids]
+    return {'rss_mb': round(sum(u['rss_mb'] for u in usage), 1),
+            'pss_mb': round(sum(u['pss_mb'] for u in usage), 1)}
+
+
+# ============================================================================
+# WORKLOADS
+# ============================================================================
+
+def run_chain(db_config, llm_url, concurrency, total):
+    """SQLExecutionChain.run() in this process, concurrency threads at a time"""
+    os.environ.update({'LLM_BASE_URL': llm_url, 'GROQ_API_KEY': 'stub'})
+    from langchain_helper import get_cached_chain
+    chain = get_cached_chain(db_params=db_config)
+    chain.run(nl_body(0)['query'], use_cache=False)    # builds the index, loads the model
+
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def ask(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            chain.run(nl_body(i)['query'], use_cache=False)
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(ask, range(total)))
+    wall = time.perf_counter() - start
+    return {
+        'url': 'SQLExecutionChain.run',
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'wall_s': round(wall, 2),
+        'rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+
+# ============================================================================
+# BASELINES
+# ============================================================================
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, f'{name}.json')
+
+
+def save_baseline(name, report):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    with open(baseline_path(name), 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(report, baseline, tolerance):
+    """Regressions of report against baseline, as readable lines"""
+    regressions = []
+    for workload, current in report['results'].items():
+        previous = baseline['results'].get(workload)
+        if previous is None:
+            continue
+        for field, higher_is_better in COMPARED:
+            old, new = previous.get(field), current.get(field)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{workload} {field}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def run_config(args, rows):
+    """The settings a baseline is only comparable under"""
+    return {'rows': rows, 'workers': args.workers, 'concurrency': args.concurrency,
+            'requests': args.requests, 'llm_latency': args.llm_latency, 'replicas': args.replicas}
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(args):
+    workloads = [w.strip() for w in args.workloads.split(',') if w.strip()]
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        raise SystemExit(f"Unknown workloads: {', '.join(sorted(unknown))}")
+
+    if args.replicas and args.db == 'external':
+        raise SystemExit('--replicas starts local servers; point DB_REPLICAS at existing ones instead')
+
+    mysql = None
+    replicas = []
+    if args.db == 'external':
+        db_config = {'host': os.getenv('DB_HOST', 'localhost'), 'port': int(os.getenv('DB_PORT', 3306)),
+                     'user': os.getenv('DB_USER', 'root'), 'password': os.getenv('DB_PASSWORD', ''),
+                     'database': os.getenv('DB_NAME', 'atliq_tshirts')}
+    else:
+        mysql = LocalMySQL(args.db, args.db_port, args.image).start()
+        db_config = mysql.config()
+    api = llm_server = None
+    try:
+        # Seeding drops the database: only on request for a server we didn't start
+        if args.seed if args.seed is not None else mysql is not None:
+            rate = seed(db_config, args.rows, method='insert' if mysql is None else 'load-data')
+            print(f"🗄️  Seeded {args.rows:,} t_shirts at {rate:,.0f} rows/s", file=sys.stderr)
+        # Standalone copies with the same seeded data stand in for replicas
+        for _ in range(args.replicas):
+            replicas.append(LocalMySQL(args.db, image=args.image).start())
+            seed(replicas[-1].config(), args.rows, method='load-data')
+        if replicas:
+            print(f"🗄️  {len(replicas)} read replica(s) on port(s) {', '.join(str(r.port) for r in replicas)}",
+                  file=sys.stderr)
+        llm_server, llm_url = start_stub_llm(args.llm_latency)
+        report = {'config': run_config(args, args.rows), 'host': {'python': platform.python_version(),
+                                                                  'cpus': os.cpu_count()},
+                  'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': {}}
+
+        if {'execute-sql', 'query'} & set(workloads):
+            api, base_url = start_api(server_env(db_config, llm_url, [r.config() for r in replicas]), args.workers)
+            for workload, path, make_body in (('execute-sql', '/api/execute-sql', sql_body),
+                                              ('query', '/api/query', nl_body)):
+                if workload not in workloads:
+                    continue
+                print(f"⏱️  {workload}: {args.requests} requests at concurrency {args.concurrency}", file=sys.stderr)
+                result = asyncio.run(run_load(base_url + path, args.concurrency, args.requests, make_body))
+                result.update(process_memory(api.pid))
+                report['results'][workload] = result
+            if replicas:
+                # One worker's view of replica health and routing
+                report['replicas'] = httpx.get(f'{base_url}/api/metrics/replicas', timeout=10).json()['replicas']
+        if 'chain' in workloads:
+            print(f"⏱️  chain: {args.requests} questions at concurrency {args.concurrency}", file=sys.stderr)
+            result = run_chain(db_config, llm_url, args.concurrency, args.requests)
+            result.update(process_memory(os.getpid()))
+            report['results']['chain'] = result
+    finally:
+        if llm_server is not None:
+            llm_server.shutdown()
+        if api is not None:
+            api.terminate()
+            api.wait(30)
+        for server in [mysql] + replicas:
+            if server is not None:
+                server.stop()
+    return report
+
+
+def print_report(report):
+    print(f"{'workload':<13}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'RSS MB':>9}{'PSS MB':>9}")
+    for workload, r in report['results'].items():
+        print(f"{workload:<13}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+              f"{r['errors']:>8}{r['rss_mb']:>9}{r['pss_mb']:>9}")
+    replicas = report.get('replicas')
+    if replicas:
+        print(f"primary reads {replicas['primary_reads']}, failovers {replicas['failovers']} (one worker)")
+        for label, r in replicas['replicas'].items():
+            print(f"  {label:<21}healthy {str(r['healthy']):<6}reads {r['reads']:<8}lag {r['lag_s']}s  "
+                  f"check {r['latency_ms']} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the API and chain against a local MySQL and stub LLM')
+    parser.add_argument('--db', choices=('local', 'docker', 'external'), default='local')
+    parser.add_argument('--db-port', type=int, default=None)
+    parser.add_argument('--image', default='mysql:8.0', help='docker image for --db docker')
+    parser.add_argument('--rows', type=int, default=1000000, help='t_shirts rows to seed')
+    parser.add_argument('--replicas', type=int, default=0, help='extra local servers to route reads to')
+    parser.add_argument('--seed', action=argparse.BooleanOptionalAction, default=None,
+                        help='(re)seed the database (default: only servers started here)')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--workloads', default='execute-sql,query', help=f"comma-separated: {', '.join(WORKLOADS)}")
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed relative regression')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    # Fail before spending minutes on a run that can't be compared
+    baseline = None
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            baseline = json.load(f)
+
+    report = main(args)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print_report(report)
+    if args.save_baseline:
+        save_baseline(args.save_baseline, report)
+        print(f"💾 Saved baseline {baseline_path(args.save_baseline)}", file=sys.stderr)
+    if baseline is not None:
+        if baseline.get('config') != report['config']:
+            print(f"⚠️  Baseline config {baseline.get('config')} differs from this run's {report['config']}",
+                  file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"❌ {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.compare}", file=sys.stderr)
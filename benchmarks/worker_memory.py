@@ -0,0 +1,53 @@
+"""
+AskDB AI - Gunicorn Worker Memory
+RSS vs PSS of a gunicorn master and its workers (Linux). RSS counts shared
+pages once per process; PSS splits them between the processes sharing them,
+so the PSS total is what the host actually pays. With EMBEDDING_PRELOAD=true
+the embedding model shows up as shared memory instead of per-worker RSS.
+
+Usage:
+    python benchmarks/worker_memory.py <gunicorn master pid> [--json]
+"""
+
+import argparse
+import json
+
+
+def _children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory(pid):
+    """{'rss_mb', 'pss_mb', 'shared_mb'} from /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1]) / 1024
+    shared = values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0)
+    return {'rss_mb': round(values.get('Rss', 0), 1), 'pss_mb': round(values.get('Pss', 0), 1),
+            'shared_mb': round(shared, 1)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='RSS/PSS of a gunicorn master and its workers')
+    parser.add_argument('pid', type=int)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    processes = [('master', args.pid)] + [('worker', pid) for pid in _children(args.pid)]
+    report = [dict(role=role, pid=pid, **memory(pid)) for role, pid in processes]
+    totals = {key: round(sum(p[key] for p in report), 1) for key in ('rss_mb', 'pss_mb')}
+
+    if args.json:
+        print(json.dumps({'processes': report, 'total': totals}))
+    else:
+        print(f"{'role':<8}{'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'shared MB':>11}")
+        for p in report:
+            print(f"{p['role']:<8}{p['pid']:>8}{p['rss_mb']:>10}{p['pss_mb']:>10}{p['shared_mb']:>11}")
+        print(f"{'total':<16}{totals['rss_mb']:>10}{totals['pss_mb']:>10}")
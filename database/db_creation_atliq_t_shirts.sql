@@ -46,6 +46,8 @@ BEGIN
 
         -- Attempt to insert a new record
         -- Duplicate brand, color, size combinations will be ignored due to the unique constraint
+        -- (the handler continues with the counter increment, so a duplicate still uses
+        -- up one of the max_records attempts: the table ends up with at most 80 rows)
         BEGIN
             DECLARE CONTINUE HANDLER FOR 1062 BEGIN END;  -- Handle duplicate key error
             INSERT INTO t_shirts (brand, color, size, price, stock_quantity)
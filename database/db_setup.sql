@@ -36,45 +36,94 @@ CREATE TABLE discounts (
     FOREIGN KEY (t_shirt_id) REFERENCES t_shirts (t_shirt_id)
 );
 
--- Create a stored procedure to populate the t_shirts table
-DELIMITER $$
-
-CREATE PROCEDURE PopulateTShirts()
-BEGIN
-    DECLARE counter INT DEFAULT 0;
-    DECLARE max_records INT DEFAULT 100;
-    DECLARE brand ENUM('Van Huesen', 'Levi', 'Nike', 'Adidas');
-    DECLARE color ENUM('Red', 'Blue', 'Black', 'White');
-    DECLARE size ENUM('XS', 'S', 'M', 'L', 'XL');
-    DECLARE price INT;
-    DECLARE stock INT;
-
-    -- Seed the random number generator
-    SET SESSION rand_seed1 = UNIX_TIMESTAMP();
-
-    WHILE counter < max_records DO
-        -- Generate random values
-        SET brand = ELT(FLOOR(1 + RAND() * 4), 'Van Huesen', 'Levi', 'Nike', 'Adidas');
-        SET color = ELT(FLOOR(1 + RAND() * 4), 'Red', 'Blue', 'Black', 'White');
-        SET size = ELT(FLOOR(1 + RAND() * 5), 'XS', 'S', 'M', 'L', 'XL');
-        SET price = FLOOR(10 + RAND() * 41);
-        SET stock = FLOOR(10 + RAND() * 91);
-
-        -- Attempt to insert a new record
-        -- Duplicate brand, color, size combinations will be ignored due to the unique constraint
-        BEGIN
-            DECLARE CONTINUE HANDLER FOR 1062 BEGIN END;  -- Handle duplicate key error
-            INSERT INTO t_shirts (brand, color, size, price, stock_quantity)
-            VALUES (brand, color, size, price, stock);
-            SET counter = counter + 1;
-        END;
-    END WHILE;
-END$$
-
-DELIMITER;
-
--- Call the stored procedure to populate the t_shirts table
-CALL PopulateTShirts ();
+-- Demo data: all 80 unique t-shirts, the same rows as
+-- `python database/generate_data.py --rows 80` (seed 7), and 10 discounts.
+-- This replaces the PopulateTShirts() procedure, which always stopped after 100
+-- attempts: its duplicate-key CONTINUE HANDLER resumes at the counter
+-- increment, so duplicates were counted too and it left at most 80 rows
+-- (about 57 on average), one INSERT at a time.
+INSERT INTO
+    t_shirts (t_shirt_id, brand, color, size, price, stock_quantity)
+VALUES (1, 'Adidas', 'Blue', 'XS', 25, 82),
+    (2, 'Van Huesen', 'Red', 'XS', 48, 90),
+    (3, 'Nike', 'Red', 'L', 45, 48),
+    (4, 'Levi', 'Black', 'S', 23, 60),
+    (5, 'Adidas', 'White', 'XL', 24, 55),
+    (6, 'Adidas', 'Red', 'M', 47, 34),
+    (7, 'Levi', 'Blue', 'L', 50, 96),
+    (8, 'Levi', 'White', 'L', 31, 84),
+    (9, 'Van Huesen', 'White', 'S', 27, 65),
+    (10, 'Nike', 'Blue', 'L', 31, 32),
+    (11, 'Levi', 'Red', 'XL', 25, 11),
+    (12, 'Adidas', 'Red', 'XS', 24, 79),
+    (13, 'Levi', 'Black', 'M', 42, 75),
+    (14, 'Adidas', 'Red', 'L', 20, 50),
+    (15, 'Adidas', 'Black', 'XL', 30, 59),
+    (16, 'Levi', 'White', 'XL', 36, 19),
+    (17, 'Levi', 'Red', 'XS', 14, 55),
+    (18, 'Adidas', 'Black', 'M', 15, 74),
+    (19, 'Van Huesen', 'Black', 'XS', 24, 76),
+    (20, 'Van Huesen', 'Black', 'L', 10, 93),
+    (21, 'Levi', 'Blue', 'XL', 18, 54),
+    (22, 'Levi', 'Red', 'S', 27, 59),
+    (23, 'Van Huesen', 'White', 'XS', 31, 42),
+    (24, 'Levi', 'Black', 'L', 44, 53),
+    (25, 'Nike', 'Blue', 'XL', 10, 38),
+    (26, 'Van Huesen', 'Red', 'S', 18, 89),
+    (27, 'Nike', 'Red', 'M', 17, 53),
+    (28, 'Nike', 'Blue', 'XS', 37, 74),
+    (29, 'Levi', 'Red', 'M', 38, 95),
+    (30, 'Van Huesen', 'White', 'M', 28, 65),
+    (31, 'Nike', 'Blue', 'M', 26, 36),
+    (32, 'Levi', 'Red', 'L', 50, 41),
+    (33, 'Adidas', 'Black', 'L', 32, 81),
+    (34, 'Adidas', 'White', 'S', 36, 26),
+    (35, 'Adidas', 'Blue', 'M', 12, 66),
+    (36, 'Nike', 'Red', 'XL', 32, 36),
+    (37, 'Adidas', 'White', 'L', 28, 60),
+    (38, 'Adidas', 'White', 'M', 30, 58),
+    (39, 'Nike', 'White', 'S', 36, 47),
+    (40, 'Levi', 'Black', 'XL', 31, 67),
+    (41, 'Adidas', 'White', 'XS', 26, 21),
+    (42, 'Levi', 'Blue', 'S', 19, 25),
+    (43, 'Van Huesen', 'White', 'L', 32, 94),
+    (44, 'Adidas', 'Black', 'XS', 29, 48),
+    (45, 'Adidas', 'Red', 'S', 25, 70),
+    (46, 'Van Huesen', 'Red', 'M', 23, 85),
+    (47, 'Adidas', 'Blue', 'S', 36, 15),
+    (48, 'Nike', 'Black', 'S', 20, 15),
+    (49, 'Levi', 'Blue', 'XS', 41, 87),
+    (50, 'Nike', 'White', 'L', 45, 99),
+    (51, 'Nike', 'White', 'M', 16, 61),
+    (52, 'Nike', 'White', 'XL', 25, 50),
+    (53, 'Levi', 'White', 'M', 48, 63),
+    (54, 'Nike', 'Black', 'XL', 28, 21),
+    (55, 'Nike', 'Red', 'XS', 15, 87),
+    (56, 'Van Huesen', 'Black', 'XL', 23, 45),
+    (57, 'Adidas', 'Black', 'S', 23, 71),
+    (58, 'Levi', 'White', 'S', 17, 74),
+    (59, 'Nike', 'Black', 'M', 30, 32),
+    (60, 'Van Huesen', 'Red', 'L', 38, 72),
+    (61, 'Adidas', 'Blue', 'XL', 28, 37),
+    (62, 'Levi', 'White', 'XS', 38, 42),
+    (63, 'Van Huesen', 'Blue', 'XS', 30, 87),
+    (64, 'Levi', 'Black', 'XS', 50, 97),
+    (65, 'Van Huesen', 'Blue', 'L', 22, 90),
+    (66, 'Nike', 'Black', 'L', 12, 68),
+    (67, 'Nike', 'White', 'XS', 43, 81),
+    (68, 'Van Huesen', 'Black', 'S', 17, 66),
+    (69, 'Van Huesen', 'Red', 'XL', 48, 88),
+    (70, 'Levi', 'Blue', 'M', 20, 89),
+    (71, 'Adidas', 'Red', 'XL', 11, 28),
+    (72, 'Van Huesen', 'Blue', 'M', 15, 12),
+    (73, 'Nike', 'Blue', 'S', 22, 91),
+    (74, 'Van Huesen', 'Black', 'M', 30, 16),
+    (75, 'Adidas', 'Blue', 'L', 17, 59),
+    (76, 'Van Huesen', 'Blue', 'XL', 31, 43),
+    (77, 'Van Huesen', 'Blue', 'S', 36, 59),
+    (78, 'Nike', 'Black', 'XS', 10, 99),
+    (79, 'Van Huesen', 'White', 'XL', 22, 64),
+    (80, 'Nike', 'Red', 'S', 21, 71);
 
 -- Insert at least 10 records into the discounts table
 INSERT INTO
@@ -88,4 +137,7 @@ VALUES (1, 10.00),
     (7, 30.00),
     (8, 35.00),
     (9, 40.00),
-    (10, 45.00);
\ No newline at end of file
+    (10, 45.00);
+
+-- Larger data sets come from the generator, which empties these tables first:
+--   python database/generate_data.py --rows 20000000      production scale
@@ -0,0 +1,397 @@
+"""
+AskDB AI - Synthetic Data Generator
+Fills atliq_tshirts with any number of rows, from the 80-shirt demo data set to
+tens of millions, in place of the row-at-a-time PopulateTShirts() procedure
+(which made 100 attempts and kept whichever were unique, at most 80 rows):
+
+    t_shirts      brand / color / size / price / stock; up to 80 rows keep
+                  the UNIQUE (brand, color, size) key, more rows relax it to
+                  a plain index
+    discounts     --discount-rate of the shirts, 5-50% off
+    stores        shops the orders are placed in
+    customers     names, emails, cities
+    orders        customer, store, date and status
+    order_items   1-4 shirts per order
+
+Rows are generated in chunks by --writers processes, each with its own
+connection, and written with LOAD DATA LOCAL INFILE (--method load-data, needs
+local_infile=ON on the server) or multi-row INSERTs (--method insert).
+Foreign key and unique checks are off while loading. Every block of
+RNG_BLOCK ids draws from its own seeded generator, so a given --seed always
+produces the same data, whatever the number of writers or the --chunk size.
+db_setup.sql already holds the --rows 80 data set.
+
+Usage:
+    mysql -u root -p < database/db_setup.sql
+    python database/generate_data.py --rows 80                       # demo data set
+    python database/generate_data.py --rows 20000000 --tables all --writers 8
+    python database/generate_data.py --rows 50000000 --method load-data --recreate
+
+Connection settings come from DB_HOST / DB_PORT / DB_USER / DB_PASSWORD /
+DB_NAME, as for the API server.
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pymysql
+from dotenv import load_dotenv
+
+SETUP_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db_setup.sql')
+
+BRANDS = ('Van Huesen', 'Levi', 'Nike', 'Adidas')
+COLORS = ('Red', 'Blue', 'Black', 'White')
+SIZES = ('XS', 'S', 'M', 'L', 'XL')
+UNIQUE_SHIRTS = len(BRANDS) * len(COLORS) * len(SIZES)
+
+FIRST_NAMES = ('Aarav', 'Priya', 'Rohan', 'Ananya', 'Vikram', 'Sneha', 'Arjun', 'Kavya', 'Rahul', 'Isha',
+               'Karan', 'Meera', 'Aditya', 'Pooja', 'Sanjay', 'Neha', 'Emma', 'Liam', 'Olivia', 'Noah')
+LAST_NAMES = ('Sharma', 'Patel', 'Reddy', 'Iyer', 'Gupta', 'Nair', 'Singh', 'Rao', 'Mehta', 'Joshi',
+              'Kumar', 'Das', 'Shah', 'Menon', 'Smith', 'Brown', 'Garcia', 'Miller')
+CITIES = (('Mumbai', 'India'), ('Delhi', 'India'), ('Bengaluru', 'India'), ('Hyderabad', 'India'),
+          ('Chennai', 'India'), ('Pune', 'India'), ('Kolkata', 'India'), ('Ahmedabad', 'India'),
+          ('Jaipur', 'India'), ('Kochi', 'India'), ('Dubai', 'UAE'), ('Singapore', 'Singapore'),
+          ('London', 'UK'), ('New York', 'USA'))
+ORDER_STATUSES = ('placed', 'shipped', 'delivered', 'returned', 'cancelled')
+ORDER_STATUS_WEIGHTS = (10, 15, 65, 6, 4)
+EPOCH = datetime.datetime(2022, 1, 1)
+SPAN_SECONDS = 3 * 365 * 24 * 3600
+
+# Tables db_setup.sql doesn't create; made on first use
+EXTRA_TABLES_DDL = {
+    'stores': """CREATE TABLE IF NOT EXISTS stores (
+        store_id INT PRIMARY KEY,
+        name VARCHAR(64) NOT NULL,
+        city VARCHAR(64) NOT NULL,
+        country VARCHAR(64) NOT NULL,
+        opened_on DATE NOT NULL
+    ) COMMENT = 'AtliQ retail stores'""",
+    'customers': """CREATE TABLE IF NOT EXISTS customers (
+        customer_id INT PRIMARY KEY,
+        name VARCHAR(96) NOT NULL,
+        email VARCHAR(128) NOT NULL,
+        city VARCHAR(64) NOT NULL,
+        country VARCHAR(64) NOT NULL,
+        created_at DATETIME NOT NULL
+    ) COMMENT = 'Registered shoppers'""",
+    'orders': """CREATE TABLE IF NOT EXISTS orders (
+        order_id INT PRIMARY KEY,
+        customer_id INT NOT NULL,
+        store_id INT NOT NULL,
+        order_date DATETIME NOT NULL,
+        status ENUM('placed', 'shipped', 'delivered', 'returned', 'cancelled') NOT NULL,
+        KEY order_date (order_date),
+        FOREIGN KEY (customer_id) REFERENCES customers (customer_id),
+        FOREIGN KEY (store_id) REFERENCES stores (store_id)
+    ) COMMENT = 'Sales orders, one per checkout'""",
+    'order_items': """CREATE TABLE IF NOT EXISTS order_items (
+        order_item_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        order_id INT NOT NULL,
+        t_shirt_id INT NOT NULL,
+        quantity INT NOT NULL,
+        unit_price INT NOT NULL,
+        FOREIGN KEY (order_id) REFERENCES orders (order_id),
+        FOREIGN KEY (t_shirt_id) REFERENCES t_shirts (t_shirt_id)
+    ) COMMENT = 'T-shirts sold in each order, at the price paid'""",
+}
+
+
+# ============================================================================
+# ROWS
+# ============================================================================
+
+def _timestamp(rng):
+    return (EPOCH + datetime.timedelta(seconds=rng.randrange(SPAN_SECONDS))).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _t_shirts(rng, start, stop, counts, seed):
+    if counts['t_shirts'] <= UNIQUE_SHIRTS:
+        combos = list(itertools.product(BRANDS, COLORS, SIZES))
+        random.Random(seed).shuffle(combos)
+        return [(i, *combos[i - 1], rng.randint(10, 50), rng.randint(10, 100)) for i in range(start, stop)]
+    return [(i, rng.choice(BRANDS), rng.choice(COLORS), rng.choice(SIZES), rng.randint(10, 50),
+             rng.randint(10, 100)) for i in range(start, stop)]
+
+
+def _discounts(rng, start, stop, counts, seed):
+    rate = counts['discount_rate']
+    return [(i, 5 * rng.randint(1, 10)) for i in range(start, stop) if rng.random() < rate]
+
+
+def _stores(rng, start, stop, counts, seed):
+    rows = []
+    for i in range(start, stop):
+        city, country = CITIES[(i - 1) % len(CITIES)]
+        opened = EPOCH - datetime.timedelta(days=rng.randrange(3650))
+        rows.append((i, f"AtliQ {city} #{(i - 1) // len(CITIES) + 1}", city, country, opened.strftime('%Y-%m-%d')))
+    return rows
+
+
+def _customers(rng, start, stop, counts, seed):
+    rows = []
+    for i in range(start, stop):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        city, country = rng.choice(CITIES)
+        rows.append((i, f"{first} {last}", f"{first}.{last}{i}@example.com".lower(), city, country, _timestamp(rng)))
+    return rows
+
+
+def _orders(rng, start, stop, counts, seed):
+    return [(i, rng.randint(1, counts['customers']), rng.randint(1, counts['stores']), _timestamp(rng),
+             rng.choices(ORDER_STATUSES, ORDER_STATUS_WEIGHTS)[0]) for i in range(start, stop)]
+
+
+def _order_items(rng, start, stop, counts, seed):
+    return [(order, rng.randint(1, counts['t_shirts']), rng.randint(1, 5), rng.randint(10, 50))
+            for order in range(start, stop) for _ in range(rng.randint(1, 4))]
+
+
+# table -> (columns written, row maker, table whose ids the chunks range over,
+#           tables the rows reference)
+TABLES = {
+    't_shirts': (('t_shirt_id', 'brand', 'color', 'size', 'price', 'stock_quantity'), _t_shirts, 't_shirts', ()),
+    'discounts': (('t_shirt_id', 'pct_discount'), _discounts, 't_shirts', ('t_shirts',)),
+    'stores': (('store_id', 'name', 'city', 'country', 'opened_on'), _stores, 'stores', ()),
+    'customers': (('customer_id', 'name', 'email', 'city', 'country', 'created_at'), _customers, 'customers', ()),
+    'orders': (('order_id', 'customer_id', 'store_id', 'order_date', 'status'), _orders, 'orders',
+               ('customers', 'stores')),
+    'order_items': (('order_id', 't_shirt_id', 'quantity', 'unit_price'), _order_items, 'orders',
+                    ('orders', 't_shirts')),
+}
+ID_COLUMNS = {'t_shirts': 't_shirt_id', 'stores': 'store_id', 'customers': 'customer_id', 'orders': 'order_id'}
+
+# Ids per seeded generator. Row makers draw row by row, so a chunk starting
+# inside a block replays the block's earlier rows to reach the same state.
+RNG_BLOCK = 10000
+
+
+def make_rows(table, start, stop, counts, seed):
+    """Rows of table for ids [start, stop), the same however the ids are chunked"""
+    make = TABLES[table][1]
+    rows = []
+    block = (start - 1) // RNG_BLOCK * RNG_BLOCK + 1
+    while block < stop:
+        rng = random.Random(f"{seed}:{table}:{block}")
+        first = max(start, block)
+        if first > block:
+            make(rng, block, first, counts, seed)
+        rows += make(rng, first, min(stop, block + RNG_BLOCK), counts, seed)
+        block += RNG_BLOCK
+    return rows
+
+
+# ============================================================================
+# WRITERS
+# ============================================================================
+
+_connection = None
+_method = None
+
+
+def _init_writer(config, method):
+    global _connection, _method
+    _connection = pymysql.connect(**config, autocommit=True, local_infile=method == 'load-data')
+    _method = method
+    with _connection.cursor() as cursor:
+        cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+
+
+def _write_chunk(task):
+    """Generate and write one chunk; returns (table, rows written)"""
+    table, start, stop, counts, seed, batch = task
+    columns = TABLES[table][0]
+    rows = make_rows(table, start, stop, counts, seed)
+    column_list = ', '.join(columns)
+    with _connection.cursor() as cursor:
+        if _method == 'load-data':
+            # No value contains tabs, newlines or backslashes, so no escaping
+            with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False) as f:
+                f.writelines('\t'.join(map(str, row)) + '\n' for row in rows)
+            try:
+                cursor.execute(f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+                               f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({column_list})", (f.name,))
+            finally:
+                os.unlink(f.name)
+        else:
+            statement = f"INSERT INTO {table} ({column_list}) VALUES ({', '.join(['%s'] * len(columns))})"
+            for offset in range(0, len(rows), batch):
+                # executemany folds these into multi-row INSERTs
+                cursor.executemany(statement, rows[offset:offset + batch])
+    return table, len(rows)
+
+
+# ============================================================================
+# GENERATE
+# ============================================================================
+
+def split_statements(script):
+    """Statements of a mysql client script, honouring DELIMITER and -- comments"""
+    statements, current, delimiter = [], [], ';'
+    for line in script.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith('DELIMITER'):
+            delimiter = stripped[len('DELIMITER'):].strip() or ';'
+            continue
+        if not current and (not stripped or stripped.startswith('--')):
+            continue
+        current.append(line)
+        if stripped.endswith(delimiter):
+            statement = '\n'.join(current).strip()
+            statements.append(statement[:-len(delimiter)].strip())
+            current = []
+    if current and '\n'.join(current).strip():
+        statements.append('\n'.join(current).strip())
+    return statements
+
+
+def _unique_key(cursor, database):
+    cursor.execute("SELECT NON_UNIQUE FROM information_schema.STATISTICS "
+                   "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 't_shirts' AND INDEX_NAME = 'brand_color_size' "
+                   "LIMIT 1", (database,))
+    row = cursor.fetchone()
+    return row is not None and int(row[0]) == 0
+
+
+def _prepare(config, tables, counts, recreate):
+    """Create / empty the tables and fill in the id ranges of referenced
+    tables that aren't being generated"""
+    database = config['database']
+    connection = pymysql.connect(**dict(config, database=None), autocommit=True)
+    try:
+        with connection.cursor() as cursor:
+            if recreate:
+                with open(SETUP_SQL) as f:
+                    for statement in split_statements(f.read()):
+                        cursor.execute(statement)
+            cursor.execute(f"USE `{database}`")
+            cursor.execute("SET SESSION foreign_key_checks = 0")
+            for table in tables:
+                if table in EXTRA_TABLES_DDL:
+                    cursor.execute(EXTRA_TABLES_DDL[table])
+                cursor.execute(f"TRUNCATE TABLE {table}")
+            if 't_shirts' in tables and counts['t_shirts'] > UNIQUE_SHIRTS and _unique_key(cursor, database):
+                cursor.execute("ALTER TABLE t_shirts DROP INDEX brand_color_size, "
+                               "ADD INDEX brand_color_size (brand, color, size)")
+            for table in tables:
+                for parent in TABLES[table][3] + (TABLES[table][2],):
+                    if parent in tables:
+                        continue
+                    cursor.execute(f"SELECT COALESCE(MAX({ID_COLUMNS[parent]}), 0) FROM {parent}")
+                    counts[parent] = int(cursor.fetchone()[0])
+                    if not counts[parent]:
+                        raise ValueError(f"{table} needs rows in {parent}; add it to --tables")
+    finally:
+        connection.close()
+
+
+def _analyze(config, tables):
+    connection = pymysql.connect(**config, autocommit=True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE TABLE {', '.join(tables)}")
+    finally:
+        connection.close()
+
+
+def generate(config, rows, tables=('t_shirts', 'discounts'), customers=None, orders=None, stores=50,
+             discount_rate=0.1, method='insert', writers=4, chunk=100000, batch=5000, seed=7,
+             recreate=False, progress=None):
+    """Fill tables with synthetic data; returns a report of rows and rows/sec.
+
+    rows is the number of t_shirts; customers and orders default to rows / 10
+    and rows. progress, if given, is called with (rows written, elapsed seconds).
+    """
+    unknown = set(tables) - set(TABLES)
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(sorted(unknown))}")
+    tables = [t for t in TABLES if t in tables]
+    counts = {'t_shirts': rows, 'stores': stores, 'discount_rate': discount_rate,
+              'customers': customers if customers is not None else max(1, rows // 10),
+              'orders': orders if orders is not None else rows}
+    _prepare(config, tables, counts, recreate)
+
+    tasks = [(table, start, min(start + chunk, counts[TABLES[table][2]] + 1), counts, seed, batch)
+             for table in tables for start in range(1, counts[TABLES[table][2]] + 1, chunk)]
+    written = dict.fromkeys(tables, 0)
+    start = time.perf_counter()
+    with multiprocessing.Pool(max(1, writers), _init_writer, (config, method)) as pool:
+        for table, count in pool.imap_unordered(_write_chunk, tasks):
+            written[table] += count
+            if progress is not None:
+                progress(sum(written.values()), time.perf_counter() - start)
+    elapsed = time.perf_counter() - start
+    _analyze(config, tables)
+
+    total = sum(written.values())
+    return {
+        'method': method,
+        'writers': writers,
+        'tables': written,
+        'rows': total,
+        'elapsed_s': round(elapsed, 2),
+        'rows_per_s': round(total / elapsed) if elapsed else 0,
+    }
+
+
+def db_config():
+    load_dotenv()
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'user': os.getenv('DB_USER', 'root'),
+        'password': os.getenv('DB_PASSWORD', ''),
+        'database': os.getenv('DB_NAME', 'atliq_tshirts'),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fill atliq_tshirts with synthetic data')
+    parser.add_argument('--rows', type=int, default=1000000, help='t_shirts rows (80 or fewer keeps them unique)')
+    parser.add_argument('--tables', default='t_shirts,discounts', help=f"comma-separated, or all: {', '.join(TABLES)}")
+    parser.add_argument('--customers', type=int, default=None, help='default: rows / 10')
+    parser.add_argument('--orders', type=int, default=None, help='default: rows')
+    parser.add_argument('--stores', type=int, default=50)
+    parser.add_argument('--discount-rate', type=float, default=0.1, help='share of shirts with a discount')
+    parser.add_argument('--method', choices=('insert', 'load-data'), default='insert')
+    parser.add_argument('--writers', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--chunk', type=int, default=100000, help='rows generated per task')
+    parser.add_argument('--batch', type=int, default=5000, help='rows per INSERT statement')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--recreate', action='store_true', help='run db_setup.sql first (drops the database)')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    tables = list(TABLES) if args.tables == 'all' else [t.strip() for t in args.tables.split(',') if t.strip()]
+    last_print = [0.0]
+
+    def progress(total, elapsed):
+        if elapsed - last_print[0] >= 5:
+            last_print[0] = elapsed
+            print(f"  {total:,} rows, {total / elapsed:,.0f} rows/s", file=sys.stderr)
+
+    try:
+        report = generate(db_config(), args.rows, tables, args.customers, args.orders, args.stores,
+                          args.discount_rate, args.method, args.writers, args.chunk, args.batch, args.seed,
+                          args.recreate, progress)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    except pymysql.err.MySQLError as e:
+        if args.method == 'load-data' and e.args and e.args[0] in (1148, 2068, 3948):
+            raise SystemExit("❌ LOAD DATA LOCAL is disabled; set local_infile=ON on the server or use --method insert")
+        raise
+
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for table, count in report['tables'].items():
+            print(f"{table:<13}{count:>14,}")
+        print(f"✅ {report['rows']:,} rows in {report['elapsed_s']}s with {report['writers']} {report['method']} "
+              f"writers: {report['rows_per_s']:,} rows/s")
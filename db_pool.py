@@ -0,0 +1,237 @@
+"""
+AskDB AI - Shared MySQL Connection Pool
+Bounded pymysql pool used by both the Flask API and the LangChain helper
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pymysql
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+def default_pool_size():
+    """Connections per process.
+
+    DB_POOL_SIZE wins if set. Otherwise DB_POOL_MAX_TOTAL (the connection budget
+    for the whole host) is split across gunicorn workers using WEB_CONCURRENCY,
+    the same variable gunicorn reads for its worker count.
+    """
+    if os.getenv('DB_POOL_SIZE'):
+        return max(1, int(os.getenv('DB_POOL_SIZE')))
+    max_total = os.getenv('DB_POOL_MAX_TOTAL')
+    if max_total:
+        workers = max(1, int(os.getenv('WEB_CONCURRENCY', 1)))
+        return max(1, int(max_total) // workers)
+    return 5
+
+
+class ConnectionPool:
+    """Thread-safe bounded pool of pymysql connections.
+
+    Connections are pinged on checkout (idle ones that fail are replaced) and
+    recycled once they are older than max_lifetime seconds. All connections run
+    in autocommit mode so a reused connection never serves reads from a stale
+    REPEATABLE READ snapshot.
+    """
+
+    def __init__(self, db_config, max_size=None, timeout=None, max_lifetime=None):
+        self.db_config = dict(db_config)
+        self.max_size = max_size or default_pool_size()
+        self.timeout = timeout if timeout is not None else float(os.getenv('DB_POOL_TIMEOUT', 10))
+        self.max_lifetime = max_lifetime if max_lifetime is not None else float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+
+        self._cond = threading.Condition()
+        self._idle = deque()      # (connection, created_at)
+        self._created_at = {}     # id(connection) -> created_at for checked-out connections
+        self._size = 0            # open connections, idle + in use
+        self._in_use = 0
+
+        # Metrics
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._connects = 0
+        self._recycled = 0
+        self._ping_failures = 0
+
+    # ------------------------------------------------------------------
+    # Checkout / return
+    # ------------------------------------------------------------------
+    def acquire(self):
+        """Check out a healthy connection, blocking up to self.timeout seconds"""
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        wait_start = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, created_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, created_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    if waited:
+                        self._wait_time += time.monotonic() - wait_start
+                    raise PoolTimeout(f'No database connection available after {self.timeout}s '
+                                      f'(pool size {self.max_size})')
+                if not waited:
+                    waited = True
+                    wait_start = time.monotonic()
+                    self._waits += 1
+                self._cond.wait(remaining)
+            if waited:
+                self._wait_time += time.monotonic() - wait_start
+            self._in_use += 1
+            self._checkouts += 1
+
+        try:
+            conn, created_at = self._validate(conn, created_at)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        self._created_at[id(conn)] = created_at
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, or close it if discard is set or it is broken"""
+        created_at = self._created_at.pop(id(conn), time.monotonic())
+        if not discard and not conn.open:
+            discard = True
+        if discard:
+            self._close(conn)
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append((conn, created_at))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager around acquire()/release()"""
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # Connection-level failure: don't hand this socket to the next caller
+            discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def close_all(self):
+        """Close idle connections. Checked-out connections close when released."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _connect(self):
+        conn = pymysql.connect(autocommit=True, **self.db_config)
+        self._connects += 1
+        return conn, time.monotonic()
+
+    def _validate(self, conn, created_at):
+        if conn is None:
+            return self._connect()
+        if time.monotonic() - created_at > self.max_lifetime:
+            self._recycled += 1
+            self._close(conn)
+            return self._connect()
+        try:
+            conn.ping(reconnect=False)
+        except pymysql.Error:
+            self._ping_failures += 1
+            self._close(conn)
+            return self._connect()
+        return conn, created_at
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        """Snapshot of pool metrics"""
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_ms': int(self._wait_time * 1000),
+                'timeouts': self._timeouts,
+                'connects': self._connects,
+                'recycled': self._recycled,
+                'ping_failures': self._ping_failures,
+            }
+
+
+# ============================================================================
+# PROCESS-WIDE REGISTRY
+# ============================================================================
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def _pool_key(db_config):
+    return (db_config.get('host'), int(db_config.get('port', 3306)),
+            db_config.get('user'), db_config.get('database'))
+
+
+def get_pool(db_config):
+    """Return the shared pool for db_config, creating it on first use.
+
+    Pools are per process: if we find ourselves in a forked child (e.g. a
+    gunicorn worker after preload) the inherited pools are dropped without
+    closing, since their sockets belong to the parent.
+    """
+    global _pools_pid
+    key = _pool_key(db_config)
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_config)
+            _pools[key] = pool
+        return pool
+
+
+def pool_stats():
+    """Metrics for every pool in this process, keyed by host:port/database"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {f'{host}:{port}/{database}': pool.stats()
+            for (host, port, _user, database), pool in pools.items()}
@@ -0,0 +1,306 @@
+"""
+AskDB AI - Read Replica Routing
+Sends read-only traffic (/api/execute-sql, /api/query, the metadata
+endpoints) to MySQL read replicas instead of the primary in DB_CONFIG:
+
+    select     round_robin over the healthy replicas, or least_latency: the
+               lowest moving average of health-check round trips
+    health     every DB_REPLICA_CHECK_INTERVAL seconds (in the background,
+               after the first check) each replica is asked for its
+               replication status; one that is down, has replication
+               stopped or is more than DB_REPLICA_MAX_LAG seconds behind is
+               skipped until a later check finds it healthy again
+    failover   no healthy replica -> the primary; a replica that fails to
+               connect mid-request is marked down and the request repeated
+               on the primary
+
+Replicas share DB_CONFIG's user, password and database. A server with no
+replication configured counts as up to date, so two standalone local MySQL
+instances can stand in for primary and replica.
+
+Per-route statement timeouts go into the cost guard's MAX_EXECUTION_TIME hint
+(sql_guard.py), so MySQL aborts slow statements server-side.
+
+The schema cache keeps reading information_schema on the primary: its polls
+are small, and its UPDATE_TIMEs invalidate the result cache. Entries are
+stamped with those primary versions, so /api/execute-sql only stores results
+that the primary served; rows from a lagging replica would otherwise pass for
+current until the TTL. Replica-routed reads can still hit entries the primary
+stored.
+
+Environment:
+    DB_REPLICAS=host1:3306,host2          empty: everything reads from the primary
+    DB_REPLICA_SELECT=round_robin|least_latency
+    DB_REPLICA_MAX_LAG=5                  seconds
+    DB_REPLICA_CHECK_INTERVAL=5           seconds
+    DB_REPLICA_CONNECT_TIMEOUT=2          seconds, so a dead replica fails fast
+    STATEMENT_TIMEOUT_EXECUTE_SQL_MS      /api/execute-sql (default SQL_GUARD_MAX_EXECUTION_MS)
+    STATEMENT_TIMEOUT_QUERY_MS            /api/query (default SQL_GUARD_MAX_EXECUTION_MS)
+    STATEMENT_TIMEOUT_METADATA_MS=5000    /api/database/*
+"""
+
+import itertools
+import os
+import threading
+import time
+
+import pymysql
+
+import metrics
+from sql_guard import MAX_EXECUTION_MS
+
+DB_REPLICAS = os.getenv('DB_REPLICAS', '')
+REPLICA_SELECT = os.getenv('DB_REPLICA_SELECT', 'round_robin').lower()
+REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 5))
+REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 5))
+REPLICA_CONNECT_TIMEOUT = int(float(os.getenv('DB_REPLICA_CONNECT_TIMEOUT', 2)))
+
+STATEMENT_TIMEOUTS = {
+    'execute-sql': int(os.getenv('STATEMENT_TIMEOUT_EXECUTE_SQL_MS', MAX_EXECUTION_MS)),
+    'query': int(os.getenv('STATEMENT_TIMEOUT_QUERY_MS', MAX_EXECUTION_MS)),
+    'metadata': int(os.getenv('STATEMENT_TIMEOUT_METADATA_MS', 5000)),
+}
+
+# Client-side connection failures (can't connect, server gone, lost connection)
+_CONNECTION_ERRORS = {2003, 2005, 2006, 2013, 2055}
+_LATENCY_WEIGHT = 0.3
+
+
+def statement_timeout(route):
+    """MAX_EXECUTION_TIME in ms for a route ('execute-sql', 'query', 'metadata')"""
+    return STATEMENT_TIMEOUTS[route]
+
+
+def is_connection_error(error):
+    """Whether error means the server couldn't be reached (as opposed to bad SQL
+    or a statement timeout), so the same read may succeed elsewhere"""
+    if isinstance(error, pymysql.err.OperationalError) and error.args:
+        return error.args[0] in _CONNECTION_ERRORS
+    return isinstance(error, pymysql.err.InterfaceError)
+
+
+def parse_replicas(spec, primary):
+    """'host1:3306,host2' -> DB_CONFIG-style dicts sharing primary's credentials"""
+    replicas = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(':') if ':' in item else (item, '', '')
+        replicas.append(dict(primary, host=host, port=int(port or 3306),
+                             connect_timeout=REPLICA_CONNECT_TIMEOUT))
+    return replicas
+
+
+def _label(db_config):
+    return f"{db_config['host']}:{db_config.get('port', 3306)}"
+
+
+class _Replica:
+    __slots__ = ('config', 'label', 'healthy', 'lag', 'latency', 'error', 'reads', 'failures', 'checked_at')
+
+    def __init__(self, config):
+        self.config = config
+        self.label = _label(config)
+        self.healthy = False
+        self.lag = None          # seconds behind the primary; None when unknown
+        self.latency = None      # moving average of check round trips, seconds
+        self.error = None
+        self.reads = 0
+        self.failures = 0
+        self.checked_at = 0.0
+
+
+class ReplicaRouter:
+    """Picks the database for each read: a healthy replica, or the primary.
+
+    Only the request that starts the first health check waits for it
+    (requests arriving meanwhile read from the primary). After that, when the
+    check interval has elapsed the current state is used and the replicas
+    are re-checked in a background thread.
+    """
+
+    def __init__(self, primary, replicas=(), strategy=None, max_lag=None, check_interval=None):
+        self.primary = primary
+        self.strategy = strategy or REPLICA_SELECT
+        if self.strategy not in ('round_robin', 'least_latency'):
+            raise ValueError(f"Unknown replica selection {self.strategy!r}")
+        self.max_lag = REPLICA_MAX_LAG if max_lag is None else max_lag
+        self.check_interval = REPLICA_CHECK_INTERVAL if check_interval is None else check_interval
+        self._replicas = [_Replica(config) for config in replicas]
+        self._by_label = {r.label: r for r in self._replicas}
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        self._checked_at = None
+        self._checking = False
+        self._primary_reads = 0
+        self._failovers = 0
+
+    @property
+    def enabled(self):
+        return bool(self._replicas)
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+    def read_config(self):
+        """DB_CONFIG-style dict for the next read"""
+        if not self._replicas:
+            return self.primary
+        self._ensure_checked()
+        with self._lock:
+            healthy = [r for r in self._replicas if r.healthy]
+            if not healthy:
+                self._primary_reads += 1
+                metrics.record_db_route('primary')
+                return self.primary
+            if self.strategy == 'least_latency':
+                best = min(r.latency for r in healthy)
+                # Round robin among replicas within a millisecond of the fastest
+                healthy = [r for r in healthy if r.latency - best < 0.001]
+            replica = healthy[next(self._turn) % len(healthy)]
+            replica.reads += 1
+        metrics.record_db_route('replica')
+        return replica.config
+
+    def is_primary(self, db_config):
+        """Whether db_config (as passed to a read) is the primary"""
+        return db_config is self.primary or _label(db_config) == _label(self.primary)
+
+    def fail_over(self, db_config, error):
+        """The primary's config if db_config is a replica that error shows to be
+        unreachable (the replica is marked down until its next good check),
+        else None"""
+        replica = self._by_label.get(_label(db_config)) if db_config is not self.primary else None
+        if replica is None or not is_connection_error(error):
+            return None
+        with self._lock:
+            replica.healthy = False
+            replica.error = str(error)
+            replica.failures += 1
+            self._failovers += 1
+        metrics.record_db_route('failover')
+        return self.primary
+
+    def run(self, read, db_config=None):
+        """read(db_config) on db_config (default: read_config()), repeated on the
+        primary if a replica turns out to be unreachable"""
+        db_config = db_config or self.read_config()
+        try:
+            return read(db_config)
+        except Exception as e:
+            primary = self.fail_over(db_config, e)
+            if primary is None:
+                raise
+            return read(primary)
+
+    # ------------------------------------------------------------------
+    # Health checks
+    # ------------------------------------------------------------------
+    def _ensure_checked(self):
+        with self._lock:
+            if self._checking:
+                # Another request is checking; until the first check finishes
+                # no replica is healthy, so reads go to the primary meanwhile
+                return
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return
+            first = self._checked_at is None
+            self._checking = True
+        if first:
+            self.check()
+        else:
+            threading.Thread(target=self.check, name='replica-check', daemon=True).start()
+
+    def check(self):
+        """Re-check every replica now"""
+        try:
+            for replica in self._replicas:
+                healthy, lag, latency, error = self._probe(replica)
+                with self._lock:
+                    replica.healthy = healthy
+                    replica.lag = lag
+                    replica.error = error
+                    replica.checked_at = time.time()
+                    if latency is not None:
+                        replica.latency = latency if replica.latency is None else \
+                            (1 - _LATENCY_WEIGHT) * replica.latency + _LATENCY_WEIGHT * latency
+        finally:
+            with self._lock:
+                self._checked_at = time.monotonic()
+                self._checking = False
+
+    def _probe(self, replica):
+        """(healthy, lag seconds, round trip seconds, error)"""
+        # A connection of its own: a replica whose pool is busy is still healthy
+        start = time.perf_counter()
+        try:
+            connection = pymysql.connect(**replica.config)
+            try:
+                status = self._replication_status(connection)
+            finally:
+                connection.close()
+        except Exception as e:
+            return False, None, None, str(e)
+        latency = time.perf_counter() - start
+
+        if status is None:
+            return True, 0.0, latency, None     # not a replica: nothing to lag behind
+        lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        if lag is None:
+            return False, None, latency, 'replication is not running'
+        lag = float(lag)
+        if lag > self.max_lag:
+            return False, lag, latency, f'{lag:.0f}s behind the primary (max {self.max_lag:.0f}s)'
+        return True, lag, latency, None
+
+    @staticmethod
+    def _replication_status(connection):
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except pymysql.err.ProgrammingError:
+                # MySQL before 8.0.22 / MariaDB before 10.5
+                cursor.execute("SHOW SLAVE STATUS")
+            return cursor.fetchone()
+
+    def stats(self):
+        """Snapshot of replica health and routing counts"""
+        with self._lock:
+            return {
+                'strategy': self.strategy,
+                'max_lag_s': self.max_lag,
+                'primary': _label(self.primary),
+                'primary_reads': self._primary_reads,
+                'failovers': self._failovers,
+                'replicas': {
+                    r.label: {
+                        'healthy': r.healthy,
+                        'lag_s': r.lag,
+                        'latency_ms': round(r.latency * 1000, 1) if r.latency is not None else None,
+                        'reads': r.reads,
+                        'failures': r.failures,
+                        'error': r.error,
+                    }
+                    for r in self._replicas
+                },
+            }
+
+
+# ============================================================================
+# PROCESS-WIDE REGISTRY
+# ============================================================================
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(primary):
+    """Shared ReplicaRouter for primary, with the DB_REPLICAS replicas"""
+    key = (primary.get('host'), int(primary.get('port', 3306)), primary.get('database'))
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is None:
+            router = ReplicaRouter(primary, parse_replicas(DB_REPLICAS, primary))
+            _routers[key] = router
+        return router
@@ -0,0 +1,247 @@
+"""
+AskDB AI - Micro-Batching Embedding Service
+Coalesces single embed/search calls that arrive within a few milliseconds of
+each other into one batched call: one sentence-transformers forward pass for
+many questions instead of one per question.
+
+    MicroBatcher          generic: submit(item) -> result, run as fn(items) in batches
+    MicroBatchEmbedder    LangChain Embeddings wrapper; embed_query() is micro-batched,
+                          vectors are L2-normalized with NumPy
+    load_embeddings       the configured model backend (torch or ONNX Runtime)
+    get_embeddings        process-wide, micro-batched instance of the model; loaded
+                          once in the gunicorn master with EMBEDDING_PRELOAD=true
+                          (gunicorn.conf.py) and shared copy-on-write by the workers
+
+Environment:
+    EMBEDDING_BACKEND=huggingface|onnx   torch sentence-transformers, or ONNX Runtime
+                                 (onnx_embeddings.py, ONNX_VARIANT=int8|fp32)
+    EMBED_MICRO_BATCH=true       wrap the embedding model (langchain_helper)
+    EMBED_BATCH_WINDOW_MS=2      how long the first request waits for company
+    EMBED_MAX_BATCH=64           largest batch per forward pass
+    EMBEDDING_PRELOAD=false      load the model in the gunicorn master before fork
+"""
+
+import gc
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+MICRO_BATCH_ENABLED = os.getenv('EMBED_MICRO_BATCH', 'true').lower() == 'true'
+BATCH_WINDOW_MS = float(os.getenv('EMBED_BATCH_WINDOW_MS', 2))
+MAX_BATCH = int(os.getenv('EMBED_MAX_BATCH', 64))
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'huggingface').lower()
+EMBEDDING_BACKENDS = ('huggingface', 'onnx')
+EMBEDDING_PRELOAD = os.getenv('EMBEDDING_PRELOAD', 'false').lower() == 'true'
+
+
+def load_embeddings(model_name, backend=None):
+    """Embeddings for model_name from the configured backend"""
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == 'onnx':
+        from onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(model_name)
+    if backend == 'huggingface':
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected one of {', '.join(EMBEDDING_BACKENDS)})")
+
+
+# ============================================================================
+# SHARED MODEL
+# ============================================================================
+
+_embeddings_registry = {}
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings(model_name, backend=None):
+    """Process-wide embeddings for model_name, wrapped in MicroBatchEmbedder
+    when EMBED_MICRO_BATCH is on. A model preloaded by the gunicorn master is
+    found here by every worker without loading it again."""
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    key = (model_name, backend)
+    with _embeddings_lock:
+        embeddings = _embeddings_registry.get(key)
+        if embeddings is None:
+            embeddings = load_embeddings(model_name, backend)
+            if MICRO_BATCH_ENABLED:
+                embeddings = MicroBatchEmbedder(embeddings)
+            _embeddings_registry[key] = embeddings
+        return embeddings
+
+
+def loaded_embeddings():
+    """Any embeddings already in this process (loaded or inherited), or None"""
+    with _embeddings_lock:
+        return next(iter(_embeddings_registry.values()), None)
+
+
+def preload_embeddings(model_name, backend=None):
+    """Load the model in a pre-fork master so workers share its pages.
+
+    Only the torch backend is preloaded: ONNX Runtime sessions start their
+    thread pools at creation and those don't survive fork (the int8 model is
+    small enough to load per worker anyway). torch is held to one thread here
+    so the master never starts an OpenMP pool, which would deadlock forked
+    children; workers pick their own count (gunicorn.conf.py post_fork).
+    Returns the embeddings, or None when nothing was preloaded.
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend != 'huggingface':
+        return None
+    import torch
+    torch.set_num_threads(1)
+    embeddings = get_embeddings(model_name, backend)
+    # Keep the collector from writing to (and so un-sharing) every object
+    # inherited from the master
+    gc.collect()
+    gc.freeze()
+    return embeddings
+
+
+def embedding_index_key(model_name, backend=None):
+    """Model identity for persisted vectors: indexes built by one backend or
+    quantization are never searched with vectors from another"""
+    if (backend or EMBEDDING_BACKEND).lower() == 'onnx':
+        from onnx_embeddings import variant_name
+        return f"{model_name}@onnx-{variant_name()}"
+    return model_name
+
+
+def normalize_rows(vectors):
+    """Unit-length rows (zero rows stay zero)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class MicroBatcher:
+    """Run fn over batches of items submitted one at a time from many threads.
+
+    A worker thread takes the first waiting item, then keeps collecting for up
+    to window_ms (or until max_batch items) and calls fn(items) once; fn must
+    return one result per item, in order. An exception from fn is raised in
+    every caller of that batch.
+    """
+
+    def __init__(self, fn, max_batch=None, window_ms=None, name='micro-batch'):
+        self.fn = fn
+        self.max_batch = max_batch or MAX_BATCH
+        self.window = (BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+        self._batches = 0
+        self._items = 0
+        self._largest = 0
+
+    def submit(self, item, timeout=None):
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future))
+        return future.result(timeout)
+
+    def stats(self):
+        return {
+            'batches': self._batches,
+            'items': self._items,
+            'avg_batch': round(self._items / self._batches, 2) if self._batches else 0.0,
+            'largest_batch': self._largest,
+            'queued': self._queue.qsize(),
+        }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            # Threads don't survive fork: start a fresh worker (and queue) per process
+            if self._worker is None or self._worker_pid != os.getpid():
+                if self._worker_pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.fn(items)
+            except BaseException as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self._batches += 1
+            self._items += len(batch)
+            self._largest = max(self._largest, len(batch))
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+class MicroBatchEmbedder(Embeddings):
+    """Embeddings wrapper: concurrent embed_query() calls share a forward pass.
+
+    embed_documents() is already a batch and goes straight to the model in
+    max_batch chunks. For sentence-transformers models the underlying
+    SentenceTransformer.encode is called directly with NumPy output. Vectors
+    are normalized here; all-MiniLM-L6-v2 already emits unit vectors, so
+    indexes built before this wrapper keep matching.
+    """
+
+    def __init__(self, base, max_batch=None, window_ms=None, normalize=True):
+        self.base = base
+        self.max_batch = max_batch or MAX_BATCH
+        self.normalize = normalize
+        self._batcher = MicroBatcher(self._encode, self.max_batch, window_ms, name='embed-batch')
+
+    def __getattr__(self, attr):
+        # model_name, client, ... of the wrapped embeddings
+        if attr == 'base':
+            raise AttributeError(attr)
+        return getattr(self.base, attr)
+
+    def _encode(self, texts):
+        model = getattr(self.base, 'client', None)
+        if model is not None and hasattr(model, 'encode'):
+            # Same preprocessing as HuggingFaceEmbeddings.embed_documents
+            texts = [text.replace("\n", " ") for text in texts]
+            kwargs = {'batch_size': self.max_batch, 'show_progress_bar': False,
+                      **(getattr(self.base, 'encode_kwargs', None) or {}), 'convert_to_numpy': True}
+            vectors = model.encode(texts, **kwargs)
+        else:
+            vectors = self.base.embed_documents(list(texts))
+        vectors = normalize_rows(vectors) if self.normalize else np.asarray(vectors, dtype=np.float32)
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self._batcher.submit(text)
+
+    def embed_documents(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.max_batch):
+            vectors.extend(self._encode(texts[start:start + self.max_batch]))
+        return vectors
+
+    def stats(self):
+        return self._batcher.stats()
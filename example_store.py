@@ -0,0 +1,242 @@
+"""
+AskDB AI - Incremental Few-Shot Example Store
+Few-shot retrieval over the curated examples (the memory-mapped index from
+few_shot_index.py) plus question/SQL pairs learned at runtime.
+
+    - learned examples go into an in-memory delta index, no rebuild needed
+    - they are persisted (vectors + JSONL) so a restart doesn't re-embed them
+    - near-duplicates are rejected by normalized question text and vector distance
+    - past EXAMPLE_STORE_HNSW_THRESHOLD examples everything is consolidated into
+      an HNSW graph, which keeps search sub-millisecond and, unlike IVF, accepts
+      further additions without retraining
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import faiss
+import numpy as np
+from langchain_core.example_selectors.base import BaseExampleSelector
+
+from embedding_service import MICRO_BATCH_ENABLED, MicroBatcher
+from few_shot_index import DEFAULT_INDEX_DIR, build_index, example_text, index_path, read_index
+from question_cache import normalize_question
+from structured_log import get_logger, log_fields
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: no cross-process append lock
+    fcntl = None
+
+LEARNED_EXAMPLES_FILE = 'examples.jsonl'
+LEARNED_VECTORS_FILE = 'vectors.f32'
+
+
+class ExampleStore:
+    def __init__(self, embeddings, base_examples, embedding_model, index_dir=None,
+                 hnsw_threshold=None, dedup_distance=None, micro_batch=None):
+        self.embeddings = embeddings
+        self.index_dir = index_dir or DEFAULT_INDEX_DIR
+        self.hnsw_threshold = hnsw_threshold or int(os.getenv('EXAMPLE_STORE_HNSW_THRESHOLD', 20000))
+        # Squared L2 between unit vectors = 2 - 2*cos; 0.05 is cos ~0.975
+        self.dedup_distance = dedup_distance if dedup_distance is not None else float(os.getenv('EXAMPLE_DEDUP_DISTANCE', 0.05))
+
+        self._lock = threading.RLock()
+        path = index_path(base_examples, embedding_model, index_dir)
+        if not os.path.isdir(path):
+            build_index(base_examples, embeddings, embedding_model, index_dir)
+        self._base, stored = read_index(path)   # memory-mapped, read-only
+        self.dimension = self._base.d
+        self._examples = [e['metadata'] for e in stored]
+        self._delta = faiss.IndexFlatL2(self.dimension)
+        self._hnsw = None
+
+        model_key = hashlib.sha256(embedding_model.encode('utf-8')).hexdigest()[:12]
+        self.learned_dir = os.path.join(self.index_dir, f'learned-{model_key}')
+        self._load_learned()
+        self._questions = {normalize_question(e['Question']) for e in self._examples}
+
+        self._added = 0
+        self._duplicates = 0
+        if len(self._examples) > self.hnsw_threshold:
+            self._consolidate()
+
+        # Concurrent single searches are coalesced into one embed + FAISS call
+        use_batcher = MICRO_BATCH_ENABLED if micro_batch is None else micro_batch
+        self._search_batcher = MicroBatcher(self._search_items, name='example-search') if use_batcher else None
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return len(self._examples)
+
+    def search(self, text, k):
+        """The k examples closest to text"""
+        if self._search_batcher is not None:
+            return self._search_batcher.submit((text, k))
+        return self.search_batch([text], k)[0]
+
+    def search_batch(self, texts, k):
+        """The k closest examples for each text: one embedding call, one search per index"""
+        if not texts:
+            return []
+        # embed_documents == embed_query per text for HuggingFaceEmbeddings
+        vectors = np.asarray(self.embeddings.embed_documents(list(texts)), dtype=np.float32)
+        with self._lock:
+            return [[dict(self._examples[i]) for _, i in hits] for hits in self._nearest(vectors, k)]
+
+    def add_example(self, example):
+        """Add a validated example; returns False if it duplicates an existing one"""
+        question = normalize_question(example['Question'])
+        with self._lock:
+            if question in self._questions:
+                self._duplicates += 1
+                return False
+
+        vector = np.asarray(self.embeddings.embed_documents([example_text(example)]), dtype=np.float32)
+        with self._lock:
+            nearest = self._nearest(vector, 1)[0]
+            if question in self._questions or (nearest and nearest[0][0] < self.dedup_distance):
+                self._duplicates += 1
+                return False
+            self._persist(example, vector)
+            self._append(example, vector)
+            self._questions.add(question)
+            self._added += 1
+            if self._hnsw is None and len(self._examples) > self.hnsw_threshold:
+                self._consolidate()
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'search_batching': self._search_batcher.stats() if self._search_batcher else None,
+                'examples': len(self._examples),
+                'base': self._base.ntotal,
+                'learned': len(self._examples) - self._base.ntotal,
+                'index': 'hnsw' if self._hnsw is not None else 'flat',
+                'added': self._added,
+                'duplicates': self._duplicates,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _search_items(self, items):
+        """MicroBatcher callback: items are (text, k)"""
+        results = self.search_batch([text for text, _ in items], max(k for _, k in items))
+        return [hits[:k] for (_, k), hits in zip(items, results)]
+
+    def _nearest(self, vectors, k):
+        """Per query row: [(distance, example_position), ...] best first. Caller holds the lock."""
+        if self._hnsw is not None:
+            indexes = [(self._hnsw, 0)]
+        else:
+            indexes = [(self._base, 0), (self._delta, self._base.ntotal)]
+        hits = [[] for _ in range(len(vectors))]
+        for index, offset in indexes:
+            if index.ntotal == 0:
+                continue
+            distances, ids = index.search(vectors, min(k, index.ntotal))
+            for row, (row_distances, row_ids) in enumerate(zip(distances, ids)):
+                hits[row].extend((float(d), int(i) + offset) for d, i in zip(row_distances, row_ids) if i >= 0)
+        return [sorted(row)[:k] for row in hits]
+
+    def _append(self, example, vectors):
+        (self._hnsw if self._hnsw is not None else self._delta).add(vectors)
+        self._examples.append(example)
+
+    def _consolidate(self):
+        """Move base + delta vectors into one HNSW index"""
+        vectors = [self._base.reconstruct_n(0, self._base.ntotal)]
+        if self._delta.ntotal:
+            vectors.append(self._delta.reconstruct_n(0, self._delta.ntotal))
+        hnsw = faiss.IndexHNSWFlat(self.dimension, 32)
+        hnsw.hnsw.efSearch = 64
+        hnsw.add(np.vstack(vectors))
+        self._hnsw = hnsw
+        self._delta = faiss.IndexFlatL2(self.dimension)
+        get_logger('example_store').info('switched to HNSW', extra=log_fields(examples=hnsw.ntotal))
+
+    def _load_learned(self):
+        examples_path = os.path.join(self.learned_dir, LEARNED_EXAMPLES_FILE)
+        vectors_path = os.path.join(self.learned_dir, LEARNED_VECTORS_FILE)
+        if not (os.path.exists(examples_path) and os.path.exists(vectors_path)):
+            return
+        vectors = np.fromfile(vectors_path, dtype=np.float32)
+        vectors = vectors[:len(vectors) - len(vectors) % self.dimension].reshape(-1, self.dimension)
+        with open(examples_path, encoding='utf-8') as f:
+            learned = [json.loads(line) for line in f if line.strip()]
+        # A crash between the two appends can leave one file a record ahead
+        count = min(len(learned), len(vectors))
+        if count:
+            self._delta.add(vectors[:count])
+            self._examples.extend(learned[:count])
+
+    def _persist(self, example, vector):
+        os.makedirs(self.learned_dir, exist_ok=True)
+        lock_path = os.path.join(self.learned_dir, '.lock')
+        with open(lock_path, 'a') as lock_file:
+            # Other workers append to the same files; keep each pair contiguous
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            with open(os.path.join(self.learned_dir, LEARNED_VECTORS_FILE), 'ab') as f:
+                f.write(vector.astype(np.float32).tobytes())
+            with open(os.path.join(self.learned_dir, LEARNED_EXAMPLES_FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(example, ensure_ascii=False) + '\n')
+
+
+class ExampleStoreSelector(BaseExampleSelector):
+    """LangChain example selector backed by an ExampleStore.
+
+    Builds the query text the same way SemanticSimilarityExampleSelector does
+    (values sorted by key, optionally limited to input_keys) so retrieval
+    results match the previous FAISS selector.
+    """
+
+    def __init__(self, store, k=2, input_keys=None):
+        self.store = store
+        self.k = k
+        self.input_keys = input_keys
+
+    def add_example(self, example):
+        return self.store.add_example(example)
+
+    def select_examples(self, input_variables):
+        return self.store.search(self._query_text(input_variables), self.k)
+
+    def select_examples_batch(self, inputs):
+        """select_examples for many inputs with a single embedding call"""
+        return self.store.search_batch([self._query_text(v) for v in inputs], self.k)
+
+    def _query_text(self, input_variables):
+        if self.input_keys:
+            input_variables = {key: input_variables[key] for key in self.input_keys}
+        return " ".join(str(input_variables[key]) for key in sorted(input_variables))
+
+
+# ============================================================================
+# PROCESS-WIDE REGISTRY
+# ============================================================================
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_example_store(embeddings, base_examples, embedding_model, index_dir=None):
+    """Shared ExampleStore per (index dir, embedding model, curated examples)"""
+    key = index_path(base_examples, embedding_model, index_dir)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ExampleStore(embeddings, base_examples, embedding_model, index_dir)
+            _stores[key] = store
+        return store
+
+
+def loaded_example_stores():
+    with _stores_lock:
+        return list(_stores.values())
@@ -0,0 +1,139 @@
+"""
+AskDB AI - Persistent Few-Shot Index
+Stores the FAISS index of few-shot examples on disk, keyed by a content hash of
+the examples and the embedding model, and memory-maps it at startup instead of
+re-embedding every example. example_store.py serves searches from it.
+
+    <FEW_SHOT_INDEX_DIR>/<hash>/index.faiss     FAISS vectors
+    <FEW_SHOT_INDEX_DIR>/<hash>/examples.json   docstore ids, texts, metadata
+
+Offline build (e.g. in the Docker image or a deploy hook):
+    python few_shot_index.py build [--force]
+    python few_shot_index.py status
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+import faiss
+import numpy as np
+
+DEFAULT_INDEX_DIR = os.getenv(
+    'FEW_SHOT_INDEX_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.few_shot_index'),
+)
+INDEX_FILE = 'index.faiss'
+EXAMPLES_FILE = 'examples.json'
+_INDEX_DIR_NAME = re.compile(r'^[0-9a-f]{16}(\.tmp-\d+)?$')
+
+
+def example_text(example):
+    """Text embedded for an example (same as the original from_texts call)"""
+    return " ".join(example.values())
+
+
+def content_hash(examples, embedding_model):
+    """Hash of everything that determines the index contents"""
+    payload = json.dumps(
+        {'model': embedding_model, 'examples': [[example_text(e), e] for e in examples]},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def index_path(examples, embedding_model, index_dir=None):
+    return os.path.join(index_dir or DEFAULT_INDEX_DIR, content_hash(examples, embedding_model))
+
+
+def build_index(examples, embeddings, embedding_model, index_dir=None):
+    """Embed examples and write the index; returns its directory.
+
+    Writes into a temporary directory and renames it into place, so concurrent
+    workers building the same hash never see a half-written index.
+    """
+    target = index_path(examples, embedding_model, index_dir)
+    if os.path.isdir(target):
+        return target
+
+    texts = [example_text(e) for e in examples]
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+
+    tmp = f'{target}.tmp-{os.getpid()}'
+    os.makedirs(tmp, exist_ok=True)
+    faiss.write_index(index, os.path.join(tmp, INDEX_FILE))
+    with open(os.path.join(tmp, EXAMPLES_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'embedding_model': embedding_model,
+            'built_at': time.time(),
+            'dimension': int(vectors.shape[1]),
+            'examples': [{'id': str(i), 'text': text, 'metadata': example}
+                         for i, (text, example) in enumerate(zip(texts, examples))],
+        }, f, ensure_ascii=False)
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        # Another process won the race; its index has the same content
+        shutil.rmtree(tmp, ignore_errors=True)
+    return target
+
+
+def read_index(path):
+    """(faiss index, stored examples) for a built index, with the vectors memory-mapped.
+
+    Mapped indexes are read-only: adding to one aborts inside faiss, so copy
+    the vectors out (index.reconstruct_n) before growing it.
+    """
+    flags = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP)
+    index = faiss.read_index(os.path.join(path, INDEX_FILE), flags)
+    with open(os.path.join(path, EXAMPLES_FILE), encoding='utf-8') as f:
+        stored = json.load(f)
+    return index, stored['examples']
+
+
+def prune_stale(keep_path, index_dir=None):
+    """Remove built index directories other than keep_path; returns the removed names"""
+    root = index_dir or DEFAULT_INDEX_DIR
+    removed = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if not _INDEX_DIR_NAME.match(name):
+            continue  # e.g. learned examples from example_store.py
+        if os.path.isdir(path) and os.path.abspath(path) != os.path.abspath(keep_path):
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(name)
+    return removed
+
+
+if __name__ == '__main__':
+    from embedding_service import EMBEDDING_BACKEND, embedding_index_key, load_embeddings
+    from few_shots import few_shots
+    from langchain_helper import EMBEDDING_MODEL
+
+    parser = argparse.ArgumentParser(description='Build or inspect the persisted few-shot FAISS index')
+    parser.add_argument('command', choices=['build', 'status'])
+    parser.add_argument('--force', action='store_true', help='rebuild even if the hash is unchanged')
+    parser.add_argument('--index-dir', default=None)
+    args = parser.parse_args()
+
+    # Index identity depends on the backend (EMBEDDING_BACKEND / ONNX_VARIANT)
+    model_key = embedding_index_key(EMBEDDING_MODEL)
+    path = index_path(few_shots, model_key, args.index_dir)
+    if args.command == 'status':
+        state = 'present' if os.path.isdir(path) else 'missing'
+        print(f"{len(few_shots)} examples, model {model_key} ({EMBEDDING_BACKEND})")
+        print(f"index {os.path.basename(path)}: {state} ({path})")
+    else:
+        if args.force and os.path.isdir(path):
+            shutil.rmtree(path)
+        start = time.time()
+        embeddings = load_embeddings(EMBEDDING_MODEL)
+        build_index(few_shots, embeddings, model_key, args.index_dir)
+        removed = prune_stale(path, args.index_dir)
+        print(f"✅ Built {path} in {time.time() - start:.1f}s (pruned {len(removed)} stale)")
@@ -0,0 +1,48 @@
+"""
+AskDB AI - Gunicorn Configuration
+Picked up automatically by `gunicorn api_server:app` from the working
+directory. Worker count, bind address etc. still come from the command line
+or WEB_CONCURRENCY.
+
+With EMBEDDING_PRELOAD=true the master loads the few-shot embedding model
+before forking, so every worker shares one copy of its weights (copy-on-write)
+instead of loading its own; the question cache's semantic tier uses it from
+a worker's first request. Only the model is preloaded, not the app: DB
+pools, the LLM session and warm-up threads are still created per worker.
+
+Every worker gets cores / workers threads for torch and ONNX Runtime
+(EMBED_TORCH_THREADS overrides), so W workers don't each start one thread
+per core.
+"""
+
+import os
+import sys
+import time
+
+EMBEDDING_PRELOAD = os.getenv('EMBEDDING_PRELOAD', 'false').lower() == 'true'
+EMBED_TORCH_THREADS = int(os.getenv('EMBED_TORCH_THREADS', 0))
+
+
+def on_starting(server):
+    if not EMBEDDING_PRELOAD:
+        return
+    from embedding_service import preload_embeddings
+    from langchain_helper import EMBEDDING_MODEL
+
+    start = time.time()
+    if preload_embeddings(EMBEDDING_MODEL) is not None:
+        server.log.info("Preloaded embedding model %s in %.1fs (shared by all workers)",
+                        EMBEDDING_MODEL, time.time() - start)
+    else:
+        server.log.info("Embedding backend is loaded per worker; nothing preloaded")
+
+
+def post_fork(server, worker):
+    threads = EMBED_TORCH_THREADS or max(1, (os.cpu_count() or 1) // max(1, server.cfg.workers))
+    # Read when torch / onnx_embeddings are first imported in this worker
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+    os.environ.setdefault('ONNX_THREADS', str(threads))
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        # Preloaded: the master ran single-threaded
+        torch.set_num_threads(threads)
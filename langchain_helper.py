@@ -1,37 +1,78 @@
-from langchain_openai import ChatOpenAI
-from langchain_community.utilities import SQLDatabase
-from langchain_core.example_selectors import SemanticSimilarityExampleSelector
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.prompts import FewShotPromptTemplate
-from langchain_core.prompts import PromptTemplate
 from few_shots import few_shots
 import os
 from dotenv import load_dotenv
 load_dotenv()
 import urllib.parse
+import threading
 import pymysql
+from schema_cache import get_schema_cache
+from result_format import chain_answer_chunks, format_chain_answer
+from llm_gateway import get_llm_gateway
+from structured_log import get_logger, log_fields
+from nl_pipeline import (Pipeline, QuestionCacheLookup, SchemaStage, SchemaLinkStage, ExampleRetrieval,
+                         PromptStage, LLMStage, SanitizeStage, GuardStage, ExecuteStage, FormatStage,
+                         RememberStage)
 
-def get_few_shot_db_chain():
-    db_user = "root"
-    db_password = "Pavan@2005"
-    db_host = "localhost"
-    db_name = "atliq_tshirts"
+DB_PARAMS = {
+    'host': "localhost",
+    'user': "root",
+    'password': "Pavan@2005",
+    'database': "atliq_tshirts",
+}
+LLM_MODEL = "llama-3.3-70b-versatile"
+LLM_TEMPERATURE = 0.2
+EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+# Add question/SQL pairs that ran successfully to the few-shot example store
+LEARN_EXAMPLES = os.getenv('EXAMPLE_STORE_LEARN', 'false').lower() == 'true'
+
+# Process-wide chain registry: building a chain loads the embedding model,
+# embeds every few-shot example and opens a SQLAlchemy engine, so it must
+# happen once per process rather than once per question.
+_chain_registry = {}
+_registry_lock = threading.Lock()
+_warmup_thread = None
+
+
+def _db_uri(db_params):
+    encoded_password = urllib.parse.quote_plus(db_params['password'])
+    port = f":{db_params['port']}" if db_params.get('port') else ''
+    return f"mysql+pymysql://{db_params['user']}:{encoded_password}@{db_params['host']}{port}/{db_params['database']}"
+
+
+def _chain_key(db_params=None, llm_model=LLM_MODEL,
+               embedding_model=EMBEDDING_MODEL, temperature=LLM_TEMPERATURE):
+    return (_db_uri(db_params or DB_PARAMS), llm_model, embedding_model, temperature)
+
+
+def get_few_shot_db_chain(db_params=None, llm_model=LLM_MODEL,
+                          embedding_model=EMBEDDING_MODEL, temperature=LLM_TEMPERATURE):
+    """Build a new chain. Prefer get_cached_chain() on request paths."""
+    # Imported here so importing this module (Streamlit, api_server's lazy
+    # facade) doesn't pay for LangChain, torch and FAISS until a chain is built
+    from langchain_community.utilities import SQLDatabase
+    from langchain_core.prompts import FewShotPromptTemplate
+    from langchain_core.prompts import PromptTemplate
+    from embedding_service import embedding_index_key, get_embeddings
+    from example_store import ExampleStoreSelector, get_example_store
+    from schema_linking import SCHEMA_LINKING, SchemaLinker
+
+    db_params = db_params or DB_PARAMS
+    db_user = db_params['user']
+    db_password = db_params['password']
+    db_host = db_params['host']
+    db_name = db_params['database']
     
-    encoded_password = urllib.parse.quote_plus(db_password)
-    db = SQLDatabase.from_uri(f"mysql+pymysql://{db_user}:{encoded_password}@{db_host}/{db_name}", sample_rows_in_table_info=3)
+    db = SQLDatabase.from_uri(_db_uri(db_params), sample_rows_in_table_info=3)
     
-    llm = ChatOpenAI(
-        model="llama-3.3-70b-versatile",
-        api_key=os.getenv("GROQ_API_KEY"),
-        base_url="https://api.groq.com/openai/v1",
-        temperature=0.2
-    )
+    # Shared gateway: pooled keep-alive session, concurrency limit and retries
+    llm = get_llm_gateway()
 
-    embeddings = HuggingFaceEmbeddings(model_name='sentence-transformers/all-MiniLM-L6-v2')
-    to_vectorize = [" ".join(example.values()) for example in few_shots]
-    vectorstore = FAISS.from_texts(to_vectorize, embeddings, metadatas=few_shots)
-    example_selector = SemanticSimilarityExampleSelector(vectorstore=vectorstore, k=2)
+    # One model per process (per host with EMBEDDING_PRELOAD); concurrent
+    # questions share a forward pass. EMBEDDING_BACKEND=onnx skips torch.
+    embeddings = get_embeddings(embedding_model)
+    # Curated examples memory-mapped from disk, plus examples learned at runtime
+    example_store = get_example_store(embeddings, few_shots, embedding_index_key(embedding_model))
+    example_selector = ExampleStoreSelector(example_store, k=2)
     
     mysql_prompt = """You are a MySQL expert. Given an input question, create a syntactically correct MySQL query.
 Unless specified, query for at most 5 results using LIMIT.
@@ -54,89 +95,163 @@ SQLQuery: SQL Query to run
         input_variables=["input", "table_info"],
     )
     
+    def build_prompt(ctx):
+        # few_shot_prompt with the examples the retrieval stage picked
+        prompt = few_shot_prompt.model_copy(update={'examples': ctx.examples, 'example_selector': None})
+        return prompt.format(input=ctx.question, table_info=ctx.schema)
+    
+    conn_params = {'host': db_host, 'user': db_user, 'password': db_password, 'database': db_name}
+    if db_params.get('port'):
+        conn_params['port'] = int(db_params['port'])
+
+    def full_schema(ctx):
+        return get_schema_cache(conn_params).table_info(db.get_table_info)
+
+    # Large schemas: only the tables (and columns) relevant to the question
+    schema_linker = SchemaLinker(get_schema_cache(conn_params), embeddings, embedding_index_key(embedding_model))
+    pipeline = Pipeline([
+        QuestionCacheLookup(db_name, embedder=lambda: embeddings.embed_query,
+                            batch_embedder=lambda: embeddings.embed_documents),
+        SchemaLinkStage(schema_linker, full_schema) if SCHEMA_LINKING else SchemaStage(full_schema),
+        # The selector sees every prompt input, as FewShotPromptTemplate passed it
+        ExampleRetrieval(example_selector, inputs=lambda ctx: {'input': ctx.question, 'table_info': ctx.schema}),
+        PromptStage(build_prompt),
+        LLMStage(llm, llm_model, temperature=temperature),
+        SanitizeStage(),
+        GuardStage(conn_params),
+        ExecuteStage(conn_params),
+        FormatStage(format_chain_answer, chunks=chain_answer_chunks),
+        RememberStage(db_name, learn=learn_example),
+    ], name='chat')
+    
     class SQLExecutionChain:
         def __init__(self):
             self.llm = llm
+            self.llm_model = llm_model
+            self.temperature = temperature
             self.db = db
             self.prompt = few_shot_prompt
-            self.conn_params = {'host': db_host, 'user': db_user, 'password': db_password, 'database': db_name}
+            self.embeddings = embeddings
+            self.example_store = example_store
+            self.conn_params = conn_params
+            self.schema_linker = schema_linker
+            self.pipeline = pipeline
         
-        def run(self, question):
-            # Generate SQL
-            prompt_text = self.prompt.format(input=question, table_info=self.db.get_table_info())
-            sql_query = self.llm.invoke(prompt_text).content.strip()
-            
-            # Clean query
-            sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
-            if "SQLQuery:" in sql_query:
-                sql_query = sql_query.split("SQLQuery:")[1].strip()
-            sql_query = sql_query.split(";")[0].strip()
-            
-            # Execute query
-            conn = pymysql.connect(**self.conn_params)
-            try:
-                cursor = conn.cursor()
-                cursor.execute(sql_query)
-                rows = cursor.fetchall()
-                column_count = len(cursor.description) if cursor.description else 0
-                cursor.close()
-                
-                # Format results intelligently
-                if not rows:
-                    return "No results found."
-                
-                # Single value result (like COUNT, SUM, AVG, etc.)
-                if len(rows) == 1 and len(rows[0]) == 1:
-                    value = rows[0][0]
-                    return f"**{value}**"
-                
-                # Multiple rows with multiple columns - detailed breakdown
-                if len(rows) > 1 and column_count > 1:
-                    result_lines = []
-                    total_stock = 0
-                    
-                    # Try to extract meaningful information
-                    for row in rows:
-                        try:
-                            # 2 columns: likely (size, stock) or (item, count)
-                            if column_count == 2:
-                                item = row[0]
-                                value = row[1]
-                                if isinstance(value, (int, float)):
-                                    total_stock += value
-                                    result_lines.append(f"Size {item}: {int(value)} items available")
-                                else:
-                                    result_lines.append(f"{item}: {value}")
-                            # Full table: id, brand, color, size, price, stock_quantity (6 columns)
-                            elif column_count >= 6:
-                                size = row[3]
-                                stock = row[5]
-                                total_stock += stock if isinstance(stock, (int, float)) else 0
-                                result_lines.append(f"Size {size}: {int(stock)} items available")
-                            # Generic handling
-                            else:
-                                numeric_vals = [v for v in row if isinstance(v, (int, float))]
-                                if numeric_vals:
-                                    total_stock += sum(numeric_vals)
-                                result_lines.append(" | ".join(map(str, row)))
-                        except:
-                            result_lines.append(str(row))
-                    
-                    formatted_output = "\n".join(result_lines)
-                    if total_stock > 0:
-                        formatted_output += f"\n\n**Total Stock: {int(total_stock)}**"
-                    return formatted_output
-                
-                # Fallback: simple list
-                if len(rows) <= 5:
-                    return "\n".join([f"- {', '.join(map(str, row))}" for row in rows])
-                else:
-                    return f"Found {len(rows)} results"
-            finally:
-                conn.close()
+        def run_context(self, question, use_cache=True):
+            """Run the pipeline; returns its QueryContext (SQL, rows, per-stage timings)"""
+            return self.pipeline.run(question, use_cache=use_cache)
+        
+        def run(self, question, use_cache=True):
+            return self.run_context(question, use_cache).answer
+        
+        def stream(self, question, use_cache=True):
+            """(event, data) pairs as the answer is produced; see Pipeline.stream"""
+            return self.pipeline.stream(question, use_cache=use_cache)
+        
+        def run_batch(self, questions, use_cache=True):
+            """QueryContexts for several questions; failures are left in ctx.error"""
+            return self.pipeline.run_batch(questions, use_cache=use_cache)
         
         def invoke(self, inputs):
-            q = inputs.get("query") or inputs.get("question") or inputs
-            return {"result": self.run(q)}
+            if not isinstance(inputs, dict):
+                return {"result": self.run(inputs)}
+            q = inputs.get("query") or inputs.get("question")
+            return {"result": self.run(q, use_cache=inputs.get("use_cache", True))}
     
     return SQLExecutionChain()
+
+
+def get_cached_chain(db_params=None, llm_model=LLM_MODEL,
+                     embedding_model=EMBEDDING_MODEL, temperature=LLM_TEMPERATURE):
+    """Return the process-wide chain for this DB + model config, building it once."""
+    key = _chain_key(db_params, llm_model, embedding_model, temperature)
+    chain = _chain_registry.get(key)
+    if chain is not None:
+        return chain
+    with _registry_lock:
+        # Another thread may have finished building while we waited
+        chain = _chain_registry.get(key)
+        if chain is None:
+            chain = get_few_shot_db_chain(db_params, llm_model, embedding_model, temperature)
+            _chain_registry[key] = chain
+        return chain
+
+
+def warm_up_chain(background=True, **config):
+    """Build the default chain ahead of the first question.
+
+    With background=True the build runs in a daemon thread so callers (e.g.
+    Streamlit on startup) are not blocked; a question arriving mid-build simply
+    waits on the registry lock instead of starting a second build.
+    """
+    global _warmup_thread
+    if not background:
+        return get_cached_chain(**config)
+    with _registry_lock:
+        if _warmup_thread is not None and _warmup_thread.is_alive():
+            return _warmup_thread
+        if _chain_key(**config) in _chain_registry:
+            return None
+
+        def _warm():
+            try:
+                get_cached_chain(**config)
+            except Exception as e:
+                get_logger('chain').warning('chain warm-up failed', extra=log_fields(error=str(e)))
+
+        _warmup_thread = threading.Thread(target=_warm, name="chain-warmup", daemon=True)
+        _warmup_thread.start()
+        return _warmup_thread
+
+
+def get_loaded_embeddings():
+    """Embeddings from an already-built chain or preloaded by the gunicorn
+    master, or None. Never loads the model. (api_server reads the preloaded
+    model from embedding_service directly until this module is imported.)"""
+    for chain in list(_chain_registry.values()):
+        return chain.embeddings
+    from embedding_service import loaded_embeddings
+    return loaded_embeddings()
+
+
+def learn_example(question, sql_query, answer):
+    """Offer a question/SQL pair that ran successfully to the loaded example stores.
+
+    No-op unless EXAMPLE_STORE_LEARN=true and a chain has already been built;
+    near-duplicates of existing examples are dropped by the store.
+    """
+    if not LEARN_EXAMPLES or not _chain_registry:
+        return False
+    from example_store import loaded_example_stores
+
+    example = {
+        'Question': question,
+        'SQLQuery': sql_query,
+        'SQLResult': "Result of the SQL query",
+        'Answer': str(answer),
+    }
+    added = False
+    for store in loaded_example_stores():
+        try:
+            added = store.add_example(example) or added
+        except Exception as e:
+            get_logger('chain').warning('could not add few-shot example',
+                                        extra=log_fields(question=question, error=str(e)))
+    return added
+
+
+def invalidate_chain(db_params=None, llm_model=None, embedding_model=None, temperature=None):
+    """Drop cached chains so the next request rebuilds them.
+
+    With no arguments every chain is dropped; otherwise only the entry for the
+    given config (unspecified fields fall back to the defaults).
+    """
+    with _registry_lock:
+        if db_params is None and llm_model is None and embedding_model is None and temperature is None:
+            _chain_registry.clear()
+            return
+        key = _chain_key(db_params,
+                         llm_model or LLM_MODEL,
+                         embedding_model or EMBEDDING_MODEL,
+                         LLM_TEMPERATURE if temperature is None else temperature)
+        _chain_registry.pop(key, None)
@@ -0,0 +1,183 @@
+"""
+AskDB AI - Lazy Loading & Startup Profile
+Keeps the AI stack (LangChain, sentence-transformers/torch, FAISS) off the API
+import path. Modules wrapped in LazyModule are imported on first attribute
+access, or ahead of time by warm_up() in a background thread, and every import
+plus named startup phase is timed for the startup report.
+
+    ai = lazy_import('langchain_helper', requires=('langchain_community', 'faiss'))
+    ai.available()            # dependencies installed? (nothing imported)
+    ai.loaded                 # False until something touches it
+    ai.get_cached_chain()     # imports langchain_helper (once) and calls it
+    startup_report()          # {'phases': [...], 'imports': {...}, ...}
+
+Set STARTUP_PROFILE=true to log the report when the app is ready.
+"""
+
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Best available approximation of process start without psutil: the first
+# import of this module, which api_server does before anything heavy
+_process_start = time.time()
+
+_profile_lock = threading.Lock()
+_phases = []
+_imports = {}
+_ready_at = None
+_lazy_modules = {}
+
+
+@contextmanager
+def startup_phase(name):
+    """Time a named startup step (imports, app creation, warm-up...)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _profile_lock:
+            _phases.append({
+                'phase': name,
+                'ms': round((time.perf_counter() - start) * 1000, 1),
+                'thread': threading.current_thread().name,
+            })
+
+
+def mark_ready():
+    """Record the moment the app can serve requests"""
+    global _ready_at
+    if _ready_at is None:
+        _ready_at = time.time()
+
+
+def startup_report():
+    with _profile_lock:
+        return {
+            'pid': os.getpid(),
+            'ready_ms': round((_ready_at - _process_start) * 1000, 1) if _ready_at else None,
+            'uptime_s': round(time.time() - _process_start, 1),
+            'phases': list(_phases),
+            'imports': dict(_imports),
+            'heavy_modules_loaded': {name: name in sys.modules
+                                     for name in ('torch', 'sentence_transformers', 'faiss', 'langchain_community')},
+        }
+
+
+def _log(level, message, **fields):
+    # Imported here so this module stays the first, cheapest import of the app
+    from structured_log import get_logger, log_fields
+    getattr(get_logger('startup'), level)(message, extra=log_fields(**fields))
+
+
+def log_startup_report():
+    _log('info', 'startup profile', **startup_report())
+
+
+# ============================================================================
+# LAZY MODULE FACADE
+# ============================================================================
+
+class LazyModule:
+    """Proxy that imports the wrapped module on first attribute access.
+
+    Thread-safe: concurrent first calls wait for a single import. A failed
+    import (missing optional dependency) is remembered and re-raised as
+    ImportError on every access instead of being retried per request.
+    """
+
+    def __init__(self, name, requires=()):
+        self._name = name
+        self._requires = tuple(requires)
+        self._module = None
+        self._error = None
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def available(self):
+        """Whether the module and its required packages can be found, without importing them"""
+        if self._module is not None:
+            return True
+        if self._error is not None:
+            return False
+        try:
+            return all(importlib.util.find_spec(name) is not None
+                       for name in (self._name,) + self._requires)
+        except (ImportError, ValueError):
+            return False
+
+    def load(self):
+        if self._module is not None:
+            return self._module
+        with self._lock:
+            if self._module is None:
+                if self._error is not None:
+                    raise ImportError(self._error)
+                start = time.perf_counter()
+                try:
+                    self._module = importlib.import_module(self._name)
+                except ImportError as e:
+                    self._error = str(e)
+                    _imports[self._name] = {'state': 'failed', 'error': self._error,
+                                            'ms': round((time.perf_counter() - start) * 1000, 1)}
+                    raise
+                _imports[self._name] = {
+                    'state': 'loaded',
+                    'ms': round((time.perf_counter() - start) * 1000, 1),
+                    'thread': threading.current_thread().name,
+                }
+                _log('info', 'module loaded', module=self._name, **_imports[self._name])
+        return self._module
+
+    def warm_up(self, then=None):
+        """Import in a daemon thread, then call then(module) if given.
+
+        Returns the thread (or None if already loaded / failed); requests that
+        arrive mid-import just block on the import lock.
+        """
+        if self._module is not None or self._error is not None:
+            return None
+        with self._lock:
+            if self._warmup_thread is not None and self._warmup_thread.is_alive():
+                return self._warmup_thread
+
+            def _warm():
+                try:
+                    with startup_phase(f'warm-up {self._name}'):
+                        module = self.load()
+                        if then is not None:
+                            then(module)
+                except Exception as e:
+                    _log('warning', 'warm-up failed', module=self._name, error=str(e))
+
+            self._warmup_thread = threading.Thread(target=_warm, name=f"warmup-{self._name}", daemon=True)
+            self._warmup_thread.start()
+            return self._warmup_thread
+
+    def __getattr__(self, attr):
+        # Only reached for attributes not set in __init__, i.e. module members
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'failed' if self._error else 'not loaded'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_import(name, requires=()):
+    """Shared LazyModule per module name"""
+    with _profile_lock:
+        proxy = _lazy_modules.get(name)
+        if proxy is None:
+            proxy = LazyModule(name, requires)
+            _lazy_modules[name] = proxy
+            _imports.setdefault(name, {'state': 'deferred'})
+        return proxy
+
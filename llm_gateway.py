@@ -0,0 +1,456 @@
+"""
+AskDB AI - LLM Gateway
+One client for every call to the OpenAI-compatible chat completions API
+(Groq by default), shared by the Flask API and the LangChain helper:
+
+    - keep-alive connection pool (requests.Session)
+    - global concurrency limit so slow LLM calls can't occupy every worker thread
+    - exponential backoff with jitter on 429 / 5xx / network errors
+    - single-flight: identical in-flight prompts share one upstream call
+    - streaming (SSE) completions for callers that show tokens as they arrive
+    - per-call latency, time-to-first-token and token metrics
+
+Point LLM_BASE_URL at a local stub server to test without Groq.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "https://api.groq.com/openai/v1"
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """LLM call failed after retries (status is None for network errors)"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class _Flight:
+    """An in-progress upstream call that identical requests wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LLMGateway:
+    def __init__(self, base_url=None, api_key=None, max_concurrency=None, timeout=None,
+                 max_retries=None, queue_timeout=None):
+        self.base_url = (base_url or os.getenv('LLM_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self.api_key = api_key or os.getenv('GROQ_API_KEY')
+        self.max_concurrency = max_concurrency or int(os.getenv('LLM_MAX_CONCURRENCY', 8))
+        self.timeout = timeout or float(os.getenv('LLM_TIMEOUT', 30))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('LLM_MAX_RETRIES', 3))
+        self.queue_timeout = queue_timeout or float(os.getenv('LLM_QUEUE_TIMEOUT', 30))
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+
+        self._metrics_lock = threading.Lock()
+        self._calls = 0
+        self._errors = 0
+        self._retries = 0
+        self._coalesced = 0
+        self._queue_timeouts = 0
+        self._in_flight = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+        self._streams = 0
+        self._first_token_total = 0.0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def complete(self, prompt, model=DEFAULT_MODEL, temperature=0.2, max_tokens=None):
+        """Send a single user message and return the response text"""
+        response = self.chat(self._payload(prompt, model, temperature, max_tokens))
+        return response['choices'][0]['message']['content']
+
+    def stream(self, prompt, model=DEFAULT_MODEL, temperature=0.2, max_tokens=None):
+        """Yield the response text in pieces as the model generates it.
+
+        Holds a concurrency slot until the stream ends (or the caller stops
+        iterating). Retries like chat() until the response starts; never
+        coalesced, since every caller wants its own token stream.
+        """
+        payload = dict(self._payload(prompt, model, temperature, max_tokens), stream=True)
+        self._acquire_slot()
+        try:
+            attempt = 0
+            while True:
+                start = time.monotonic()
+                try:
+                    response = self._post(payload, stream=True)
+                    error = None if response.status_code == 200 else LLMError(
+                        f'LLM API error {response.status_code}: {response.text[:500]}', status=response.status_code)
+                    retryable = response.status_code in RETRY_STATUSES
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    response = None
+                    error = LLMError(f'LLM API unreachable: {e}')
+                    retryable = True
+                if error is None:
+                    break
+                if response is not None:
+                    response.close()
+                if not retryable or attempt >= self.max_retries:
+                    self._record(time.monotonic() - start, {}, failed=True)
+                    raise error
+                attempt += 1
+                with self._metrics_lock:
+                    self._retries += 1
+                time.sleep(self._backoff(attempt, response))
+
+            usage, first_token = {}, None
+            try:
+                for line in response.iter_lines():
+                    # Server-sent events: "data: {chunk}" lines, then "data: [DONE]"
+                    if not line.startswith(b'data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == b'[DONE]':
+                        break
+                    chunk = json.loads(data)
+                    # OpenAI puts usage on the last chunk, Groq under x_groq
+                    usage = chunk.get('usage') or (chunk.get('x_groq') or {}).get('usage') or usage
+                    for choice in chunk.get('choices') or []:
+                        text = (choice.get('delta') or {}).get('content')
+                        if text:
+                            if first_token is None:
+                                first_token = time.monotonic() - start
+                            yield text
+            except (requests.RequestException, ValueError) as e:
+                self._record(time.monotonic() - start, usage, failed=True)
+                raise LLMError(f'LLM stream interrupted: {e}')
+            finally:
+                response.close()
+            self._record(time.monotonic() - start, usage, first_token=first_token)
+        finally:
+            self._release_slot()
+
+    def chat(self, payload):
+        """POST /chat/completions, coalescing with an identical in-flight request"""
+        key = self._flight_key(payload)
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not leader:
+            with self._metrics_lock:
+                self._coalesced += 1
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._call_with_retries(payload)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def stats(self):
+        with self._metrics_lock:
+            calls = self._calls
+            return {
+                'base_url': self.base_url,
+                'max_concurrency': self.max_concurrency,
+                'in_flight': self._in_flight,
+                'calls': calls,
+                'errors': self._errors,
+                'retries': self._retries,
+                'coalesced': self._coalesced,
+                'queue_timeouts': self._queue_timeouts,
+                'avg_latency_ms': int(self._latency_total / calls * 1000) if calls else 0,
+                'max_latency_ms': int(self._latency_max * 1000),
+                'prompt_tokens': self._prompt_tokens,
+                'completion_tokens': self._completion_tokens,
+                'streams': self._streams,
+                'avg_first_token_ms': int(self._first_token_total / self._streams * 1000) if self._streams else 0,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _payload(prompt, model, temperature, max_tokens):
+        payload = {
+            'model': model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': temperature,
+        }
+        if max_tokens:
+            payload['max_tokens'] = max_tokens
+        return payload
+
+    @staticmethod
+    def _flight_key(payload):
+        return hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _get_session(self):
+        # requests.Session is not fork-safe; give each process its own pool
+        with self._session_lock:
+            if self._session is None or self._session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+                self._session_pid = os.getpid()
+            return self._session
+
+    def _acquire_slot(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._metrics_lock:
+                self._queue_timeouts += 1
+            raise LLMError(f'LLM gateway busy: {self.max_concurrency} calls already in flight', status=503)
+        with self._metrics_lock:
+            self._in_flight += 1
+
+    def _release_slot(self):
+        with self._metrics_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _call_with_retries(self, payload):
+        self._acquire_slot()
+        try:
+            attempt = 0
+            while True:
+                start = time.monotonic()
+                try:
+                    response = self._post(payload)
+                    error = None if response.status_code == 200 else LLMError(
+                        f'LLM API error {response.status_code}: {response.text[:500]}', status=response.status_code)
+                    retryable = response.status_code in RETRY_STATUSES
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    response = None
+                    error = LLMError(f'LLM API unreachable: {e}')
+                    retryable = True
+                latency = time.monotonic() - start
+
+                if error is None:
+                    body = response.json()
+                    self._record(latency, body.get('usage') or {})
+                    return body
+
+                if not retryable or attempt >= self.max_retries:
+                    self._record(latency, {}, failed=True)
+                    raise error
+
+                attempt += 1
+                with self._metrics_lock:
+                    self._retries += 1
+                time.sleep(self._backoff(attempt, response))
+        finally:
+            self._release_slot()
+
+    def _post(self, payload, stream=False):
+        return self._get_session().post(
+            f'{self.base_url}/chat/completions',
+            headers={
+                'Authorization': f'Bearer {self.api_key}',
+                'Content-Type': 'application/json',
+            },
+            json=payload,
+            timeout=self.timeout,
+            stream=stream,
+        )
+
+    @staticmethod
+    def _backoff(attempt, response):
+        """Seconds to sleep before retry number attempt (1-based)"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), 30.0)
+                except ValueError:
+                    pass
+        # Full jitter: uniform over [0, base * 2^(attempt-1)], capped
+        return random.uniform(0, min(0.5 * 2 ** (attempt - 1), 8.0))
+
+    def _record(self, latency, usage, failed=False, first_token=None):
+        with self._metrics_lock:
+            self._calls += 1
+            if failed:
+                self._errors += 1
+            if first_token is not None:
+                self._streams += 1
+                self._first_token_total += first_token
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+            self._prompt_tokens += usage.get('prompt_tokens', 0)
+            self._completion_tokens += usage.get('completion_tokens', 0)
+
+
+class AsyncLLMGateway(LLMGateway):
+    """asyncio twin of LLMGateway for the ASGI server.
+
+    Same settings, retry policy and metrics, but built on httpx.AsyncClient and
+    an asyncio.Semaphore, so a waiting LLM call costs a coroutine rather than
+    a thread. Must be used from a single event loop.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._client = None
+        self._async_slots = None
+        self._async_flights = {}
+
+    async def complete(self, prompt, model=DEFAULT_MODEL, temperature=0.2, max_tokens=None):
+        response = await self.chat(self._payload(prompt, model, temperature, max_tokens))
+        return response['choices'][0]['message']['content']
+
+    async def chat(self, payload):
+        key = self._flight_key(payload)
+        while True:
+            future = self._async_flights.get(key)
+            if future is None:
+                break
+            with self._metrics_lock:
+                self._coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # The leader was cancelled, not us: make the call ourselves
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_flights[key] = future
+        try:
+            result = await self._call_with_retries_async(payload)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        except BaseException:
+            # Cancelled (e.g. the client disconnected): wake the waiters so
+            # one of them takes over instead of waiting forever
+            future.cancel()
+            raise
+        finally:
+            self._async_flights.pop(key, None)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+            )
+        return self._client
+
+    async def _call_with_retries_async(self, payload):
+        import httpx
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(self._async_slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._metrics_lock:
+                self._queue_timeouts += 1
+            raise LLMError(f'LLM gateway busy: {self.max_concurrency} calls already in flight', status=503)
+
+        with self._metrics_lock:
+            self._in_flight += 1
+        try:
+            attempt = 0
+            while True:
+                start = time.monotonic()
+                try:
+                    response = await self._get_client().post(
+                        f'{self.base_url}/chat/completions',
+                        headers={'Authorization': f'Bearer {self.api_key}'},
+                        json=payload,
+                    )
+                    error = None if response.status_code == 200 else LLMError(
+                        f'LLM API error {response.status_code}: {response.text[:500]}', status=response.status_code)
+                    retryable = response.status_code in RETRY_STATUSES
+                except httpx.TransportError as e:
+                    response = None
+                    error = LLMError(f'LLM API unreachable: {e}')
+                    retryable = True
+                latency = time.monotonic() - start
+
+                if error is None:
+                    body = response.json()
+                    self._record(latency, body.get('usage') or {})
+                    return body
+
+                if not retryable or attempt >= self.max_retries:
+                    self._record(latency, {}, failed=True)
+                    raise error
+
+                attempt += 1
+                with self._metrics_lock:
+                    self._retries += 1
+                await asyncio.sleep(self._backoff(attempt, response))
+        finally:
+            with self._metrics_lock:
+                self._in_flight -= 1
+            self._async_slots.release()
+
+
+# ============================================================================
+# PROCESS-WIDE GATEWAY
+# ============================================================================
+
+_gateway = None
+_async_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway():
+    """The shared LLMGateway, created from environment settings on first use"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+
+def get_async_llm_gateway():
+    """The shared AsyncLLMGateway. ASYNC_LLM_MAX_CONCURRENCY defaults much
+    higher than the threaded limit since waiting costs only a coroutine."""
+    global _async_gateway
+    with _gateway_lock:
+        if _async_gateway is None:
+            _async_gateway = AsyncLLMGateway(
+                max_concurrency=int(os.getenv('ASYNC_LLM_MAX_CONCURRENCY', 256)))
+        return _async_gateway
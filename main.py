@@ -1,10 +1,14 @@
 import streamlit as st
 from streamlit.components.v1 import html
-from langchain_helper import get_few_shot_db_chain
+from langchain_helper import get_cached_chain, warm_up_chain
 
 # Streamlit Page Config - must be first
 st.set_page_config(page_title="AskDB AI", page_icon="⚡", layout="centered")
 
+# Start loading the embedding model / FAISS index while the page renders.
+# No-op on reruns once the chain is built.
+warm_up_chain()
+
 # Theme state management
 if "theme" not in st.session_state:
     st.session_state.theme = "light-mode"
@@ -263,20 +267,32 @@ question = st.text_input(
 )
 
 # Process Query
+def insights_card(answer):
+    return f"""
+    <div class="glass-card">
+        <div class="card-label">Insights</div>
+        <div class="card-content">{answer}</div>
+    </div>
+    """
+
 if question:
     with st.spinner("Processing..."):
         try:
-            chain = get_few_shot_db_chain()
-            result_obj = chain.invoke({"query": question})
-            
-            answer = result_obj.get('result', str(result_obj)) if isinstance(result_obj, dict) else str(result_obj)
+            chain = get_cached_chain()
             
-            st.markdown(f"""
-            <div class="glass-card">
-                <div class="card-label">Insights</div>
-                <div class="card-content">{answer}</div>
-            </div>
-            """, unsafe_allow_html=True)
+            # Stream the SQL as the model writes it, then the answer as it is formatted
+            sql_box = st.empty()
+            answer_box = st.empty()
+            sql, answer = "", ""
+            for event, data in chain.stream(question):
+                if event == 'token':
+                    sql += data
+                    sql_box.code(sql, language="sql")
+                elif event == 'sql':
+                    sql_box.code(data, language="sql")
+                elif event == 'answer':
+                    answer += data
+                    answer_box.markdown(insights_card(answer), unsafe_allow_html=True)
             
         except Exception as e:
             st.markdown(f"""
@@ -0,0 +1,212 @@
+"""
+AskDB AI - Metrics
+In-process latency histograms, counters and a ring buffer of recent queries,
+rendered in Prometheus text format at /api/metrics and summarised for the
+dashboard's /api/metrics/* and /api/queries/recent endpoints.
+
+    stage latencies   askdb_stage_duration_seconds{stage="schema|retrieval|llm|execute|serialize|total"}
+    request latency   askdb_request_duration_seconds{endpoint="sql|nl"}
+    prompt size       askdb_prompt_schema_tokens{schema="full|linked"} (estimated)
+    counters          askdb_queries_total, askdb_cache_lookups_total, askdb_errors_total,
+                      askdb_sql_guard_decisions_total, askdb_db_reads_total
+
+Metrics are per process: with several gunicorn workers each scrape sees the
+worker that answered it (askdb_uptime_seconds carries its pid).
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import deque
+
+# Seconds; spans sub-millisecond cache hits to multi-second LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+RECENT_QUERIES = int(os.getenv('METRICS_RECENT_QUERIES', 200))
+ACTIVE_CLIENT_WINDOW = 24 * 3600
+MAX_TRACKED_CLIENTS = 10000
+
+_started_at = time.time()
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    pairs = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                     for k, v in labels)
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # labels tuple -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, seconds)] += 1
+            series[-1] += seconds
+
+    def snapshot(self):
+        """{labels: {'count', 'sum', 'buckets': [(le, cumulative)]}}"""
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        out = {}
+        for key, values in series.items():
+            cumulative, running = [], 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                running += count
+                cumulative.append((bound, running))
+            out[key] = {'count': running, 'sum': values[-1], 'buckets': cumulative}
+        return out
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, data in sorted(self.snapshot().items()):
+            for bound, count in data['buckets']:
+                lines.append(f"{self.name}_bucket{_label_text(key + (('le', _format_value(bound)),))} {count}")
+            lines.append(f"{self.name}_sum{_label_text(key)} {data['sum']:.6f}")
+            lines.append(f"{self.name}_count{_label_text(key)} {data['count']}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Sum over every series matching the given labels"""
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(v for k, v in self._values.items() if wanted <= set(k))
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_label_text(key)} {value}" for key, value in values)
+        return lines
+
+
+# ============================================================================
+# PROCESS-WIDE METRICS
+# ============================================================================
+
+stage_duration = Histogram('askdb_stage_duration_seconds', 'Time spent in each query stage')
+request_duration = Histogram('askdb_request_duration_seconds', 'Time to respond to a query request')
+queries_total = Counter('askdb_queries_total', 'Query requests by endpoint and outcome')
+cache_lookups_total = Counter('askdb_cache_lookups_total', 'Cache lookups by cache and result')
+errors_total = Counter('askdb_errors_total', 'Failed queries by endpoint and stage')
+schema_tokens = Histogram('askdb_prompt_schema_tokens', 'Estimated schema tokens per prompt, whole schema vs linked',
+                          buckets=TOKEN_BUCKETS)
+guard_decisions_total = Counter('askdb_sql_guard_decisions_total', 'SQL cost guard decisions by action')
+db_reads_total = Counter('askdb_db_reads_total', 'Routed reads by target: replica, primary (none healthy), failover')
+
+_recent = deque(maxlen=RECENT_QUERIES)
+_recent_lock = threading.Lock()
+_clients = {}   # client address -> last seen
+_clients_lock = threading.Lock()
+
+
+def observe_stage(stage, seconds):
+    stage_duration.observe(seconds, stage=stage)
+
+
+def record_cache(cache, result):
+    cache_lookups_total.inc(cache=cache, result=result)
+
+
+def record_error(endpoint, stage):
+    errors_total.inc(endpoint=endpoint, stage=stage or 'unknown')
+
+
+def record_schema_tokens(full, linked):
+    schema_tokens.observe(full, schema='full')
+    schema_tokens.observe(linked, schema='linked')
+
+
+def record_guard(action):
+    guard_decisions_total.inc(action=action)
+
+
+def record_db_route(target):
+    db_reads_total.inc(target=target)
+
+
+def record_query(endpoint, query, status, seconds, rows=0, cache=None, client=None, error=None):
+    """Count a finished query request and add it to the recent-queries buffer"""
+    request_duration.observe(seconds, endpoint=endpoint)
+    queries_total.inc(endpoint=endpoint, status=status)
+    entry = {
+        'endpoint': endpoint,
+        'query': query,
+        'status': status,
+        'executionTime': int(seconds * 1000),
+        'rows': rows,
+        'cache': cache,
+        'timestamp': time.time(),
+    }
+    if error:
+        entry['error'] = error
+    with _recent_lock:
+        _recent.append(entry)
+    if client:
+        now = time.time()
+        with _clients_lock:
+            _clients[client] = now
+            if len(_clients) > MAX_TRACKED_CLIENTS:
+                for stale in [c for c, seen in _clients.items() if now - seen > ACTIVE_CLIENT_WINDOW]:
+                    del _clients[stale]
+
+
+def recent_queries(limit=20):
+    """Newest first"""
+    if limit <= 0:
+        return []   # [-0:] would be the whole buffer
+    with _recent_lock:
+        entries = list(_recent)[-limit:]
+    return [dict(e) for e in reversed(entries)]
+
+
+def active_clients(window=ACTIVE_CLIENT_WINDOW):
+    cutoff = time.time() - window
+    with _clients_lock:
+        return sum(1 for seen in _clients.values() if seen >= cutoff)
+
+
+def uptime_seconds():
+    return time.time() - _started_at
+
+
+def render_prometheus():
+    """All metrics in Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for metric in (stage_duration, request_duration, schema_tokens, queries_total, cache_lookups_total,
+                   errors_total, guard_decisions_total, db_reads_total):
+        lines.extend(metric.render())
+    lines.append('# HELP askdb_uptime_seconds Seconds since this worker started')
+    lines.append('# TYPE askdb_uptime_seconds gauge')
+    lines.append(f'askdb_uptime_seconds{_label_text((("pid", os.getpid()),))} {uptime_seconds():.1f}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,678 @@
+"""
+AskDB AI - NL→SQL Pipeline
+One engine for turning a question into SQL, running it and phrasing the
+answer, shared by the REST API (/api/query) and the Streamlit chain.
+
+    question cache → schema (or linked schema) → example retrieval → prompt → LLM → sanitize
+    → route → guard → execute → format → remember
+
+Each stage is a small object with a run(ctx) method; callers assemble the
+stages they need (e.g. the API has no few-shot retrieval) and swap in their
+own schema/prompt/format functions. Every stage is timed into ctx.timings.
+Pipeline.stream() runs the same stages but yields LLM tokens, the SQL, result
+rows and answer text as they become available. Pipeline.run_async() runs them
+from an event loop (asgi_server.py): stages with an async adapter (LLM,
+execute) await it, the rest run in worker threads.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pymysql
+
+import metrics
+from db_pool import get_pool
+from question_cache import get_question_cache, normalize_question
+from result_format import description_columns
+from sql_guard import QueryRejected, guard
+from structured_log import log_slow_query
+
+MAX_RESULT_ROWS = int(os.getenv('MAX_RESULT_ROWS', 50000))
+# Rows per streamed chunk
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', 500))
+# Questions of one batch in flight at once (LLM calls are further limited by the gateway)
+BATCH_CONCURRENCY = int(os.getenv('QUERY_BATCH_CONCURRENCY', 8))
+
+
+class PipelineError(Exception):
+    """A stage refused to continue; status is the HTTP status to report"""
+
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+
+class QueryContext:
+    """State carried through the stages of one question"""
+
+    def __init__(self, question, use_cache=True, **extras):
+        self.question = question
+        self.use_cache = use_cache
+        self.extras = extras
+        self.cache_tier = None       # 'exact' / 'semantic' when SQL came from the question cache
+        self.question_vector = None
+        self.schema = None
+        self.schema_link = None      # {'tables', 'tokens', 'full_tokens'} when the schema was pruned
+        self.examples = []
+        self.prompt = None
+        self.raw_sql = None
+        self.sql = None
+        self.guarded_sql = None      # ctx.sql as rewritten by the cost guard, what actually runs
+        self.db_config = None        # database the guard and execute stages use when routed (RouteStage)
+        self.router = None
+        self.guard = None            # cost guard decision (sql_guard.py)
+        self.rows = None             # list of dicts
+        self.columns = None          # [(name, type_code)] from cursor.description
+        self.truncated = False
+        self.answer = None
+        self.timings = {}            # stage name -> ms
+        self.failed_stage = None
+        self.error = None            # set instead of raising in batch runs
+
+
+# ============================================================================
+# SQL / ANSWER HELPERS
+# ============================================================================
+
+def clean_generated_sql(text):
+    """First statement of LLM output, without code fences or a SQLQuery: label"""
+    sql = text.strip().replace('```sql', '').replace('```', '').strip()
+    if 'SQLQuery:' in sql:
+        sql = sql.split('SQLQuery:')[1].strip()
+    return sql.split(';')[0].strip()
+
+
+def fetch_rows(db_config, sql, max_rows=MAX_RESULT_ROWS):
+    """(rows, truncated) for SQL; see fetch_result"""
+    rows, truncated, _ = fetch_result(db_config, sql, max_rows)
+    return rows, truncated
+
+
+def fetch_result(db_config, sql, max_rows=MAX_RESULT_ROWS):
+    """Execute SQL and read at most max_rows dict rows.
+
+    Uses an unbuffered cursor so rows past the cap are never pulled into
+    memory. Returns (rows, truncated, columns) with columns as
+    [(name, type_code)] for the result formatters; a truncated connection is
+    discarded instead of draining the rest of the result set. Statements
+    slower than SLOW_QUERY_MS go to the slow-query log.
+    """
+    pool = get_pool(db_config)
+    connection = pool.acquire()
+    complete = False
+    try:
+        start = time.perf_counter()
+        cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+        cursor.execute(sql)
+        columns = description_columns(cursor.description)
+        rows = cursor.fetchmany(max_rows + 1)
+        complete = len(rows) <= max_rows
+        if complete:
+            cursor.close()
+        log_slow_query(db_config, sql, time.perf_counter() - start, len(rows[:max_rows]))
+        return rows[:max_rows], not complete, columns
+    except pymysql.err.ProgrammingError:
+        # Bad SQL: the connection itself is fine
+        complete = True
+        raise
+    finally:
+        pool.release(connection, discard=not complete)
+
+
+def stream_result(db_config, sql, max_rows=MAX_RESULT_ROWS, chunk_rows=STREAM_CHUNK_ROWS):
+    """fetch_result a chunk at a time: yields ('columns', [(name, type_code)]),
+    ('rows', [dict, ...]) for every chunk_rows rows, then ('truncated', bool).
+    Closing the generator early discards the connection mid-result."""
+    pool = get_pool(db_config)
+    connection = pool.acquire()
+    complete = False
+    try:
+        start = time.perf_counter()
+        cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+        cursor.execute(sql)
+        yield 'columns', description_columns(cursor.description)
+        count = 0
+        while count < max_rows:
+            batch = cursor.fetchmany(min(chunk_rows, max_rows - count))
+            if not batch:
+                complete = True
+                break
+            count += len(batch)
+            yield 'rows', batch
+        else:
+            complete = cursor.fetchone() is None
+        if complete:
+            cursor.close()
+        log_slow_query(db_config, sql, time.perf_counter() - start, count)
+        yield 'truncated', not complete
+    except pymysql.err.ProgrammingError:
+        complete = True
+        raise
+    finally:
+        pool.release(connection, discard=not complete)
+
+
+def example_answer(rows):
+    """Short answer recorded with a learned few-shot example"""
+    if len(rows) == 1 and len(rows[0]) == 1:
+        return str(next(iter(rows[0].values())))
+    return f"{len(rows)} rows"
+
+
+# ============================================================================
+# STAGES
+# ============================================================================
+
+class Stage:
+    name = 'stage'
+    # Generation stages are skipped when the question cache supplied the SQL
+    generates = False
+    # Batched stages handle a whole batch in one run_batch() call; the rest
+    # run once per question, concurrently
+    batched = False
+
+    def run(self, ctx):
+        raise NotImplementedError
+
+    def run_batch(self, contexts):
+        for ctx in contexts:
+            self.run(ctx)
+
+    def stream(self, ctx):
+        """run(ctx), yielding (event, data) pairs as results appear; see Pipeline.stream"""
+        self.run(ctx)
+        yield from ()
+
+    async def run_async(self, ctx):
+        """run(ctx) from an event loop; blocking work goes to a worker thread"""
+        await asyncio.to_thread(self.run, ctx)
+
+
+class QuestionCacheLookup(Stage):
+    """Reuse SQL from an identical or near-identical earlier question.
+
+    embedder is called per request and returns an embed function or None, so
+    the semantic tier switches on once the embedding model has been loaded.
+    batch_embedder likewise returns an embed_documents-style function used to
+    embed a whole batch of questions in one call.
+    """
+    name = 'cache'
+    batched = True
+
+    def __init__(self, namespace, embedder=None, batch_embedder=None):
+        self.namespace = namespace
+        self.embedder = embedder
+        self.batch_embedder = batch_embedder
+
+    def run(self, ctx):
+        self._lookup(ctx, self.embedder() if self.embedder else None)
+
+    def run_batch(self, contexts):
+        embed_many = self.batch_embedder() if self.batch_embedder else None
+        lookup = [ctx for ctx in contexts if ctx.use_cache]
+        if embed_many is None or not lookup:
+            return super().run_batch(contexts)
+        keys = [normalize_question(ctx.question) for ctx in lookup]
+        vectors = dict(zip(keys, embed_many(keys)))
+        for ctx in contexts:
+            self._lookup(ctx, vectors.get)
+
+    def stream(self, ctx):
+        self.run(ctx)
+        if ctx.cache_tier is not None:
+            yield 'sql', ctx.sql
+
+    def _lookup(self, ctx, embed):
+        ctx.sql, ctx.cache_tier, ctx.question_vector = get_question_cache(self.namespace).get(
+            ctx.question, embed=embed, bypass=not ctx.use_cache)
+        metrics.record_cache('question', ctx.cache_tier or ('miss' if ctx.use_cache else 'bypass'))
+
+
+class SchemaStage(Stage):
+    name = 'schema'
+    generates = True
+    batched = True
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def run(self, ctx):
+        ctx.schema = self.provider(ctx)
+
+    def run_batch(self, contexts):
+        # Schema context doesn't depend on the question: build it once
+        schema = self.provider(contexts[0])
+        for ctx in contexts:
+            ctx.schema = schema
+
+
+class SchemaLinkStage(Stage):
+    """Per-question schema from a SchemaLinker (schema_linking.py): only the
+    relevant tables and columns. Falls back to provider (the full table_info)
+    when the linker declines: for small schemas, and for questions no table
+    matches well."""
+    name = 'schema'
+    generates = True
+    batched = True
+
+    def __init__(self, linker, provider):
+        self.linker = linker
+        self.provider = provider
+
+    def run(self, ctx):
+        self.run_batch([ctx])
+
+    def run_batch(self, contexts):
+        # Reuses the question cache's embeddings; the rest in one call
+        linked = self.linker.link_many([ctx.question for ctx in contexts],
+                                       [ctx.question_vector for ctx in contexts])
+        full = None
+        for ctx, schema in zip(contexts, linked):
+            if schema is not None:
+                ctx.schema, ctx.schema_link = schema.text, schema.stats()
+                continue
+            if full is None:
+                full = self.provider(ctx)
+            ctx.schema = full
+
+
+class ExampleRetrieval(Stage):
+    """Few-shot examples from a LangChain example selector.
+
+    Batches use the selector's select_examples_batch() (one embedding call
+    and one index search) when it has one.
+    """
+    name = 'retrieval'
+    generates = True
+    batched = True
+
+    def __init__(self, selector, inputs=None):
+        self.selector = selector
+        self.inputs = inputs or (lambda ctx: {'input': ctx.question})
+
+    def run(self, ctx):
+        ctx.examples = self.selector.select_examples(self.inputs(ctx))
+
+    def run_batch(self, contexts):
+        if not hasattr(self.selector, 'select_examples_batch'):
+            return super().run_batch(contexts)
+        selected = self.selector.select_examples_batch([self.inputs(ctx) for ctx in contexts])
+        for ctx, examples in zip(contexts, selected):
+            ctx.examples = examples
+
+
+class PromptStage(Stage):
+    name = 'prompt'
+    generates = True
+
+    def __init__(self, builder):
+        self.builder = builder
+
+    def run(self, ctx):
+        ctx.prompt = self.builder(ctx)
+
+    async def run_async(self, ctx):
+        self.run(ctx)   # string building only
+
+
+class LLMStage(Stage):
+    """gateway (or a function returning it) is an LLMGateway; async_gateway,
+    an AsyncLLMGateway used by run_async() instead of a worker thread."""
+    name = 'llm'
+    generates = True
+
+    def __init__(self, gateway, model, temperature=0.2, max_tokens=None, async_gateway=None):
+        self.gateway = gateway
+        self.async_gateway = async_gateway
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def _gateway(self, gateway=None):
+        gateway = gateway or self.gateway
+        gateway = gateway() if callable(gateway) else gateway
+        if not gateway.api_key:
+            raise PipelineError('Groq API key not configured', status=503)
+        return gateway
+
+    def run(self, ctx):
+        ctx.raw_sql = self._gateway().complete(ctx.prompt, model=self.model,
+                                               temperature=self.temperature, max_tokens=self.max_tokens)
+
+    async def run_async(self, ctx):
+        if self.async_gateway is None:
+            return await super().run_async(ctx)
+        ctx.raw_sql = await self._gateway(self.async_gateway).complete(
+            ctx.prompt, model=self.model, temperature=self.temperature, max_tokens=self.max_tokens)
+
+    def stream(self, ctx):
+        parts = []
+        for text in self._gateway().stream(ctx.prompt, model=self.model,
+                                           temperature=self.temperature, max_tokens=self.max_tokens):
+            parts.append(text)
+            yield 'token', text
+        ctx.raw_sql = ''.join(parts)
+
+
+class SanitizeStage(Stage):
+    name = 'sanitize'
+    generates = True
+
+    def __init__(self, cleaner=clean_generated_sql):
+        self.cleaner = cleaner
+
+    def run(self, ctx):
+        ctx.sql = self.cleaner(ctx.raw_sql)
+        if not ctx.sql:
+            raise PipelineError('The model did not return a SQL query', status=502)
+
+    def stream(self, ctx):
+        self.run(ctx)
+        yield 'sql', ctx.sql
+
+    async def run_async(self, ctx):
+        self.run(ctx)
+
+
+class RouteStage(Stage):
+    """Pick the database the SQL runs on: a read replica or the primary
+    (db_router.ReplicaRouter). The guard and execute stages use ctx.db_config;
+    execute repeats the statement on the primary if the replica is unreachable."""
+    name = 'route'
+
+    def __init__(self, router):
+        self.router = router
+
+    def run(self, ctx):
+        ctx.router = self.router
+        ctx.db_config = self.router.read_config()
+
+
+class GuardStage(Stage):
+    """SQL cost guard: LIMIT and MAX_EXECUTION_TIME added, EXPLAIN estimate
+    checked against the budget. ctx.sql stays as generated (it's what gets
+    cached and learned); the rewritten statement goes to ctx.guarded_sql.
+    max_execution_ms overrides the guard's default statement timeout."""
+    name = 'guard'
+
+    def __init__(self, db_config, max_rows=MAX_RESULT_ROWS, max_execution_ms=None):
+        self.db_config = db_config
+        self.max_rows = max_rows
+        self.max_execution_ms = max_execution_ms
+
+    def run(self, ctx):
+        try:
+            # One row past the cap so truncation is still detected
+            ctx.guarded_sql, ctx.guard = guard(ctx.db_config or self.db_config, ctx.sql, limit=self.max_rows + 1,
+                                               max_execution_ms=self.max_execution_ms)
+        except QueryRejected as e:
+            ctx.guard = e.decision
+            raise PipelineError(str(e), status=e.status)
+
+    def stream(self, ctx):
+        self.run(ctx)
+        yield 'guard', ctx.guard
+
+
+class ExecuteStage(Stage):
+    """Runs the guarded SQL. fetch_async, an async twin of fetch_result with
+    the same (db_config, sql, max_rows) -> (rows, truncated, columns)
+    contract, is what run_async() awaits when given."""
+    name = 'execute'
+
+    def __init__(self, db_config, max_rows=MAX_RESULT_ROWS, fetch_async=None):
+        self.db_config = db_config
+        self.max_rows = max_rows
+        self.fetch_async = fetch_async
+
+    def run(self, ctx):
+        sql = ctx.guarded_sql or ctx.sql
+        if ctx.router is None:
+            ctx.rows, ctx.truncated, ctx.columns = fetch_result(self.db_config, sql, self.max_rows)
+            return
+        ctx.rows, ctx.truncated, ctx.columns = ctx.router.run(
+            lambda db_config: fetch_result(db_config, sql, self.max_rows), ctx.db_config)
+
+    async def run_async(self, ctx):
+        if self.fetch_async is None:
+            return await super().run_async(ctx)
+        sql = ctx.guarded_sql or ctx.sql
+        db_config = ctx.db_config or self.db_config
+        try:
+            result = await self.fetch_async(db_config, sql, self.max_rows)
+        except Exception as e:
+            primary = ctx.router.fail_over(db_config, e) if ctx.router is not None else None
+            if primary is None:
+                raise
+            ctx.db_config = primary
+            result = await self.fetch_async(primary, sql, self.max_rows)
+        ctx.rows, ctx.truncated, ctx.columns = result
+
+    def _stream_result(self, ctx):
+        """stream_result on the routed database; failover can only happen before
+        the first event, while the statement is being sent"""
+        sql = ctx.guarded_sql or ctx.sql
+        db_config = ctx.db_config or self.db_config
+        events = stream_result(db_config, sql, self.max_rows)
+        try:
+            first = next(events)
+        except Exception as e:
+            primary = ctx.router.fail_over(db_config, e) if ctx.router is not None else None
+            if primary is None:
+                raise
+            ctx.db_config = primary
+            events = stream_result(primary, sql, self.max_rows)
+            first = next(events)
+        yield first
+        yield from events
+
+    def stream(self, ctx):
+        ctx.rows = []
+        for event, data in self._stream_result(ctx):
+            if event == 'columns':
+                ctx.columns = data
+            elif event == 'rows':
+                ctx.rows.extend(data)
+            else:
+                ctx.truncated = data
+                continue
+            yield event, data
+
+
+class FormatStage(Stage):
+    """formatter(rows, columns) -> answer text; see result_format.py.
+    chunks, the formatter's chunk generator, lets stream() send the answer
+    piece by piece."""
+    name = 'format'
+
+    def __init__(self, formatter, chunks=None):
+        self.formatter = formatter
+        self.chunks = chunks
+
+    def run(self, ctx):
+        ctx.answer = self.formatter(ctx.rows, ctx.columns)
+
+    def stream(self, ctx):
+        if self.chunks is None:
+            self.run(ctx)
+            yield 'answer', ctx.answer
+            return
+        parts = []
+        for text in self.chunks(ctx.rows, ctx.columns):
+            parts.append(text)
+            yield 'answer', text
+        ctx.answer = ''.join(parts)
+
+
+class RememberStage(Stage):
+    """Cache SQL that actually ran and offer it as a few-shot example.
+
+    learn is called as learn(question, sql, answer) for freshly generated SQL
+    that returned rows; it may be None.
+    """
+    name = 'remember'
+
+    def __init__(self, namespace, learn=None):
+        self.namespace = namespace
+        self.learn = learn
+
+    def run(self, ctx):
+        if ctx.cache_tier is not None:
+            return
+        if ctx.use_cache:
+            get_question_cache(self.namespace).put(ctx.question, ctx.sql, vector=ctx.question_vector)
+        if self.learn is not None and ctx.rows:
+            self.learn(ctx.question, ctx.sql, example_answer(ctx.rows))
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+
+class Pipeline:
+    def __init__(self, stages, name='nl'):
+        self.stages = list(stages)
+        self.name = name    # metrics label
+
+    def stage(self, name):
+        return next(stage for stage in self.stages if stage.name == name)
+
+    def replace(self, name, stage):
+        """Copy of this pipeline with the named stage swapped out"""
+        return Pipeline([stage if s.name == name else s for s in self.stages], self.name)
+
+    def run(self, question, use_cache=True, **extras):
+        """Run every stage for question; returns the QueryContext.
+
+        Exceptions propagate unchanged with ctx.failed_stage set on the
+        context attached as exc.query_context. Stage timings and failures are
+        recorded in metrics either way.
+        """
+        ctx = QueryContext(question, use_cache, **extras)
+        start = time.perf_counter()
+        for stage in self.stages:
+            if stage.generates and ctx.cache_tier is not None:
+                continue
+            stage_start = time.perf_counter()
+            try:
+                stage.run(ctx)
+            except Exception as e:
+                ctx.failed_stage = stage.name
+                e.query_context = ctx
+                metrics.record_error(self.name, stage.name)
+                raise
+            finally:
+                ctx.timings[stage.name] = round((time.perf_counter() - stage_start) * 1000, 2)
+                metrics.observe_stage(stage.name, ctx.timings[stage.name] / 1000.0)
+        ctx.timings['total'] = round((time.perf_counter() - start) * 1000, 2)
+        metrics.observe_stage('total', ctx.timings['total'] / 1000.0)
+        return ctx
+
+    async def run_async(self, question, use_cache=True, **extras):
+        """run() from an event loop: each stage's run_async() is awaited.
+        Same context, timings, metrics and exceptions as run()."""
+        ctx = QueryContext(question, use_cache, **extras)
+        start = time.perf_counter()
+        for stage in self.stages:
+            if stage.generates and ctx.cache_tier is not None:
+                continue
+            stage_start = time.perf_counter()
+            try:
+                await stage.run_async(ctx)
+            except Exception as e:
+                ctx.failed_stage = stage.name
+                e.query_context = ctx
+                metrics.record_error(self.name, stage.name)
+                raise
+            finally:
+                ctx.timings[stage.name] = round((time.perf_counter() - stage_start) * 1000, 2)
+                metrics.observe_stage(stage.name, ctx.timings[stage.name] / 1000.0)
+        ctx.timings['total'] = round((time.perf_counter() - start) * 1000, 2)
+        metrics.observe_stage('total', ctx.timings['total'] / 1000.0)
+        return ctx
+
+    def stream(self, question, use_cache=True, **extras):
+        """Run every stage like run(), yielding (event, data) as results appear:
+
+            ('token', text)        LLM output as it is generated
+            ('sql', sql)           the SQL to run, generated or from the question cache
+            ('guard', decision)    the cost guard's decision
+            ('columns', columns)   [(name, type_code)] of the result
+            ('rows', rows)         result rows, a chunk at a time
+            ('answer', text)       the formatted answer, a piece at a time
+            ('done', ctx)          the finished QueryContext
+
+        Exceptions propagate as in run(). A stage's timing includes the time
+        the consumer spends between its events.
+        """
+        ctx = QueryContext(question, use_cache, **extras)
+        start = time.perf_counter()
+        for stage in self.stages:
+            if stage.generates and ctx.cache_tier is not None:
+                continue
+            stage_start = time.perf_counter()
+            try:
+                yield from stage.stream(ctx)
+            except Exception as e:
+                ctx.failed_stage = stage.name
+                e.query_context = ctx
+                metrics.record_error(self.name, stage.name)
+                raise
+            finally:
+                ctx.timings[stage.name] = round((time.perf_counter() - stage_start) * 1000, 2)
+                metrics.observe_stage(stage.name, ctx.timings[stage.name] / 1000.0)
+        ctx.timings['total'] = round((time.perf_counter() - start) * 1000, 2)
+        metrics.observe_stage('total', ctx.timings['total'] / 1000.0)
+        yield 'done', ctx
+
+    def run_batch(self, questions, use_cache=True, concurrency=None):
+        """Run several questions together; returns their QueryContexts in order.
+
+        Batched stages (question cache, schema, retrieval) run once for the
+        whole batch and every question is charged their full duration; the
+        others (LLM, execute, ...) run concurrently, up to concurrency
+        questions at a time. A failing question gets ctx.error and
+        ctx.failed_stage and drops out; the rest carry on.
+        """
+        contexts = [QueryContext(question, use_cache) for question in questions]
+        with ThreadPoolExecutor(max_workers=concurrency or BATCH_CONCURRENCY,
+                                thread_name_prefix=f'{self.name}-batch') as executor:
+            for stage in self.stages:
+                active = [ctx for ctx in contexts if ctx.error is None
+                          and not (stage.generates and ctx.cache_tier is not None)]
+                if not active:
+                    continue
+                if stage.batched:
+                    stage_start = time.perf_counter()
+                    try:
+                        stage.run_batch(active)
+                    except Exception as e:
+                        for ctx in active:
+                            self._fail(ctx, stage, e)
+                    elapsed = round((time.perf_counter() - stage_start) * 1000, 2)
+                    metrics.observe_stage(stage.name, elapsed / 1000.0)
+                    for ctx in active:
+                        ctx.timings[stage.name] = elapsed
+                else:
+                    list(executor.map(lambda ctx: self._run_captured(stage, ctx), active))
+        for ctx in contexts:
+            ctx.timings['total'] = round(sum(ctx.timings.values()), 2)
+            metrics.observe_stage('total', ctx.timings['total'] / 1000.0)
+        return contexts
+
+    def _run_captured(self, stage, ctx):
+        stage_start = time.perf_counter()
+        try:
+            stage.run(ctx)
+        except Exception as e:
+            self._fail(ctx, stage, e)
+        finally:
+            ctx.timings[stage.name] = round((time.perf_counter() - stage_start) * 1000, 2)
+            metrics.observe_stage(stage.name, ctx.timings[stage.name] / 1000.0)
+
+    def _fail(self, ctx, stage, error):
+        ctx.error = error
+        ctx.failed_stage = stage.name
+        metrics.record_error(self.name, stage.name)
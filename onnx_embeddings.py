@@ -0,0 +1,143 @@
+"""
+AskDB AI - ONNX Embedding Backend
+Runs the sentence-transformers few-shot model with ONNX Runtime instead of
+torch: same tokenizer, mean pooling and L2 normalization, a fraction of the
+memory and import time. Selected with EMBEDDING_BACKEND=onnx (see
+embedding_service.load_embeddings).
+
+    fp32   onnx/model.onnx                 matches the torch model to ~1e-6
+    int8   onnx/model_quint8_avx2.onnx     dynamically quantized, smaller and faster
+
+The model files come from the Hugging Face repo of the model (downloaded once
+into the HF cache), or from a local file given by ONNX_MODEL_PATH.
+
+Offline fetch (e.g. in the Docker image):
+    python onnx_embeddings.py fetch [--variant int8]
+    python onnx_embeddings.py quantize model.onnx model-int8.onnx
+"""
+
+import argparse
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ONNX_VARIANT = os.getenv('ONNX_VARIANT', 'int8').lower()
+ONNX_MODEL_PATH = os.getenv('ONNX_MODEL_PATH')
+ONNX_THREADS = int(os.getenv('ONNX_THREADS', 0))   # 0: let ONNX Runtime decide
+# sentence-transformers' max_seq_length for all-MiniLM-L6-v2
+ONNX_MAX_LENGTH = int(os.getenv('ONNX_MAX_LENGTH', 256))
+
+VARIANT_FILES = {
+    'fp32': 'onnx/model.onnx',
+    'int8': 'onnx/model_quint8_avx2.onnx',
+}
+TOKENIZER_FILE = 'tokenizer.json'
+
+
+def _hub_file(model_name, filename):
+    from huggingface_hub import hf_hub_download
+    return hf_hub_download(model_name, filename)
+
+
+def variant_name(variant=None, model_path=None):
+    """Label of the model file in use, part of the few-shot index key"""
+    model_path = model_path or ONNX_MODEL_PATH
+    if model_path:
+        return 'file-' + os.path.splitext(os.path.basename(model_path))[0]
+    return variant or ONNX_VARIANT
+
+
+def model_files(model_name, variant=None, model_path=None):
+    """(onnx model path, tokenizer.json path), downloading into the HF cache if needed"""
+    variant = variant or ONNX_VARIANT
+    model_path = model_path or ONNX_MODEL_PATH
+    if variant not in VARIANT_FILES and not model_path:
+        raise ValueError(f"Unknown ONNX variant '{variant}' (expected one of {', '.join(VARIANT_FILES)})")
+    if model_path:
+        tokenizer = os.path.join(os.path.dirname(model_path), TOKENIZER_FILE)
+        if not os.path.exists(tokenizer):
+            tokenizer = _hub_file(model_name, TOKENIZER_FILE)
+        return model_path, tokenizer
+    return _hub_file(model_name, VARIANT_FILES[variant]), _hub_file(model_name, TOKENIZER_FILE)
+
+
+class OnnxEmbeddings(Embeddings):
+    """LangChain Embeddings over an ONNX export of a sentence-transformers model.
+
+    Pooling and normalization follow all-MiniLM-L6-v2's sentence-transformers
+    config (mean over non-padding tokens, then unit length).
+    """
+
+    def __init__(self, model_name, variant=None, model_path=None, threads=None, max_length=None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.variant = variant_name(variant, model_path)
+        onnx_file, tokenizer_file = model_files(model_name, variant, model_path)
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_file)
+        self.tokenizer.enable_truncation(max_length or ONNX_MAX_LENGTH)
+        pad_token = '[PAD]' if self.tokenizer.token_to_id('[PAD]') is not None else None
+        if pad_token:
+            self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token), pad_token=pad_token)
+        else:
+            self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        threads = ONNX_THREADS if threads is None else threads
+        if threads:
+            options.intra_op_num_threads = threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(onnx_file, options, providers=['CPUExecutionProvider'])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def _encode(self, texts):
+        encoded = self.tokenizer.encode_batch([text.replace("\n", " ") for text in texts])
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self._inputs:
+            feeds['token_type_ids'] = np.array([e.type_ids for e in encoded], dtype=np.int64)
+        token_vectors = self.session.run(None, {k: v for k, v in feeds.items() if k in self._inputs})[0]
+
+        mask = attention_mask[:, :, np.newaxis].astype(np.float32)
+        pooled = (token_vectors * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self._encode(list(texts)).astype(np.float32).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def quantize(source, target):
+    """Dynamic int8 quantization of an fp32 export (for models without a published int8 file)"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+    return target
+
+
+if __name__ == '__main__':
+    from langchain_helper import EMBEDDING_MODEL
+
+    parser = argparse.ArgumentParser(description='Fetch or quantize the ONNX embedding model')
+    sub = parser.add_subparsers(dest='command', required=True)
+    fetch = sub.add_parser('fetch', help='download the model files into the HF cache')
+    fetch.add_argument('--variant', choices=sorted(VARIANT_FILES), default=None)
+    fetch.add_argument('--model', default=EMBEDDING_MODEL)
+    quant = sub.add_parser('quantize', help='int8-quantize a local fp32 model')
+    quant.add_argument('source')
+    quant.add_argument('target')
+    args = parser.parse_args()
+
+    if args.command == 'fetch':
+        model_file, tokenizer_file = model_files(args.model, args.variant)
+        print(f"✅ {model_file}\n✅ {tokenizer_file}")
+    else:
+        print(f"✅ Quantized {args.source} -> {quantize(args.source, args.target)}")
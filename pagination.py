@@ -0,0 +1,70 @@
+"""
+AskDB AI - Result Pagination
+Wraps a SELECT in an outer query that returns one page, with opaque cursor
+tokens for the next page. Two strategies:
+
+    offset  - LIMIT n OFFSET k; works for any query, cost grows with k
+    keyset  - WHERE key > last_seen ORDER BY key; constant cost per page,
+              needs a unique, orderable column in the result (order_by)
+"""
+
+import base64
+import json
+import re
+
+from pymysql.converters import escape_item
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_$]*$')
+
+
+def encode_cursor(state):
+    raw = json.dumps(state, default=str, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(token):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError('Invalid pagination cursor')
+    if not isinstance(state, dict):
+        raise ValueError('Invalid pagination cursor')
+    return state
+
+
+def paginate_sql(sql, page_size, cursor=None, order_by=None):
+    """Return (paged_sql, state) fetching page_size + 1 rows of sql.
+
+    The extra row tells next_cursor() whether another page exists. Raises
+    ValueError for a malformed cursor or order_by column.
+    """
+    if page_size < 1:
+        raise ValueError('page_size must be at least 1')
+    inner = sql.strip().rstrip(';')
+    state = decode_cursor(cursor) if cursor else {}
+
+    if order_by:
+        if not _IDENTIFIER.match(order_by):
+            raise ValueError(f'Invalid order_by column: {order_by}')
+        where = ''
+        if 'after' in state:
+            where = f" WHERE `{order_by}` > {escape_item(state['after'], 'utf8mb4')}"
+        return (f"SELECT * FROM ({inner}) AS page{where} "
+                f"ORDER BY `{order_by}` LIMIT {page_size + 1}"), state
+
+    # Without an ORDER BY in the user's query MySQL does not promise a stable
+    # row order between pages; offset paging is best-effort in that case.
+    offset = int(state.get('offset', 0))
+    if offset < 0:
+        raise ValueError('Invalid pagination cursor')
+    return f"SELECT * FROM ({inner}) AS page LIMIT {page_size + 1} OFFSET {offset}", state
+
+
+def next_cursor(rows, page_size, state, order_by=None):
+    """Trim rows to one page and return (rows, next_cursor or None)"""
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    if order_by:
+        return rows, encode_cursor({'after': rows[-1][order_by]})
+    return rows, encode_cursor({'offset': int(state.get('offset', 0)) + page_size})
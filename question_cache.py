@@ -0,0 +1,184 @@
+"""
+AskDB AI - Question Cache
+Maps natural-language questions to previously generated SQL so repeated
+questions skip the LLM. Two tiers: exact match on normalized text, then
+embedding similarity above a threshold.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_QUOTES = str.maketrans({'‘': "'", '’': "'", '“': '"', '”': '"'})
+
+
+def normalize_question(question):
+    """Lowercase, unify curly quotes, collapse whitespace and drop trailing punctuation"""
+    text = question.translate(_QUOTES).lower()
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text.rstrip('?.! ')
+
+
+class QuestionCache:
+    """LRU + TTL cache of question -> SQL.
+
+    The semantic tier only runs when an embed function is supplied (normally
+    the few-shot selector's HuggingFaceEmbeddings.embed_query, so no extra
+    model is loaded). Keep the threshold high: "white Levi shirts" and "black
+    Levi shirts" are close in embedding space but need different SQL.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, threshold=None):
+        self.max_entries = max_entries or int(os.getenv('QUESTION_CACHE_SIZE', 1000))
+        self.ttl = ttl if ttl is not None else float(os.getenv('QUESTION_CACHE_TTL', 3600))
+        self.threshold = threshold if threshold is not None else float(os.getenv('QUESTION_CACHE_THRESHOLD', 0.95))
+        self.enabled = os.getenv('QUESTION_CACHE_ENABLED', 'true').lower() != 'false'
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # normalized question -> (sql, vector or None, stored_at)
+        self._matrix = None             # stacked unit vectors for the semantic tier
+        self._matrix_keys = []
+        self._matrix_dirty = False
+
+        self._exact_hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._evictions = 0
+
+    def get(self, question, embed=None, bypass=False):
+        """Look up question.
+
+        Returns (sql, tier, vector). tier is 'exact', 'semantic' or None on a
+        miss; vector is the question embedding (if one was computed) so the
+        caller can hand it back to put() without embedding twice.
+        """
+        if bypass or not self.enabled:
+            with self._lock:
+                self._bypassed += 1
+            return None, None, None
+
+        key = normalize_question(question)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[2] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._exact_hits += 1
+                    return entry[0], 'exact', entry[1]
+                self._remove_locked(key)
+
+        if embed is None:
+            with self._lock:
+                self._misses += 1
+            return None, None, None
+
+        vector = _unit(embed(key))
+        with self._lock:
+            match = self._nearest_locked(vector, now)
+            if match is not None:
+                self._entries.move_to_end(match)
+                self._semantic_hits += 1
+                return self._entries[match][0], 'semantic', vector
+            self._misses += 1
+        return None, None, vector
+
+    def put(self, question, sql, vector=None):
+        """Store SQL that executed successfully for question"""
+        if not self.enabled:
+            return
+        key = normalize_question(question)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (sql, vector, time.monotonic())
+            if vector is not None:
+                self._matrix_dirty = True
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self._matrix_keys = []
+            self._matrix_dirty = False
+
+    def stats(self):
+        with self._lock:
+            hits = self._exact_hits + self._semantic_hits
+            lookups = hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'exact_hits': self._exact_hits,
+                'semantic_hits': self._semantic_hits,
+                'misses': self._misses,
+                'bypassed': self._bypassed,
+                'evictions': self._evictions,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _remove_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[1] is not None:
+            self._matrix_dirty = True
+
+    def _nearest_locked(self, vector, now):
+        if self._matrix_dirty:
+            keys = [k for k, (_, v, _) in self._entries.items() if v is not None]
+            self._matrix = np.vstack([self._entries[k][1] for k in keys]) if keys else None
+            self._matrix_keys = keys
+            self._matrix_dirty = False
+        if self._matrix is None:
+            return None
+
+        scores = self._matrix @ vector
+        for idx in np.argsort(scores)[::-1]:
+            if scores[idx] < self.threshold:
+                return None
+            key = self._matrix_keys[idx]
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[2] <= self.ttl:
+                return key
+        return None
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# ============================================================================
+# PROCESS-WIDE REGISTRY
+# ============================================================================
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_question_cache(namespace='default'):
+    """Shared QuestionCache for a namespace (normally the database name)"""
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = QuestionCache()
+            _caches[namespace] = cache
+        return cache
+
+
+def question_cache_stats():
+    with _caches_lock:
+        caches = dict(_caches)
+    return {namespace: cache.stats() for namespace, cache in caches.items()}
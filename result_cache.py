@@ -0,0 +1,302 @@
+"""
+AskDB AI - SQL Result Cache
+Caches SELECT results keyed on normalized SQL text. Entries are dropped when a
+referenced table's CREATE_TIME/UPDATE_TIME changes, when they outlive the TTL,
+or when the memory budget forces LRU eviction.
+
+Backends:
+    memory  - per-process OrderedDict (default)
+    sqlite  - file shared by every gunicorn worker on the host
+"""
+
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Results of these can change without any table changing
+NON_DETERMINISTIC = re.compile(
+    r'\b(NOW|SYSDATE|CURDATE|CURTIME|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|'
+    r'UTC_DATE|UTC_TIME|UTC_TIMESTAMP|UNIX_TIMESTAMP|RAND|UUID|UUID_SHORT|CONNECTION_ID|'
+    r'LAST_INSERT_ID|FOUND_ROWS|SLEEP|USER|CURRENT_USER)\s*\(',
+    re.IGNORECASE,
+)
+_STRING_OR_SPACE = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)|\s+")
+_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+# An alias is any word after the table name except a keyword that can follow
+# it; otherwise "FROM a JOIN b" would read JOIN as a's alias and miss b
+_ALIAS = (r'(?:\s*(?:AS\s+)?(?!(?:JOIN|INNER|CROSS|STRAIGHT_JOIN|LEFT|RIGHT|NATURAL|ON|USING|WHERE|GROUP|'
+          r'HAVING|WINDOW|ORDER|LIMIT|UNION|FOR|LOCK|INTO|PARTITION|USE|IGNORE|FORCE)\b)[\w$]+)?')
+_TABLE_NAME = r'(?:`[^`]+`|[\w$]+)(?:\.(?:`[^`]+`|[\w$]+))?'
+_TABLE_REF = re.compile(
+    rf'\b(?:FROM|JOIN)\s+({_TABLE_NAME}{_ALIAS}(?:\s*,\s*{_TABLE_NAME}{_ALIAS})*)',
+    re.IGNORECASE,
+)
+
+
+def normalize_sql(sql):
+    """Collapse whitespace outside quoted literals and drop a trailing semicolon"""
+    def _replace(match):
+        return match.group(1) if match.group(1) else ' '
+    return _STRING_OR_SPACE.sub(_replace, sql).strip().rstrip(';').strip()
+
+
+def referenced_tables(sql):
+    """Lowercased table names after FROM/JOIN (schema prefixes stripped).
+
+    String literals are blanked first so "... WHERE note = 'from x'" doesn't
+    name a table x.
+    """
+    tables = set()
+    for match in _TABLE_REF.finditer(_LITERAL.sub("''", sql)):
+        for ref in match.group(1).split(','):
+            name = ref.strip().split()[0]
+            tables.add(name.split('.')[-1].strip('`').lower())
+    return tables
+
+
+def _estimate_bytes(results):
+    """Rough in-memory size of a list of row dicts"""
+    total = sys.getsizeof(results)
+    for row in results:
+        total += sys.getsizeof(row)
+        for value in row.values():
+            total += sys.getsizeof(value)
+    return total
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class MemoryBackend:
+    """Per-process LRU bounded by total entry bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        """Store entry; returns the number of entries evicted to make room"""
+        evicted = 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old['size']
+            self._entries[key] = entry
+            self._bytes += entry['size']
+            while self._bytes > self.max_bytes and self._entries:
+                _, oldest = self._entries.popitem(last=False)
+                self._bytes -= oldest['size']
+                evicted += 1
+        return evicted
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry['size']
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def usage(self):
+        with self._lock:
+            return len(self._entries), self._bytes
+
+
+class SQLiteBackend:
+    """LRU in a SQLite file so multiple worker processes share one cache"""
+
+    def __init__(self, max_bytes, path):
+        self.max_bytes = max_bytes
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _db(self):
+        # One connection per process; never reuse a handle across fork
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, payload BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            db = self._db()
+            row = db.execute('SELECT payload FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute('UPDATE results SET accessed = ? WHERE key = ?', (time.time(), key))
+        return pickle.loads(row[0])
+
+    def put(self, key, entry):
+        evicted = 0
+        payload = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            db = self._db()
+            db.execute('INSERT OR REPLACE INTO results (key, payload, size, accessed) VALUES (?, ?, ?, ?)',
+                       (key, payload, entry['size'], time.time()))
+            total = db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            if total > self.max_bytes:
+                for old_key, size in db.execute('SELECT key, size FROM results ORDER BY accessed').fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    db.execute('DELETE FROM results WHERE key = ?', (old_key,))
+                    total -= size
+                    evicted += 1
+        return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._db().execute('DELETE FROM results WHERE key = ?', (key,))
+
+    def clear(self):
+        with self._lock:
+            self._db().execute('DELETE FROM results')
+
+    def usage(self):
+        with self._lock:
+            count, size = self._db().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        return count, size
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class ResultCache:
+    """SELECT result cache with table-level invalidation.
+
+    version_source() must return {table_name_lower: version} for the current
+    database (see SchemaCache.table_versions); an entry is served only while
+    every table it read still has the version recorded at store time.
+    """
+
+    def __init__(self, version_source, backend=None, ttl=None, max_entry_bytes=None):
+        max_bytes = int(os.getenv('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        if backend is None:
+            if os.getenv('RESULT_CACHE_BACKEND', 'memory') == 'sqlite':
+                backend = SQLiteBackend(max_bytes, os.getenv('RESULT_CACHE_PATH', '/tmp/askdb_result_cache.sqlite'))
+            else:
+                backend = MemoryBackend(max_bytes)
+        self.backend = backend
+        self.version_source = version_source
+        self.ttl = ttl if ttl is not None else float(os.getenv('RESULT_CACHE_TTL', 300))
+        self.max_entry_bytes = max_entry_bytes or int(os.getenv('RESULT_CACHE_MAX_ENTRY_BYTES', backend.max_bytes // 4))
+        self.enabled = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() != 'false'
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._invalidations = 0
+        self._evictions = 0
+        self._saved_ms = 0
+
+    @staticmethod
+    def cache_key(sql):
+        return hashlib.sha1(normalize_sql(sql).encode('utf-8')).hexdigest()
+
+    def cacheable(self, sql):
+        return self.enabled and not NON_DETERMINISTIC.search(sql)
+
+    def get(self, sql):
+        """Return (results, original_execution_ms) or None"""
+        if not self.cacheable(sql):
+            self._count('_bypassed')
+            return None
+        key = self.cache_key(sql)
+        entry = self.backend.get(key)
+        if entry is None:
+            self._count('_misses')
+            return None
+
+        stale = time.time() - entry['stored_at'] > self.ttl
+        if not stale:
+            current = self.version_source()
+            stale = any(current.get(table) != version for table, version in entry['versions'].items())
+        if stale:
+            self.backend.delete(key)
+            self._count('_invalidations')
+            self._count('_misses')
+            return None
+
+        with self._lock:
+            self._hits += 1
+            self._saved_ms += entry['execution_ms']
+        return entry['results'], entry['execution_ms']
+
+    def put(self, sql, results, execution_ms):
+        """Store results unless they are uncacheable or too large"""
+        if not self.cacheable(sql):
+            return False
+        tables = referenced_tables(sql)
+        current = self.version_source()
+        if any(table not in current for table in tables):
+            # Unknown table (other schema, parse miss): we couldn't invalidate it
+            return False
+        size = _estimate_bytes(results)
+        if size > self.max_entry_bytes:
+            return False
+        entry = {
+            'results': results,
+            'versions': {table: current[table] for table in tables},
+            'execution_ms': execution_ms,
+            'stored_at': time.time(),
+            'size': size,
+        }
+        evicted = self.backend.put(self.cache_key(sql), entry)
+        if evicted:
+            with self._lock:
+                self._evictions += evicted
+        return True
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        entries, size = self.backend.usage()
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self.enabled,
+                'backend': type(self.backend).__name__,
+                'entries': entries,
+                'bytes': size,
+                'max_bytes': self.backend.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'bypassed': self._bypassed,
+                'invalidations': self._invalidations,
+                'evictions': self._evictions,
+                'saved_ms': self._saved_ms,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
@@ -0,0 +1,239 @@
+"""
+AskDB AI - Result Formatting
+Turns query results into the chat / API answer text column by column: each
+column's kind is decided once (from cursor.description type codes when the
+executor captured them, else from its first non-NULL value), numeric totals
+are reductions over whole columns, and each line is a single f-string / join
+per row with no per-row type checks.
+
+    chain_answer_chunks(rows, columns)   Streamlit markdown, streamed in chunks
+    nl_answer_chunks(rows)               /api/query answer text, streamed
+
+Columns holding NULLs in a numeric column fall back to a per-row path that
+renders them exactly like the original row-by-row formatter.
+"""
+
+import os
+from operator import itemgetter
+
+import numpy as np
+from pymysql.constants import FIELD_TYPE
+
+# Lines per streamed chunk
+STREAM_CHUNK_LINES = int(os.getenv('RESULT_STREAM_CHUNK_LINES', 1000))
+
+INTEGER_TYPES = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.LONGLONG,
+                 FIELD_TYPE.INT24, FIELD_TYPE.YEAR}
+FLOAT_TYPES = {FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE}
+
+# The chat answer's per-size breakdown of full t_shirts rows
+SIZE_COLUMN = 'size'
+STOCK_COLUMN = 'stock_quantity'
+
+
+# ============================================================================
+# COLUMNS
+# ============================================================================
+
+def _kind_of_type(type_code):
+    if type_code in INTEGER_TYPES:
+        return 'int'
+    if type_code in FLOAT_TYPES:
+        return 'float'
+    # DECIMAL arrives as Decimal: shown as-is and not totalled, like strings
+    return 'text'
+
+
+def _kind_of_value(values):
+    value = next((v for v in values if v is not None), None)
+    if isinstance(value, (int, float)):     # bool counts as int, as it always has
+        return 'int' if isinstance(value, int) else 'float'
+    return 'text'
+
+
+class Column:
+    """One result column: name, kind ('int' / 'float' / 'text') and its
+    values in row order, pulled out of the rows only if a formatter asks"""
+
+    __slots__ = ('name', '_rows', '_kind', '_values', '_has_null')
+
+    def __init__(self, name, rows, kind=None):
+        self.name = name
+        self._rows = rows
+        self._kind = kind
+        self._values = None
+        self._has_null = None
+
+    @property
+    def values(self):
+        if self._values is None:
+            self._values = list(map(itemgetter(self.name), self._rows))
+        return self._values
+
+    @property
+    def kind(self):
+        if self._kind is None:
+            self._kind = _kind_of_value(self.values)
+        return self._kind
+
+    @property
+    def has_null(self):
+        if self._has_null is None:
+            self._has_null = None in self.values
+        return self._has_null
+
+    @property
+    def numeric(self):
+        return self.kind != 'text'
+
+    def total(self):
+        """Sum of the non-NULL values (0 for non-numeric columns)"""
+        if not self.numeric:
+            return 0
+        values = [v for v in self.values if v is not None] if self.has_null else self.values
+        if self.kind == 'float':
+            return float(np.asarray(values, dtype=np.float64).sum())
+        return sum(values)      # exact, and already a single C loop over ints
+
+
+def to_columns(rows, columns=None):
+    """Columns of dict rows; columns is [(name, type_code), ...] from cursor.description"""
+    if not rows:
+        return []
+    # Dict keys, not description names: the dict cursor renames duplicate columns
+    names = list(rows[0].keys())
+    if columns and len(columns) == len(names):
+        return [Column(name, rows, _kind_of_type(type_code)) for name, (_, type_code) in zip(names, columns)]
+    return [Column(name, rows) for name in names]
+
+
+def description_columns(description):
+    """[(name, type_code)] from a DB-API cursor.description"""
+    return [(d[0], d[1]) for d in description] if description else None
+
+
+# ============================================================================
+# STREAMING
+# ============================================================================
+
+def _chunked(lines, size=None):
+    """Join a list of lines with newlines, STREAM_CHUNK_LINES at a time"""
+    size = size or STREAM_CHUNK_LINES
+    for start in range(0, len(lines), size):
+        yield ('\n' if start else '') + '\n'.join(lines[start:start + size])
+
+
+def _as_int(column):
+    # bool is an int but prints as True/False; the row formatter showed int(value)
+    if column.kind == 'float' or isinstance(column.values[0], bool):
+        return map(int, column.values)
+    return column.values
+
+
+# ============================================================================
+# CHAT ANSWER (Streamlit)
+# ============================================================================
+
+def _stock_columns(cols):
+    by_name = {c.name.lower(): c for c in cols}
+    if SIZE_COLUMN in by_name and STOCK_COLUMN in by_name:
+        return by_name[SIZE_COLUMN], by_name[STOCK_COLUMN]
+    return cols[3], cols[5]
+
+
+def _fallback_breakdown(cols, label, value):
+    """Row-by-row rendering when the stock column isn't clean integers/floats:
+    (lines, total), exactly as the original formatter showed such rows"""
+    lines, total = [], 0
+    rows = zip(*(c.values for c in cols))
+    for item, amount, row in zip(label.values, value.values, rows):
+        if value.numeric and amount is not None:
+            total += amount
+        elif len(cols) == 2:
+            lines.append(f"{item}: {amount}")
+            continue
+        try:
+            lines.append(f"Size {item}: {int(amount)} items available")
+        except (TypeError, ValueError):
+            lines.append(str(row))
+    return lines, total
+
+
+def _breakdown(cols):
+    """(lines, total) for results with several rows and columns"""
+    if len(cols) == 2 or len(cols) >= 6:
+        label, value = cols if len(cols) == 2 else _stock_columns(cols)
+        if len(cols) == 2 and not value.numeric:
+            return [f"{item}: {amount}" for item, amount in zip(label.values, value.values)], 0
+        if len(cols) == 2 and value.kind == 'int' and value.has_null:
+            lines = [f"Size {item}: {amount} items available" if amount is not None else f"{item}: None"
+                     for item, amount in zip(label.values, value.values)]
+            return lines, value.total()
+        if not value.numeric or value.has_null:
+            return _fallback_breakdown(cols, label, value)
+        lines = [f"Size {item}: {amount} items available" for item, amount in zip(label.values, _as_int(value))]
+        return lines, value.total()
+
+    # Stringify column by column, then one join per row
+    text_columns = [map(str, c.values) for c in cols]
+    return [' | '.join(row) for row in zip(*text_columns)], sum(c.total() for c in cols)
+
+
+def chain_answer_chunks(rows, columns=None):
+    """Markdown answer for the Streamlit chat, as text chunks to concatenate"""
+    if not rows:
+        yield "No results found."
+        return
+    cols = to_columns(rows, columns)
+
+    # Single value result (like COUNT, SUM, AVG, etc.)
+    if len(rows) == 1 and len(cols) == 1:
+        yield f"**{cols[0].values[0]}**"
+        return
+
+    # Several rows and columns: per-row breakdown plus a stock total
+    if len(rows) > 1 and len(cols) > 1:
+        lines, total = _breakdown(cols)
+        yield from _chunked(lines)
+        if total > 0:
+            yield f"\n\n**Total Stock: {int(total)}**"
+        return
+
+    # Fallback: simple list
+    if len(rows) <= 5:
+        yield '\n'.join(f"- {', '.join(map(str, row.values()))}" for row in rows)
+    else:
+        yield f"Found {len(rows)} results"
+
+
+def format_chain_answer(rows, columns=None):
+    return ''.join(chain_answer_chunks(rows, columns))
+
+
+# ============================================================================
+# API ANSWER (/api/query)
+# ============================================================================
+
+NL_PREVIEW_ROWS = 5
+
+
+def nl_answer_chunks(rows, columns=None):
+    """Human-readable answer for /api/query, as text chunks to concatenate"""
+    if not rows:
+        yield "No results found."
+        return
+    if len(rows) == 1 and len(rows[0]) == 1:
+        # Single value result
+        yield f"The answer is: {next(iter(rows[0].values()))}"
+        return
+    # Multiple results - format as text (the answer has always carried
+    # literal "\n" sequences; clients depend on them)
+    yield f"Found {len(rows)} results:\\n"
+    for i, row in enumerate(rows[:NL_PREVIEW_ROWS], 1):
+        yield f"{i}. {', '.join(f'{k}: {v}' for k, v in row.items())}\\n"
+    if len(rows) > NL_PREVIEW_ROWS:
+        yield f"... and {len(rows) - NL_PREVIEW_ROWS} more"
+
+
+def format_nl_answer(rows, columns=None):
+    return ''.join(nl_answer_chunks(rows, columns))
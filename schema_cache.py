@@ -0,0 +1,310 @@
+"""
+AskDB AI - Schema Cache
+Keeps table lists, column metadata (types, keys, comments, foreign keys) and
+whatever is derived from them - the rendered prompt table_info, the schema
+linking index - in memory, invalidated when information_schema reports a
+schema change or the TTL expires.
+
+Two fingerprints are polled:
+    ddl        table CREATE_TIMEs plus a checksum of information_schema.COLUMNS;
+               a change drops everything above
+    versions   per-table CREATE_TIME/UPDATE_TIME; data writes move it, and only
+               the result cache (table_versions) follows it
+"""
+
+import os
+import threading
+import time
+
+from db_pool import get_pool
+from structured_log import get_logger, log_fields
+
+FINGERPRINT_SQL = (
+    "SELECT TABLE_NAME, CREATE_TIME, UPDATE_TIME FROM information_schema.TABLES "
+    "WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME"
+)
+COLUMNS_CHECKSUM_SQL = (
+    "SELECT COUNT(*), BIT_XOR(CRC32(CONCAT_WS('|', TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION, "
+    "COLUMN_TYPE, COLUMN_KEY, COLUMN_COMMENT))) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s"
+)
+COLUMNS_SQL = (
+    "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, COLUMN_KEY, COLUMN_COMMENT FROM information_schema.COLUMNS "
+    "WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME, ORDINAL_POSITION"
+)
+TABLE_COMMENTS_SQL = (
+    "SELECT TABLE_NAME, TABLE_COMMENT FROM information_schema.TABLES "
+    "WHERE TABLE_SCHEMA = %s AND TABLE_COMMENT <> ''"
+)
+FOREIGN_KEYS_SQL = (
+    "SELECT TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
+    "FROM information_schema.KEY_COLUMN_USAGE "
+    "WHERE TABLE_SCHEMA = %s AND REFERENCED_TABLE_NAME IS NOT NULL "
+    "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+)
+
+
+class SchemaCache:
+    """Schema metadata for one database.
+
+    Reads never wait on the database once the cache is warm: when the poll
+    interval has elapsed the cached value is returned immediately and the
+    fingerprints are re-checked in a background thread. Column metadata,
+    table_info and derived values (the schema linking index) are keyed on
+    the DDL fingerprint only, so data writes don't force a rebuild. A hard
+    TTL forces a synchronous reload regardless.
+    """
+
+    def __init__(self, db_config, ttl=None, poll_interval=None):
+        self.db_config = db_config
+        self.ttl = ttl if ttl is not None else float(os.getenv('SCHEMA_CACHE_TTL', 3600))
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv('SCHEMA_POLL_INTERVAL', 30))
+
+        self._lock = threading.Lock()
+        self._fingerprint = None      # ((table, CREATE_TIME, UPDATE_TIME), ...)
+        self._ddl = None
+        self._tables = None
+        self._columns = None
+        self._details = None
+        self._table_info = None
+        self._derived = {}
+        self._build_lock = threading.Lock()
+        self._versions_lock = threading.Lock()
+        self._versions_at = 0.0
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._checking = False
+        self._generation = 0
+
+        self._hits = 0
+        self._loads = 0
+        self._invalidations = 0
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def tables(self):
+        """Table names in the database"""
+        tables, _ = self._ensure_loaded()
+        return list(tables)
+
+    def columns(self, table):
+        """[(column_name, column_type), ...] for table, in ordinal order"""
+        _, columns = self._ensure_loaded()
+        return list(columns.get(table, []))
+
+    def details(self):
+        """{'tables': {table: comment}, 'columns': {table: [(name, type, key, comment)]},
+        'foreign_keys': [(table, column, referenced_table, referenced_column)]}"""
+        while True:
+            self._ensure_loaded()
+            with self._lock:
+                # None only if an invalidation landed in between
+                if self._details is not None:
+                    return self._details
+
+    def table_info(self, render):
+        """Rendered table_info text for prompts.
+
+        render is called (e.g. SQLDatabase.get_table_info) only when nothing is
+        cached or the schema changed since the last render.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            text = self._table_info
+            generation = self._generation
+        if text is None:
+            text = render()
+            with self._lock:
+                # Don't store a render that raced with an invalidation
+                if generation == self._generation:
+                    self._table_info = text
+        return text
+
+    def derived(self, key, build):
+        """Value computed by build() from the current schema, kept until the
+        schema changes. Concurrent first callers wait for a single build."""
+        self._ensure_loaded()
+        with self._lock:
+            if key in self._derived:
+                return self._derived[key]
+        with self._build_lock:
+            with self._lock:
+                if key in self._derived:
+                    return self._derived[key]
+                generation = self._generation
+            value = build()
+            with self._lock:
+                if generation == self._generation:
+                    self._derived[key] = value
+        return value
+
+    def table_versions(self, max_age=None):
+        """{table_name_lower: (CREATE_TIME, UPDATE_TIME)} from the cached fingerprint.
+
+        With max_age (seconds), versions older than that are re-read first (one
+        small information_schema query, shared by concurrent callers), so a
+        write shows up within max_age rather than the poll interval.
+        """
+        self._ensure_loaded()
+        if max_age is not None:
+            with self._lock:
+                fresh = time.monotonic() - self._versions_at <= max_age
+            if not fresh:
+                self._refresh_versions(max_age)
+        with self._lock:
+            fingerprint = self._fingerprint or ()
+        return {name.lower(): (created, updated) for name, created, updated in fingerprint}
+
+    def invalidate(self):
+        """Drop everything; the next read reloads synchronously"""
+        with self._lock:
+            self._clear_locked()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'loads': self._loads,
+                'invalidations': self._invalidations,
+                'tables': len(self._tables or []),
+                'age_s': round(time.monotonic() - self._loaded_at, 1) if self._tables is not None else None,
+            }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _ensure_loaded(self):
+        """Return a consistent (tables, columns) snapshot, loading if needed"""
+        now = time.monotonic()
+        with self._lock:
+            if self._tables is None or now - self._loaded_at > self.ttl:
+                self._load_locked()
+                return self._tables, self._columns
+            self._hits += 1
+            snapshot = (self._tables, self._columns)
+            if now - self._checked_at < self.poll_interval or self._checking:
+                return snapshot
+            self._checking = True
+        threading.Thread(target=self._check_for_changes, name='schema-poll', daemon=True).start()
+        return snapshot
+
+    def _load_locked(self):
+        fingerprint, ddl, tables, columns, details = self._fetch()
+        self._fingerprint = fingerprint
+        self._ddl = ddl
+        self._tables = tables
+        self._columns = columns
+        self._details = details
+        self._table_info = None
+        self._derived = {}
+        self._loaded_at = self._checked_at = self._versions_at = time.monotonic()
+        self._generation += 1
+        self._loads += 1
+
+    def _clear_locked(self):
+        self._tables = None
+        self._columns = None
+        self._details = None
+        self._table_info = None
+        self._derived = {}
+        self._fingerprint = None
+        self._ddl = None
+        self._generation += 1
+        self._invalidations += 1
+
+    def _check_for_changes(self):
+        try:
+            fingerprint, ddl = self._fetch_fingerprint()
+            with self._lock:
+                self._checked_at = time.monotonic()
+                if self._ddl is None:
+                    pass    # invalidated meanwhile; the next read reloads
+                elif ddl != self._ddl:
+                    self._clear_locked()
+                else:
+                    # Data writes only: new result cache versions, nothing to rebuild
+                    self._fingerprint = fingerprint
+                    self._versions_at = self._checked_at
+        except Exception as e:
+            get_logger('schema_cache').warning('schema change check failed',
+                                               extra=log_fields(database=self.db_config.get('database'), error=str(e)))
+        finally:
+            self._checking = False
+
+    def _refresh_versions(self, max_age):
+        with self._versions_lock:
+            with self._lock:
+                # Refreshed by another caller while this one waited
+                if time.monotonic() - self._versions_at <= max_age:
+                    return
+            with get_pool(self.db_config).connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(FINGERPRINT_SQL, (self.db_config['database'],))
+                    fingerprint = tuple(tuple(row) for row in cursor.fetchall())
+            with self._lock:
+                if self._fingerprint is not None:
+                    self._fingerprint = fingerprint
+                    self._versions_at = time.monotonic()
+
+    def _fetch_fingerprint(self):
+        with get_pool(self.db_config).connection() as connection:
+            with connection.cursor() as cursor:
+                return self._fingerprints(cursor)
+
+    def _fingerprints(self, cursor):
+        """(versions fingerprint, DDL fingerprint)"""
+        cursor.execute(FINGERPRINT_SQL, (self.db_config['database'],))
+        fingerprint = tuple(tuple(row) for row in cursor.fetchall())
+        cursor.execute(COLUMNS_CHECKSUM_SQL, (self.db_config['database'],))
+        checksum = tuple(cursor.fetchone() or ())
+        ddl = (tuple((table, created) for table, created, _ in fingerprint), checksum)
+        return fingerprint, ddl
+
+    def _fetch(self):
+        with get_pool(self.db_config).connection() as connection:
+            with connection.cursor() as cursor:
+                fingerprint, ddl = self._fingerprints(cursor)
+                cursor.execute(COLUMNS_SQL, (self.db_config['database'],))
+                column_rows = cursor.fetchall()
+                cursor.execute(TABLE_COMMENTS_SQL, (self.db_config['database'],))
+                comment_rows = cursor.fetchall()
+                cursor.execute(FOREIGN_KEYS_SQL, (self.db_config['database'],))
+                foreign_keys = [tuple(row) for row in cursor.fetchall()]
+
+        tables = [row[0] for row in fingerprint]
+        columns = {table: [] for table in tables}
+        column_details = {table: [] for table in tables}
+        for table, name, column_type, key, comment in column_rows:
+            columns.setdefault(table, []).append((name, column_type))
+            column_details.setdefault(table, []).append((name, column_type, key, comment))
+        comments = {table: '' for table in tables}
+        comments.update(dict(comment_rows))
+        details = {'tables': comments, 'columns': column_details, 'foreign_keys': foreign_keys}
+        return fingerprint, ddl, tables, columns, details
+
+
+# ============================================================================
+# PROCESS-WIDE REGISTRY
+# ============================================================================
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_schema_cache(db_config):
+    """Shared SchemaCache for db_config's host/port/database"""
+    key = (db_config.get('host'), int(db_config.get('port', 3306)), db_config.get('database'))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = SchemaCache(db_config)
+            _caches[key] = cache
+        return cache
+
+
+def invalidate_schema_caches():
+    """Force every schema cache in this process to reload on next use"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.invalidate()
@@ -0,0 +1,223 @@
+"""
+AskDB AI - Schema Linking
+Picks the tables a question is about, so the prompt carries a compact schema
+of those instead of every table's DDL and sample rows (get_table_info):
+
+    1. index   one embedding per table (name + comment) and per column
+               (table.column, type, comment); rebuilt when the schema changes
+    2. score   a table scores its own similarity or its best column's, whichever is higher
+    3. select  the SCHEMA_LINK_TOP_K best tables, plus the tables their foreign
+               keys reference (discounts -> t_shirts) so the joins stay writable
+    4. render  one "table(column type, ...)" line per table: key columns and the
+               columns closest to the question, at most SCHEMA_LINK_MAX_COLUMNS
+
+Schemas with no more than SCHEMA_LINK_MIN_TABLES tables keep the full
+table_info: pruning a handful of tables saves little and loses the sample rows.
+So do questions whose best table scores below SCHEMA_LINK_MIN_SCORE: nothing
+matched well enough to know which tables to drop.
+
+Token counts are estimates (words and punctuation, long words split every four
+characters - close to what BPE tokenizers do with SQL identifiers). "full" is
+the whole schema in the same compact format, so before/after compare like for
+like; get_table_info's DDL plus sample rows is larger still. The LLM gateway's
+stats carry the provider's exact prompt token totals.
+
+Environment:
+    SCHEMA_LINKING=true|false
+    SCHEMA_LINK_TOP_K=5                 tables picked by similarity
+    SCHEMA_LINK_MAX_COLUMNS=25          columns rendered per table
+    SCHEMA_LINK_MIN_TABLES=10           smaller schemas are sent whole
+    SCHEMA_LINK_MIN_SCORE=0.1           below this best-table similarity, send the whole schema
+"""
+
+import os
+import re
+
+import numpy as np
+
+import metrics
+
+SCHEMA_LINKING = os.getenv('SCHEMA_LINKING', 'true').lower() == 'true'
+SCHEMA_LINK_TOP_K = int(os.getenv('SCHEMA_LINK_TOP_K', 5))
+SCHEMA_LINK_MAX_COLUMNS = int(os.getenv('SCHEMA_LINK_MAX_COLUMNS', 25))
+SCHEMA_LINK_MIN_TABLES = int(os.getenv('SCHEMA_LINK_MIN_TABLES', 10))
+SCHEMA_LINK_MIN_SCORE = float(os.getenv('SCHEMA_LINK_MIN_SCORE', 0.1))
+
+_TOKEN = re.compile(r'\w{1,4}|[^\w\s]')
+_IDENTIFIER_PARTS = re.compile(r'[_\W]+')
+
+
+def estimate_tokens(text):
+    """Approximate LLM token count of text"""
+    return len(_TOKEN.findall(text or ''))
+
+
+def _words(identifier):
+    """t_shirt_id -> 't shirt id', which embeds closer to how questions phrase it"""
+    return _IDENTIFIER_PARTS.sub(' ', identifier).strip()
+
+
+class LinkedSchema:
+    """The compact schema rendered for one question"""
+
+    __slots__ = ('text', 'tables', 'tokens', 'full_tokens')
+
+    def __init__(self, text, tables, tokens, full_tokens):
+        self.text = text
+        self.tables = tables
+        self.tokens = tokens
+        self.full_tokens = full_tokens
+
+    def stats(self):
+        return {'tables': self.tables, 'tokens': self.tokens, 'full_tokens': self.full_tokens}
+
+
+# ============================================================================
+# INDEX
+# ============================================================================
+
+class SchemaIndex:
+    """Embedded table and column descriptions of one schema snapshot
+    (SchemaCache.details()); built once per schema change"""
+
+    def __init__(self, details, embeddings):
+        self.tables = list(details['tables'])
+        self.position = {t: i for i, t in enumerate(self.tables)}
+        self.comments = details['tables']
+        self.columns = {t: details['columns'].get(t, []) for t in self.tables}
+
+        self.references = {t: [] for t in self.tables}     # table -> tables it references
+        self.foreign_keys = {}                              # (table, column) -> 'ref_table.ref_column'
+        for table, column, ref_table, ref_column in details['foreign_keys']:
+            if ref_table in self.references and ref_table != table and ref_table not in self.references[table]:
+                self.references[table].append(ref_table)
+            self.foreign_keys[(table, column)] = f"{ref_table}.{ref_column}"
+
+        documents, owners = [], []
+        for position, table in enumerate(self.tables):
+            documents.append(f"{_words(table)} {self.comments.get(table, '')}".strip())
+            owners.append((position, -1))
+            for index, (name, column_type, _, comment) in enumerate(self.columns[table]):
+                documents.append(f"{_words(table)} {_words(name)} {column_type} {comment}".strip())
+                owners.append((position, index))
+        vectors = np.asarray(embeddings.embed_documents(documents), dtype=np.float32) if documents \
+            else np.zeros((0, 1), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.vectors = vectors / np.where(norms == 0, 1, norms)
+        self.table_of = np.array([p for p, _ in owners], dtype=np.int64)
+        self.column_of = np.array([c for _, c in owners], dtype=np.int64)
+
+        self.full_tokens = estimate_tokens(self.render({t: None for t in self.tables}))
+
+    def __len__(self):
+        return len(self.tables)
+
+    def scores(self, vectors):
+        """(table scores [questions, tables], per-row similarities [questions, documents])"""
+        similarities = np.asarray(vectors, dtype=np.float32) @ self.vectors.T
+        table_scores = np.full((similarities.shape[0], len(self.tables)), -np.inf, dtype=np.float32)
+        for row in range(similarities.shape[0]):
+            np.maximum.at(table_scores[row], self.table_of, similarities[row])
+        return table_scores, similarities
+
+    def render(self, selection):
+        """Compact schema text; selection maps table -> column indexes to keep (None: all)"""
+        lines = []
+        for table, keep in selection.items():
+            columns = self.columns[table]
+            indexes = range(len(columns)) if keep is None else sorted(keep)
+            parts = []
+            for i in indexes:
+                name, column_type, key, _ = columns[i]
+                part = f"{name} {column_type}"
+                if key == 'PRI':
+                    part += ' PK'
+                reference = self.foreign_keys.get((table, name))
+                if reference:
+                    part += f" -> {reference}"
+                parts.append(part)
+            line = f"{table}({', '.join(parts)})"
+            if self.comments.get(table):
+                line += f"  -- {self.comments[table]}"
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+# ============================================================================
+# LINKER
+# ============================================================================
+
+class SchemaLinker:
+    """Per-question compact schemas for one database.
+
+    schema_cache is the database's SchemaCache; the index lives in it (keyed
+    by index_key, the embedding model) and is rebuilt when the schema changes.
+    """
+
+    def __init__(self, schema_cache, embeddings, index_key, top_k=None, max_columns=None, min_tables=None,
+                 min_score=None):
+        self.schema_cache = schema_cache
+        self.embeddings = embeddings
+        self.index_key = index_key
+        self.top_k = top_k or SCHEMA_LINK_TOP_K
+        self.max_columns = max_columns or SCHEMA_LINK_MAX_COLUMNS
+        self.min_tables = SCHEMA_LINK_MIN_TABLES if min_tables is None else min_tables
+        self.min_score = SCHEMA_LINK_MIN_SCORE if min_score is None else min_score
+
+    def index(self):
+        return self.schema_cache.derived(('schema-link', self.index_key),
+                                         lambda: SchemaIndex(self.schema_cache.details(), self.embeddings))
+
+    def applies(self):
+        """Whether the schema is big enough to prune (no embedding needed to tell)"""
+        return len(self.schema_cache.tables()) > self.min_tables
+
+    def link(self, question, vector=None):
+        return self.link_many([question], [vector])[0]
+
+    def link_many(self, questions, vectors=None):
+        """LinkedSchema per question, or None where the whole schema should be
+        sent: for every question when the schema is small, for one when no
+        table scores min_score. vectors may carry already computed question
+        embeddings (the question cache's); the rest are embedded in one call."""
+        if not questions or not self.applies():
+            return [None] * len(questions)
+        index = self.index()
+        vectors = list(vectors or [None] * len(questions))
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            for i, vector in zip(missing, self.embeddings.embed_documents([questions[i] for i in missing])):
+                vectors[i] = vector
+        table_scores, similarities = index.scores(vectors)
+        linked = [self._select(index, table_scores[row], similarities[row]) for row in range(len(questions))]
+        for schema in linked:
+            if schema is not None:
+                metrics.record_schema_tokens(schema.full_tokens, schema.tokens)
+        return linked
+
+    def _select(self, index, table_scores, similarities):
+        if not len(table_scores) or table_scores.max() < self.min_score:
+            return None     # low confidence: pruning would likely drop the right table
+        picked = [int(i) for i in np.argsort(-table_scores)[:self.top_k]]
+        tables = [index.tables[i] for i in picked]
+        # Tables the picked ones reference, one hop, so the join targets are there
+        for table in list(tables):
+            tables.extend(ref for ref in index.references[table] if ref not in tables)
+
+        selection = {}
+        for table in tables:
+            columns = index.columns[table]
+            if len(columns) <= self.max_columns:
+                selection[table] = None
+                continue
+            # Keys always; then the columns most similar to the question
+            keep = {i for i, (name, _, key, _) in enumerate(columns)
+                    if key in ('PRI', 'UNI') or (table, name) in index.foreign_keys}
+            rows = np.flatnonzero((index.table_of == index.position[table]) & (index.column_of >= 0))
+            for row in rows[np.argsort(-similarities[rows])]:
+                if len(keep) >= self.max_columns:
+                    break
+                keep.add(int(index.column_of[row]))
+            selection[table] = keep
+        text = index.render(selection)
+        return LinkedSchema(text, tables, estimate_tokens(text), index.full_tokens)
@@ -0,0 +1,307 @@
+"""
+AskDB AI - SQL Cost Guard
+Checks a SELECT before it runs, for LLM-generated SQL (/api/query, the
+Streamlit chain) and /api/execute-sql:
+
+    1. parse     one read-only statement (SELECT / WITH ... SELECT), no INTO
+                 OUTFILE, locking reads or /*! executable comments */
+    2. rewrite   LIMIT appended when the statement has none; a
+                 MAX_EXECUTION_TIME optimizer hint so MySQL aborts it server-side
+    3. estimate  EXPLAIN FORMAT=JSON: rows examined across the join, query cost
+                 and full table scans
+    4. decide    over budget -> reject, unless the LIMIT really bounds the work
+                 (no WHERE, grouping, ordering, DISTINCT or aggregates at the
+                 top level)
+
+Every call returns a decision dict that the endpoints include in their
+response under "guard". Decisions are cached per statement for a few minutes
+so repeated queries don't pay for EXPLAIN again.
+
+Environment:
+    SQL_GUARD=enforce|report|off          report: annotate but never reject; off:
+                                          MAX_EXECUTION_TIME only
+    SQL_GUARD_MAX_ROWS=1000000            estimated rows examined budget
+    SQL_GUARD_MAX_COST=0                  EXPLAIN query_cost budget (0: none)
+    SQL_GUARD_MAX_EXECUTION_MS=10000      MAX_EXECUTION_TIME per statement (0: none)
+    SQL_GUARD_CACHE_SECONDS=300
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import pymysql
+
+import metrics
+from db_pool import get_pool
+
+SQL_GUARD_MODE = os.getenv('SQL_GUARD', 'enforce').lower()
+MAX_ESTIMATED_ROWS = int(os.getenv('SQL_GUARD_MAX_ROWS', 1000000))
+MAX_QUERY_COST = float(os.getenv('SQL_GUARD_MAX_COST', 0))
+MAX_EXECUTION_MS = int(os.getenv('SQL_GUARD_MAX_EXECUTION_MS', 10000))
+DECISION_CACHE_SECONDS = float(os.getenv('SQL_GUARD_CACHE_SECONDS', 300))
+DECISION_CACHE_SIZE = 1024
+
+# Top-level words after which a LIMIT no longer bounds the rows MySQL reads.
+# WHERE is one of them: a selective filter on a column without an index can
+# scan the whole table before it finds LIMIT matching rows.
+_UNBOUNDED_WORDS = {'WHERE', 'GROUP', 'ORDER', 'DISTINCT', 'HAVING', 'UNION', 'WINDOW', 'OVER',
+                    'COUNT', 'SUM', 'AVG', 'MIN', 'MAX', 'GROUP_CONCAT', 'STD', 'STDDEV', 'VARIANCE'}
+_STATEMENT_WORDS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE'}
+_WORD = re.compile(r'[A-Za-z_][A-Za-z0-9_$]*')
+
+
+class QueryRejected(Exception):
+    """The statement was refused; decision says why (HTTP 422 / 403)"""
+
+    def __init__(self, message, decision, status=422):
+        super().__init__(message)
+        self.decision = decision
+        self.status = status
+
+
+# ============================================================================
+# PARSING
+# ============================================================================
+
+def scan(sql):
+    """Top-level words of sql as [(WORD, start, end)], skipping string
+    literals, quoted identifiers, comments and anything in parentheses.
+    Also returns the positions of top-level semicolons. Raises ValueError for
+    unbalanced parentheses and for /*! ... */ comments, whose contents MySQL
+    executes."""
+    words, semicolons = [], []
+    depth, i, n = 0, 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch in '\'"`':
+            i += 1
+            while i < n and sql[i] != ch:
+                i += 2 if sql[i] == '\\' and ch != '`' else 1
+            i += 1
+        elif ch == '-' and sql.startswith('--', i) and (i + 2 == n or sql[i + 2].isspace()) or ch == '#':
+            # MySQL only reads "--" as a comment when whitespace follows: 1--1 is 1 - -1
+            end = sql.find('\n', i)
+            i = n if end < 0 else end + 1
+        elif ch == '/' and sql.startswith('/*', i):
+            if sql.startswith(('/*!', '/*M!'), i):
+                # MySQL (and MariaDB) run what is inside an executable comment
+                raise ValueError('Executable comments are not allowed')
+            end = sql.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+        elif ch == '(':
+            depth += 1
+            i += 1
+        elif ch == ')':
+            if depth == 0:
+                raise ValueError('Unbalanced parentheses')
+            depth -= 1
+            i += 1
+        elif ch == ';' and depth == 0:
+            semicolons.append(i)
+            i += 1
+        else:
+            match = _WORD.match(sql, i) if ch.isalpha() or ch == '_' else None
+            if match:
+                if depth == 0:
+                    words.append((match.group().upper(), match.start(), match.end()))
+                i = match.end()
+            else:
+                i += 1
+    if depth:
+        raise ValueError('Unbalanced parentheses')
+    return words, semicolons
+
+
+def _statement(sql):
+    """Single read-only statement without its trailing semicolon, and its top-level words"""
+    sql = sql.strip()
+    while sql.endswith(';'):
+        sql = sql[:-1].rstrip()
+    words, semicolons = scan(sql)
+    if semicolons:
+        raise ValueError('Only one SQL statement is allowed')
+    names = [w for w, _, _ in words]
+    if not names or names[0] not in ('SELECT', 'WITH'):
+        raise ValueError('Only SELECT queries are allowed')
+    main = next((w for w in names if w in _STATEMENT_WORDS), None)
+    if main != 'SELECT':
+        raise ValueError('Only SELECT queries are allowed')
+    if 'INTO' in names:
+        raise ValueError('SELECT ... INTO is not allowed')
+    if 'FOR' in names and ('UPDATE' in names or 'SHARE' in names) or 'LOCK' in names:
+        raise ValueError('Locking reads are not allowed')
+    return sql, words
+
+
+def check_statement(sql):
+    """Raise ValueError unless sql is a single read-only SELECT (no database access)"""
+    _statement(sql)
+
+
+def rewrite(sql, limit=None, max_execution_ms=None):
+    """(sql, rewrites, words): LIMIT and MAX_EXECUTION_TIME added where missing.
+    Raises ValueError for anything that isn't a single read-only SELECT."""
+    sql, words = _statement(sql)
+    rewrites = []
+    max_execution_ms = MAX_EXECUTION_MS if max_execution_ms is None else max_execution_ms
+    names = {w for w, _, _ in words}
+
+    if limit and 'LIMIT' not in names:
+        sql = f"{sql}\nLIMIT {int(limit)}"
+        rewrites.append(f'limit {int(limit)}')
+    if max_execution_ms and 'MAX_EXECUTION_TIME' not in sql.upper():
+        # The hint belongs right after the main SELECT keyword
+        select_end = next(end for w, _, end in words if w == 'SELECT')
+        sql = f"{sql[:select_end]} /*+ MAX_EXECUTION_TIME({int(max_execution_ms)}) */{sql[select_end:]}"
+        rewrites.append(f'max_execution_time {int(max_execution_ms)}ms')
+    return sql, rewrites, words
+
+
+def limit_bounds_work(words, limited=False):
+    """Whether a top-level LIMIT (written, or appended when limited) stops
+    MySQL early (plain unfiltered row fetches only)"""
+    names = {w for w, _, _ in words}
+    return ('LIMIT' in names or limited) and not names & _UNBOUNDED_WORDS
+
+
+# ============================================================================
+# ESTIMATES
+# ============================================================================
+
+def _table_estimates(table, prefix_rows, estimates):
+    scan_rows = float(table.get('rows_examined_per_scan') or 0)
+    estimates['rows'] += prefix_rows * scan_rows
+    if table.get('access_type') == 'ALL':
+        estimates['full_scans'].append(table.get('table_name'))
+    _walk(table.get('materialized_from_subquery'), estimates)
+    for subquery in table.get('attached_subqueries') or []:
+        _walk(subquery, estimates)
+    return float(table.get('rows_produced_per_join') or scan_rows or 1)
+
+
+def _walk(node, estimates):
+    """Accumulate rows examined over every join in an EXPLAIN JSON tree"""
+    if isinstance(node, list):
+        for item in node:
+            _walk(item, estimates)
+    elif isinstance(node, dict):
+        if 'nested_loop' in node:
+            prefix = 1.0
+            for step in node['nested_loop']:
+                prefix = _table_estimates(step.get('table', {}), prefix, estimates)
+        elif 'table' in node and isinstance(node['table'], dict):
+            _table_estimates(node['table'], 1.0, estimates)
+        for key, value in node.items():
+            if key not in ('nested_loop', 'table') and isinstance(value, (dict, list)):
+                _walk(value, estimates)
+
+
+def estimate(plan):
+    """{'estimated_rows', 'estimated_cost', 'full_scans'} from EXPLAIN FORMAT=JSON output"""
+    estimates = {'rows': 0.0, 'full_scans': []}
+    _walk(plan, estimates)
+    cost = (plan.get('query_block', {}).get('cost_info') or {}).get('query_cost')
+    return {
+        'estimated_rows': int(estimates['rows']),
+        'estimated_cost': float(cost) if cost is not None else None,
+        'full_scans': sorted({t for t in estimates['full_scans'] if t}),
+    }
+
+
+def explain(db_config, sql):
+    with get_pool(db_config).connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN FORMAT=JSON {sql}")
+            return json.loads(cursor.fetchone()[0])
+
+
+# ============================================================================
+# GUARD
+# ============================================================================
+
+_decisions = OrderedDict()      # (host, port, database, sql, limit, max ms) -> (expires, sql, rejection, decision)
+_decisions_lock = threading.Lock()
+
+
+def _over_budget(decision):
+    if MAX_ESTIMATED_ROWS and decision.get('estimated_rows', 0) > MAX_ESTIMATED_ROWS:
+        return f"estimated {decision['estimated_rows']:,} rows examined (budget {MAX_ESTIMATED_ROWS:,})"
+    cost = decision.get('estimated_cost')
+    if MAX_QUERY_COST and cost is not None and cost > MAX_QUERY_COST:
+        return f"estimated cost {cost:,.0f} (budget {MAX_QUERY_COST:,.0f})"
+    return None
+
+
+def _decide(db_config, sql, limit, max_execution_ms):
+    try:
+        guarded, rewrites, words = rewrite(sql, limit, max_execution_ms)
+    except ValueError as e:
+        decision = {'action': 'reject', 'reason': str(e)}
+        raise QueryRejected(str(e), decision, status=403)
+
+    decision = {'action': 'rewrite' if rewrites else 'allow', 'rewrites': rewrites}
+    try:
+        decision.update(estimate(explain(db_config, guarded)))
+    except pymysql.err.ProgrammingError:
+        raise   # bad SQL: fail as it would have at execution
+    except Exception as e:
+        # No estimate (old server, EXPLAIN format change, ...): LIMIT and
+        # MAX_EXECUTION_TIME still apply
+        decision['explain_error'] = str(e)
+        return guarded, decision
+
+    reason = _over_budget(decision)
+    if reason:
+        decision['reason'] = reason
+        if limit_bounds_work(words, limited=bool(limit)):
+            decision['bounded_by_limit'] = True
+        elif SQL_GUARD_MODE == 'enforce':
+            decision['action'] = 'reject'
+            raise QueryRejected(f'Query rejected by cost guard: {reason}', decision)
+        else:
+            decision['would_reject'] = True
+    return guarded, decision
+
+
+def guard(db_config, sql, limit=None, max_execution_ms=None):
+    """(sql to execute, decision). Raises QueryRejected, or the database error
+    for SQL that doesn't parse. limit is appended when the query has none;
+    max_execution_ms overrides SQL_GUARD_MAX_EXECUTION_MS (per-route timeouts)."""
+    if SQL_GUARD_MODE == 'off':
+        # No estimate or rejection, but the statement timeout still applies
+        try:
+            sql, rewrites, _ = rewrite(sql, max_execution_ms=max_execution_ms)
+        except ValueError:
+            rewrites = []
+        return sql, {'action': 'off', 'rewrites': rewrites}
+    key = (db_config.get('host'), db_config.get('port'), db_config.get('database'), sql, limit, max_execution_ms)
+    now = time.time()
+    with _decisions_lock:
+        cached = _decisions.get(key)
+        if cached is not None and cached[0] > now:
+            _decisions.move_to_end(key)
+        else:
+            cached = None
+
+    if cached is not None:
+        _, guarded, rejection, decision = cached
+        decision = dict(decision, cached=True)
+    else:
+        rejection = None
+        try:
+            guarded, decision = _decide(db_config, sql, limit, max_execution_ms)
+        except QueryRejected as e:
+            guarded, rejection, decision = None, e, e.decision
+        with _decisions_lock:
+            _decisions[key] = (now + DECISION_CACHE_SECONDS, guarded, rejection, decision)
+            while len(_decisions) > DECISION_CACHE_SIZE:
+                _decisions.popitem(last=False)
+
+    metrics.record_guard(decision['action'])
+    if rejection is not None:
+        raise QueryRejected(str(rejection), decision, rejection.status)
+    return guarded, decision
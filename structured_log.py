@@ -0,0 +1,272 @@
+"""
+AskDB AI - Structured Logging
+Request logging that stays off the request path: records go onto an in-memory
+queue and a background listener thread formats (JSON or text) and writes them.
+
+    - request IDs: taken from X-Request-ID or generated, attached to every record
+    - sampling: per-endpoint rates for routine request lines (LOG_SAMPLE_RATES);
+      errors and slow queries are always logged
+    - slow-query log: statements over SLOW_QUERY_MS are logged with their
+      EXPLAIN plan, fetched on a background thread; when SLOW_QUERY_EXPLAIN_BACKLOG
+      plans are already waiting, the query is logged without one (and counted)
+
+Environment:
+    LOG_LEVEL=INFO  LOG_FORMAT=json|text  LOG_QUEUE_SIZE=10000
+    LOG_SAMPLE_RATES=sql=0.1,nl=1   SLOW_QUERY_MS=1000   SLOW_QUERY_EXPLAIN=true
+    SLOW_QUERY_EXPLAIN_BACKLOG=20
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+
+from db_pool import get_pool
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 1000))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+SLOW_QUERY_EXPLAIN_BACKLOG = int(os.getenv('SLOW_QUERY_EXPLAIN_BACKLOG', 20))
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+def _parse_sample_rates(text):
+    rates = {}
+    for item in text.split(','):
+        if '=' in item:
+            endpoint, rate = item.split('=', 1)
+            try:
+                rates[endpoint.strip()] = min(1.0, max(0.0, float(rate)))
+            except ValueError:
+                pass
+    return rates
+
+
+SAMPLE_RATES = _parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', 'sql=0.1'))
+
+
+# ============================================================================
+# FORMATTING
+# ============================================================================
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request ID unless one was passed explicitly"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.created))
+        request_id = getattr(record, 'request_id', None)
+        line = f"{stamp} {record.levelname:<7} {record.name}"
+        if request_id:
+            line += f" [{request_id}]"
+        line += f" {record.getMessage()}"
+        fields = getattr(record, 'fields', None) or {}
+        if fields:
+            line += ' ' + ' '.join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting (and traceback rendering) to the
+    listener thread and drops records instead of blocking when the queue is full"""
+
+    dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            type(self).dropped += 1
+
+
+# ============================================================================
+# SETUP
+# ============================================================================
+
+_setup_lock = threading.Lock()
+_listener = None
+_listener_pid = None
+
+
+def configure_logging():
+    """Route the 'askdb' logger tree through the background queue (idempotent, fork-aware)"""
+    global _listener, _listener_pid
+    with _setup_lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            return
+        root = logging.getLogger('askdb')
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        records = queue.Queue(LOG_QUEUE_SIZE)
+        handler = _DeferredQueueHandler(records)
+        handler.addFilter(RequestIdFilter())
+        root.addHandler(handler)
+
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(TextFormatter() if LOG_FORMAT == 'text' else JSONFormatter())
+        # A listener inherited across fork has no thread in this process
+        _listener = QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+        _listener_pid = os.getpid()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    configure_logging()
+    return logging.getLogger(f'askdb.{name}')
+
+
+def new_request_id(header_value=None):
+    """Client-supplied X-Request-ID if it looks sane, else a fresh one"""
+    if header_value and _REQUEST_ID.match(header_value):
+        return header_value
+    return uuid.uuid4().hex[:16]
+
+
+def should_sample(endpoint):
+    """Whether a routine (successful) request line for endpoint is logged"""
+    rate = SAMPLE_RATES.get(endpoint, 1.0)
+    return rate >= 1.0 or random.random() < rate
+
+
+def log_fields(**fields):
+    """extra= payload for structured fields"""
+    return {'fields': fields}
+
+
+# ============================================================================
+# SLOW QUERY LOG
+# ============================================================================
+
+_explain_executor = None
+_explain_pid = None
+_explain_lock = threading.Lock()
+_explain_pending = 0
+_explains_skipped = 0
+
+
+def _submit_explain(job):
+    """Run job on the EXPLAIN thread; False (and counted) when
+    SLOW_QUERY_EXPLAIN_BACKLOG jobs are already pending. The bound keeps a
+    burst of slow queries from queueing unbounded EXPLAINs on the same pool."""
+    global _explain_executor, _explain_pid, _explain_pending, _explains_skipped
+    with _explain_lock:
+        if _explain_executor is None or _explain_pid != os.getpid():
+            _explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+            _explain_pid = os.getpid()
+            _explain_pending = 0
+        if _explain_pending >= SLOW_QUERY_EXPLAIN_BACKLOG:
+            _explains_skipped += 1
+            return False
+        _explain_pending += 1
+        executor = _explain_executor
+
+    def _run():
+        global _explain_pending
+        try:
+            job()
+        finally:
+            with _explain_lock:
+                _explain_pending -= 1
+
+    executor.submit(_run)
+    return True
+
+
+def _explain(db_config, sql):
+    with get_pool(db_config).connection() as connection:
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(f"EXPLAIN FORMAT=JSON {sql}")
+                return json.loads(cursor.fetchone()[0])
+            except Exception:
+                cursor.execute(f"EXPLAIN {sql}")
+                columns = [d[0] for d in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def log_slow_query(db_config, sql, seconds, rows=None):
+    """Log sql if it took longer than SLOW_QUERY_MS; the plan is fetched in the background"""
+    duration_ms = seconds * 1000
+    if duration_ms < SLOW_QUERY_MS:
+        return False
+    request_id = request_id_var.get()
+    fields = {'sql': sql, 'duration_ms': round(duration_ms, 1), 'rows': rows,
+              'database': db_config.get('database')}
+    logger = get_logger('slow_query')
+
+    def _log(plan):
+        logger.warning('slow query', extra={'fields': dict(fields, plan=plan), 'request_id': request_id})
+
+    def _explain_and_log():
+        try:
+            plan = _explain(db_config, sql)
+        except Exception as e:
+            plan = f'EXPLAIN failed: {e}'
+        _log(plan)
+
+    if not (SLOW_QUERY_EXPLAIN and sql.lstrip().upper().startswith('SELECT')):
+        _log(None)
+    elif not _submit_explain(_explain_and_log):
+        _log('EXPLAIN skipped: backlog full')
+    return True
+
+
+def logging_stats():
+    return {
+        'queued': _listener.queue.qsize() if _listener is not None else 0,
+        'dropped': _DeferredQueueHandler.dropped,
+        'sample_rates': SAMPLE_RATES,
+        'slow_query_ms': SLOW_QUERY_MS,
+        'slow_query_explains_pending': _explain_pending,
+        'slow_query_explains_skipped': _explains_skipped,
+    }
@@ -0,0 +1,29 @@
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# App modules first: benchmarks/schema_linking.py must not shadow schema_linking.py
+for path in (os.path.join(ROOT, 'database'), os.path.join(ROOT, 'benchmarks'), ROOT):
+    if path in sys.path:
+        sys.path.remove(path)
+    sys.path.insert(0, path)
+
+
+@pytest.fixture(scope='session')
+def stub_llm_url():
+    """Base URL of benchmarks/stub_llm.py answering with few-shot SQL after 10 ms"""
+    import stub_llm
+
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = stub_llm.serve(port, latency=0.01, first_token=0.0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{port}/v1'
+    server.shutdown()
+    server.server_close()
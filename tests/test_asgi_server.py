@@ -0,0 +1,121 @@
+import pymysql
+import pytest
+
+pytest.importorskip('aiomysql')
+pytest.importorskip('a2wsgi')
+pytest.importorskip('starlette')
+
+from starlette.testclient import TestClient  # noqa: E402
+
+import asgi_server  # noqa: E402
+import nl_pipeline  # noqa: E402
+from db_router import ReplicaRouter  # noqa: E402
+from llm_gateway import AsyncLLMGateway  # noqa: E402
+from nl_pipeline import RouteStage, SchemaStage  # noqa: E402
+from question_cache import get_question_cache  # noqa: E402
+
+SCHEMA = [('brand', "enum('Van Huesen','Levi','Nike','Adidas')"), ('stock_quantity', 'int')]
+PRIMARY = dict(asgi_server.DB_CONFIG)
+REPLICA = dict(PRIMARY, host='replica.invalid')
+
+
+class FakeDatabase:
+    """fetch_async stand-in: rows per call, or an error for the replica"""
+
+    def __init__(self, rows, replica_error=None):
+        self.rows = rows
+        self.replica_error = replica_error
+        self.calls = []
+
+    async def __call__(self, db_config, sql, max_rows):
+        self.calls.append((db_config['host'], sql))
+        if db_config['host'] == REPLICA['host'] and self.replica_error is not None:
+            raise self.replica_error
+        return self.rows[:max_rows], len(self.rows) > max_rows, [(name, None) for name in self.rows[0]]
+
+
+@pytest.fixture
+def asgi(monkeypatch, stub_llm_url):
+    """The ASGI app with the real pipeline stages minus MySQL: schema and
+    guard stubbed, SQL answered by a FakeDatabase, the LLM by stub_llm.py"""
+    get_question_cache(PRIMARY['database']).clear()
+    monkeypatch.delenv('GROQ_API_KEY', raising=False)
+    monkeypatch.setattr(nl_pipeline, 'guard', lambda db_config, sql, **kwargs: (sql, {'action': 'allow'}))
+
+    def install(rows, api_key='test', router=None, replica_error=None, max_rows=None, llm_answer=None):
+        database = FakeDatabase(rows, replica_error)
+        monkeypatch.setattr(asgi_server, 'fetch_result_async', database)
+        gateway = lambda: AsyncLLMGateway(base_url=stub_llm_url, api_key=api_key)   # noqa: E731
+        if llm_answer is not None:
+            async def complete(prompt, **kwargs):
+                return llm_answer
+            gateway = lambda: type('Gateway', (), {'api_key': api_key, 'complete': staticmethod(complete)})  # noqa: E731
+        monkeypatch.setattr(asgi_server, 'get_async_llm_gateway', gateway)
+        pipeline = asgi_server.nl_query_pipeline.replace('schema', SchemaStage(lambda ctx: SCHEMA))
+        pipeline = pipeline.replace('route', RouteStage(router or ReplicaRouter(PRIMARY)))
+        if max_rows is not None:
+            pipeline.stage('execute').max_rows = max_rows
+        monkeypatch.setattr(asgi_server, 'nl_query_pipeline_async', asgi_server._async_pipeline(pipeline))
+        return TestClient(asgi_server.app), database
+
+    yield install
+    get_question_cache(PRIMARY['database']).clear()
+
+
+def ask(client, question='How many Nike t-shirts are in stock?', **body):
+    return client.post('/api/query', json=dict(query=question, **body))
+
+
+def test_runs_the_shared_pipeline(asgi):
+    client, database = asgi([{'total': 42}])
+    response = ask(client)
+    assert response.status_code == 200, response.json()
+    body = response.json()
+    assert body['sql'].upper().startswith('SELECT')
+    assert body['cache'] == 'miss'
+    assert body['truncated'] is False
+    assert body['results'] == [{'total': 42}]
+    assert body['answer']
+    assert {'cache', 'schema', 'prompt', 'llm', 'sanitize', 'route', 'guard', 'execute',
+            'format', 'remember', 'total'} <= set(body['timings'])
+    assert database.calls == [(PRIMARY['host'], body['sql'])]
+
+    # RememberStage stored the SQL: the same question skips the LLM
+    again = ask(client).json()
+    assert again['cache'] == 'exact'
+    assert again['sql'] == body['sql']
+    assert 'llm' not in again['timings']
+
+
+def test_reports_truncation(asgi):
+    client, _ = asgi([{'id': i} for i in range(5)], max_rows=3)
+    body = ask(client, cache=False).json()
+    assert body['truncated'] is True
+    assert len(body['results']) == 3
+
+
+def test_empty_sql_is_a_502(asgi):
+    client, database = asgi([{'total': 1}], llm_answer='```sql\n```')
+    response = ask(client, cache=False)
+    assert response.status_code == 502
+    assert response.json() == {'error': 'The model did not return a SQL query'}
+    assert database.calls == []
+
+
+def test_missing_api_key_is_a_503(asgi):
+    client, _ = asgi([{'total': 1}], api_key=None)
+    response = ask(client, cache=False)
+    assert response.status_code == 503
+    assert response.json() == {'error': 'Groq API key not configured'}
+
+
+def test_unreachable_replica_fails_over_to_primary(asgi):
+    router = ReplicaRouter(PRIMARY, [REPLICA], check_interval=3600)
+    router._probe = lambda replica: (True, 0.0, 0.001, None)
+    error = pymysql.err.OperationalError(2003, "Can't connect to MySQL server")
+    client, database = asgi([{'total': 7}], router=router, replica_error=error)
+
+    body = ask(client, cache=False).json()
+    assert body['results'] == [{'total': 7}]
+    assert [host for host, _ in database.calls] == [REPLICA['host'], PRIMARY['host']]
+    assert router.stats()['failovers'] == 1
@@ -0,0 +1,157 @@
+import threading
+import types
+
+import pymysql
+import pytest
+
+import db_pool
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.open = True
+        self.pings = 0
+        self.ping_error = None
+
+    def ping(self, reconnect=True):
+        self.pings += 1
+        if self.ping_error is not None:
+            raise self.ping_error
+
+    def close(self):
+        self.open = False
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Every connection pymysql.connect() opened, in order"""
+    opened = []
+
+    def connect(**kwargs):
+        assert kwargs['autocommit'] is True
+        opened.append(FakeConnection(len(opened)))
+        return opened[-1]
+
+    monkeypatch.setattr(pymysql, 'connect', connect)
+    return opened
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(db_pool, 'time', types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def make_pool(max_size=2, timeout=5, max_lifetime=60):
+    return ConnectionPool({'host': 'db.invalid', 'database': 'atliq_tshirts'}, max_size=max_size, timeout=timeout,
+                          max_lifetime=max_lifetime)
+
+
+def test_returned_connections_are_reused(connections):
+    pool = make_pool()
+    first = pool.acquire()
+    assert pool.stats()['in_use'] == 1
+    pool.release(first)
+    assert pool.acquire() is first
+    assert first.pings == 1     # checked on checkout
+    second = pool.acquire()
+    assert second is not first
+    stats = pool.stats()
+    assert (stats['size'], stats['idle'], stats['in_use'], stats['checkouts'], stats['connects']) == (2, 0, 2, 3, 2)
+
+
+def test_checkout_waits_for_a_returned_connection(connections):
+    pool = make_pool(max_size=1)
+    held = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(held,)).start()
+    assert pool.acquire() is held
+    assert pool.stats()['waits'] == 1
+
+
+def test_checkout_times_out_when_the_pool_is_exhausted(connections):
+    pool = make_pool(max_size=1, timeout=0.05)
+    pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    stats = pool.stats()
+    assert (stats['timeouts'], stats['size'], stats['connects']) == (1, 1, 1)
+
+
+def test_connections_past_max_lifetime_are_recycled(connections, clock):
+    pool = make_pool()
+    old = pool.acquire()
+    pool.release(old)
+    clock.now += 59
+    assert pool.acquire() is old
+    pool.release(old)
+
+    clock.now += 2
+    new = pool.acquire()
+    assert new is not old
+    assert not old.open
+    stats = pool.stats()
+    assert (stats['recycled'], stats['connects'], stats['size']) == (1, 2, 1)
+
+    # The replacement's lifetime starts when it was opened
+    pool.release(new)
+    clock.now += 59
+    assert pool.acquire() is new
+
+
+def test_connection_errors_discard_the_connection(connections):
+    pool = make_pool()
+    with pytest.raises(pymysql.err.OperationalError):
+        with pool.connection() as conn:
+            raise pymysql.err.OperationalError(2013, 'Lost connection to MySQL server during query')
+    assert not conn.open
+    assert (pool.stats()['size'], pool.stats()['idle']) == (0, 0)
+    assert pool.acquire() is not conn
+
+
+def test_query_errors_keep_the_connection(connections):
+    pool = make_pool()
+    with pytest.raises(pymysql.err.ProgrammingError):
+        with pool.connection() as conn:
+            raise pymysql.err.ProgrammingError(1146, "Table 'atliq_tshirts.nope' doesn't exist")
+    assert conn.open
+    assert pool.acquire() is conn
+
+
+def test_closed_or_unresponsive_connections_are_replaced(connections):
+    pool = make_pool()
+    closed = pool.acquire()
+    closed.open = False             # e.g. the server hung up mid-result
+    pool.release(closed)
+    assert pool.stats()['size'] == 0
+
+    stale = pool.acquire()
+    pool.release(stale)
+    stale.ping_error = pymysql.err.OperationalError(2006, 'MySQL server has gone away')
+    fresh = pool.acquire()
+    assert fresh is not stale and not stale.open
+    stats = pool.stats()
+    assert (stats['ping_failures'], stats['size'], stats['connects']) == (1, 1, 3)
+
+
+def test_failed_connect_frees_the_slot(monkeypatch):
+    def refuse(**kwargs):
+        raise pymysql.err.OperationalError(2003, "Can't connect to MySQL server")
+
+    monkeypatch.setattr(pymysql, 'connect', refuse)
+    pool = make_pool(max_size=1, timeout=0.05)
+    for _ in range(2):
+        with pytest.raises(pymysql.err.OperationalError):
+            pool.acquire()
+    stats = pool.stats()
+    assert (stats['size'], stats['in_use'], stats['timeouts']) == (0, 0, 0)
@@ -0,0 +1,124 @@
+import shutil
+import threading
+
+import pymysql
+import pytest
+
+import api_server
+from db_router import ReplicaRouter
+from result_cache import MemoryBackend, ResultCache
+from schema_cache import get_schema_cache
+
+COUNT_SQL = "SELECT COUNT(*) AS n FROM t_shirts"
+PRIMARY = {'host': 'primary', 'port': 3306, 'database': 'atliq_tshirts'}
+REPLICA = {'host': 'replica', 'port': 3306, 'database': 'atliq_tshirts'}
+
+
+def test_first_check_runs_once_under_concurrent_reads():
+    router = ReplicaRouter(PRIMARY, [REPLICA], check_interval=3600)
+    probing, release = threading.Event(), threading.Event()
+    probes = []
+
+    def probe(replica):
+        probes.append(replica.label)
+        probing.set()
+        release.wait(5)
+        return True, 0.0, 0.001, None
+
+    router._probe = probe
+    first = {}
+    thread = threading.Thread(target=lambda: first.update(config=router.read_config()))
+    thread.start()
+    assert probing.wait(5)
+
+    # Requests arriving during the first check don't probe again: primary
+    assert [router.read_config() for _ in range(3)] == [PRIMARY] * 3
+    release.set()
+    thread.join(5)
+
+    assert probes == ['replica:3306']
+    assert first['config'] is REPLICA
+    assert router.read_config() is REPLICA
+
+
+def test_is_primary():
+    router = ReplicaRouter(PRIMARY, [REPLICA])
+    assert router.is_primary(PRIMARY)
+    assert router.is_primary(dict(PRIMARY))
+    assert not router.is_primary(REPLICA)
+
+
+def _server_mode():
+    if shutil.which('mariadbd') or shutil.which('mysqld'):
+        return 'local'
+    if shutil.which('docker'):
+        return 'docker'
+    return None
+
+
+@pytest.fixture(scope='module')
+def servers():
+    """Two standalone seeded servers: a primary and a "replica" that has
+    missed the primary's latest write"""
+    mode = _server_mode()
+    if mode is None:
+        pytest.skip('needs mysqld, mariadbd or docker')
+    from local_mysql import LocalMySQL, seed
+
+    started = []
+    try:
+        for _ in range(2):
+            started.append(LocalMySQL(mode).start())
+        primary, replica = (server.config() for server in started)
+        for config in (primary, replica):
+            seed(config, 50, tables=('t_shirts',))
+        connection = pymysql.connect(**primary)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM t_shirts LIMIT 10")
+            connection.commit()
+        finally:
+            connection.close()
+        yield primary, replica
+    finally:
+        for server in started:
+            server.stop()
+
+
+@pytest.fixture
+def client(servers, monkeypatch):
+    primary, replica = servers
+    router = ReplicaRouter(primary, [replica], check_interval=3600)
+    cache = ResultCache(lambda: get_schema_cache(primary).table_versions(),
+                        backend=MemoryBackend(1 << 20), ttl=300)
+    monkeypatch.setattr(api_server, 'DB_CONFIG', primary)
+    monkeypatch.setattr(api_server, 'read_router', router)
+    monkeypatch.setattr(api_server, 'result_cache', cache)
+    return api_server.app.test_client(), router
+
+
+def _count(client):
+    response = client.post('/api/execute-sql', json={'sql': COUNT_SQL})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    return body['results'][0]['n'], body['cache']
+
+
+def test_replica_reads_are_not_cached(client):
+    client, router = client
+
+    # Routed to the replica, which still has the deleted rows
+    assert _count(client) == (50, 'miss')
+    assert _count(client) == (50, 'miss')
+    assert [r['reads'] for r in router.stats()['replicas'].values()] == [2]
+
+    # With the replica gone the primary answers, and that result is cached
+    for replica in router._replicas:
+        replica.healthy = False
+    assert _count(client) == (40, 'miss')
+    assert _count(client) == (40, 'hit')
+
+    # A replica-routed read may still be served the primary's entry
+    for replica in router._replicas:
+        replica.healthy = True
+    assert _count(client) == (40, 'hit')
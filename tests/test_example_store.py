@@ -0,0 +1,94 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip('faiss')
+
+from example_store import ExampleStore  # noqa: E402
+
+DIMENSION = 256
+BASE = [
+    {'Question': "How many Nike t-shirts are left?", 'SQLQuery': "SELECT sum(stock_quantity) FROM t_shirts"},
+    {'Question': "What is the price of Levi shirts?", 'SQLQuery': "SELECT price FROM t_shirts"},
+    {'Question': "Which discounts exist?", 'SQLQuery': "SELECT * FROM discounts"},
+]
+
+
+class HashedWords:
+    """Deterministic embeddings stand-in: unit bag of hashed words, counts its texts"""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        vectors = np.zeros((len(texts), DIMENSION), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode('utf-8')).hexdigest(), 16) % DIMENSION] += 1
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def learned(i):
+    return {'Question': f"learned question q{i} about topic{i}", 'SQLQuery': f"SELECT col{i} FROM table{i}"}
+
+
+@pytest.fixture
+def embeddings():
+    return HashedWords()
+
+
+def make_store(embeddings, tmp_path, **kwargs):
+    return ExampleStore(embeddings, BASE, 'test-model', index_dir=str(tmp_path), micro_batch=False, **kwargs)
+
+
+def test_re_adding_an_example_is_rejected(embeddings, tmp_path):
+    store = make_store(embeddings, tmp_path)
+    example = learned(1)
+    assert store.add_example(example)
+    assert not store.add_example(dict(example))
+    # Same question after normalization: rejected before embedding
+    embedded = len(embeddings.embedded)
+    assert not store.add_example(dict(example, Question="  Learned QUESTION q1 about topic1 ?"))
+    assert len(embeddings.embedded) == embedded
+    # Different text, same words: rejected by vector distance
+    assert not store.add_example(dict(example, Question="about topic1 learned question q1"))
+    assert not store.add_example(dict(BASE[0], Question="Are Nike t-shirts how many left?"))
+
+    stats = store.stats()
+    assert (stats['examples'], stats['learned'], stats['added'], stats['duplicates']) == (4, 1, 1, 4)
+    assert store.search(learned(1)['Question'], 1) == [example]
+
+
+def test_learned_examples_survive_a_restart(embeddings, tmp_path):
+    store = make_store(embeddings, tmp_path)
+    assert store.add_example(learned(1))
+    assert store.add_example(learned(2))
+
+    reloaded_embeddings = HashedWords()
+    reloaded = make_store(reloaded_embeddings, tmp_path)
+    assert reloaded_embeddings.embedded == []     # neither base nor learned examples re-embedded
+    assert len(reloaded) == len(BASE) + 2
+    assert reloaded.stats()['learned'] == 2
+    assert reloaded.search(learned(2)['Question'], 1) == [learned(2)]
+    assert not reloaded.add_example(learned(1))
+
+
+def test_switches_to_hnsw_past_the_threshold(embeddings, tmp_path):
+    store = make_store(embeddings, tmp_path, hnsw_threshold=5)
+    for i in range(2):
+        assert store.add_example(learned(i))
+    assert store.stats()['index'] == 'flat'     # 5 examples, not past the threshold
+    assert store.add_example(learned(2))
+    assert store.stats()['index'] == 'hnsw'
+
+    # Base, learned and post-switch examples are all still found
+    assert store.add_example(learned(3))
+    for example in (BASE[1], learned(0), learned(3)):
+        assert store.search(example['Question'], 1) == [example]
+    assert not store.add_example(learned(0))
+
+    # A restart with more learned examples than the threshold starts on HNSW
+    assert make_store(HashedWords(), tmp_path, hnsw_threshold=5).stats()['index'] == 'hnsw'
+    assert make_store(HashedWords(), tmp_path).stats()['index'] == 'flat'
@@ -0,0 +1,71 @@
+import pytest
+
+from generate_data import SETUP_SQL, UNIQUE_SHIRTS, make_rows, split_statements
+
+PROCEDURE_SCRIPT = """-- Create the database
+CREATE DATABASE shop;
+
+-- A stored procedure
+DELIMITER $$
+CREATE PROCEDURE Fill()
+BEGIN
+    -- comment inside the body
+    INSERT INTO t VALUES (1);
+    SET x = x + 1;
+END$$
+DELIMITER ;
+
+CALL Fill();
+SELECT 1;
+SELECT 2"""
+
+
+def test_split_statements_honours_delimiter_and_comments():
+    statements = split_statements(PROCEDURE_SCRIPT)
+    assert statements[0] == "CREATE DATABASE shop"
+    assert statements[1].startswith("CREATE PROCEDURE Fill()")
+    assert statements[1].endswith("END")
+    assert "INSERT INTO t VALUES (1);\n    SET x = x + 1;" in statements[1]
+    assert statements[2:] == ["CALL Fill()", "SELECT 1", "SELECT 2"]
+
+
+def test_split_statements_of_db_setup():
+    with open(SETUP_SQL) as f:
+        statements = split_statements(f.read())
+    assert not any(s.startswith('--') or s.endswith(';') for s in statements)
+    assert [s.split()[0].upper() for s in statements] == ['DROP', 'CREATE', 'USE', 'CREATE', 'CREATE',
+                                                          'INSERT', 'INSERT']
+
+
+def test_db_setup_holds_the_80_row_data_set():
+    with open(SETUP_SQL) as f:
+        script = f.read()
+    for row in make_rows('t_shirts', 1, 81, {'t_shirts': 80}, 7):
+        assert "({}, '{}', '{}', '{}', {}, {})".format(*row) in script
+
+
+@pytest.mark.parametrize('rows', [1, 37, UNIQUE_SHIRTS])
+def test_t_shirts_stay_unique_up_to_80_rows(rows):
+    shirts = make_rows('t_shirts', 1, rows + 1, {'t_shirts': rows}, 7)
+    assert [s[0] for s in shirts] == list(range(1, rows + 1))
+    assert len({s[1:4] for s in shirts}) == rows
+
+
+def _chunked(table, total, chunk, counts, seed=7):
+    rows = []
+    for start in range(1, total + 1, chunk):
+        rows += make_rows(table, start, min(start + chunk, total + 1), counts, seed)
+    return rows
+
+
+@pytest.mark.parametrize('table', ['t_shirts', 'discounts', 'stores', 'customers', 'orders', 'order_items'])
+def test_same_rows_for_the_same_seed_however_chunked(table, monkeypatch):
+    monkeypatch.setattr('generate_data.RNG_BLOCK', 100)
+    total = 450
+    counts = {'t_shirts': total, 'stores': 50, 'customers': 45, 'orders': total, 'discount_rate': 0.3}
+    whole = _chunked(table, total, total, counts)
+    assert whole
+    for chunk in (1, 7, 100, 333):
+        assert _chunked(table, total, chunk, counts) == whole
+    assert _chunked(table, total, total, counts, seed=8) != whole
+
@@ -0,0 +1,213 @@
+import asyncio
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from llm_gateway import AsyncLLMGateway, LLMError, LLMGateway
+
+PAYLOAD = {'model': 'm', 'messages': [{'role': 'user', 'content': 'How many t-shirts?'}]}
+RESPONSE = {'choices': [{'message': {'content': 'SELECT 1'}}]}
+
+
+class SlowUpstream:
+    """Stands in for _call_with_retries_async: each call waits for release"""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.error = error
+
+    async def __call__(self, payload):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return RESPONSE
+
+
+def test_async_coalesced_waiters_share_one_call():
+    async def main():
+        gateway = AsyncLLMGateway(api_key='test')
+        gateway._call_with_retries_async = upstream = SlowUpstream()
+        tasks = [asyncio.create_task(gateway.chat(PAYLOAD)) for _ in range(5)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await asyncio.gather(*tasks), upstream.calls, gateway.stats()['coalesced']
+
+    results, calls, coalesced = asyncio.run(main())
+    assert results == [RESPONSE] * 5
+    assert calls == 1
+    assert coalesced == 4
+
+
+def test_async_cancelled_leader_hands_over_to_waiters():
+    async def main():
+        gateway = AsyncLLMGateway(api_key='test')
+        gateway._call_with_retries_async = upstream = SlowUpstream()
+        leader = asyncio.create_task(gateway.chat(PAYLOAD))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(gateway.chat(PAYLOAD)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        await asyncio.sleep(0.01)   # let the waiters wake up and one take over
+        upstream.release.set()
+        results = await asyncio.wait_for(asyncio.gather(*waiters), 5)
+        return results, upstream.calls, gateway._async_flights
+
+    results, calls, flights = asyncio.run(main())
+    assert results == [RESPONSE] * 3
+    assert calls == 2       # the cancelled leader's, then one waiter's
+    assert flights == {}
+
+
+def test_async_cancelled_waiter_leaves_leader_running():
+    async def main():
+        gateway = AsyncLLMGateway(api_key='test')
+        gateway._call_with_retries_async = upstream = SlowUpstream()
+        leader = asyncio.create_task(gateway.chat(PAYLOAD))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(gateway.chat(PAYLOAD))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        upstream.release.set()
+        return await asyncio.wait_for(leader, 5), upstream.calls
+
+    assert asyncio.run(main()) == (RESPONSE, 1)
+
+
+def test_async_leader_error_reaches_waiters():
+    async def main():
+        gateway = AsyncLLMGateway(api_key='test')
+        gateway._call_with_retries_async = upstream = SlowUpstream(LLMError('upstream down', status=502))
+        tasks = [asyncio.create_task(gateway.chat(PAYLOAD)) for _ in range(3)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True), upstream.calls
+
+    errors, calls = asyncio.run(main())
+    assert calls == 1
+    assert all(isinstance(e, LLMError) and e.status == 502 for e in errors)
+
+
+# ----------------------------------------------------------------------------
+# Against benchmarks/stub_llm.py
+# ----------------------------------------------------------------------------
+QUESTION = "Question: How many t-shirts do we have left for Nike in XS size and white color?"
+NIKE_SQL = "SELECT sum(stock_quantity) FROM t_shirts WHERE brand = 'Nike' AND color = 'White' AND size = 'XS'"
+
+
+class FlakyPost:
+    """Wraps LLMGateway._post: the first `failures` calls get a 503"""
+
+    def __init__(self, post, failures, status=503):
+        self.post = post
+        self.failures = failures
+        self.status = status
+        self.calls = 0
+
+    def __call__(self, payload, stream=False):
+        self.calls += 1
+        if self.calls <= self.failures:
+            response = requests.Response()
+            response.status_code = self.status
+            response._content = b'{"error": "overloaded"}'
+            return response
+        return self.post(payload, stream=stream)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(LLMGateway, '_backoff', staticmethod(lambda attempt, response: 0))
+
+
+def test_complete(stub_llm_url):
+    gateway = LLMGateway(base_url=stub_llm_url, api_key='test')
+    assert gateway.complete(QUESTION) == NIKE_SQL
+    stats = gateway.stats()
+    assert (stats['calls'], stats['errors'], stats['retries']) == (1, 0, 0)
+    assert stats['prompt_tokens'] > 0 and stats['completion_tokens'] > 0
+    assert stats['in_flight'] == 0
+
+
+def test_stream(stub_llm_url):
+    gateway = LLMGateway(base_url=stub_llm_url, api_key='test')
+    pieces = list(gateway.stream(QUESTION))
+    assert len(pieces) > 1
+    assert ''.join(pieces) == NIKE_SQL
+    stats = gateway.stats()
+    assert (stats['calls'], stats['streams'], stats['in_flight']) == (1, 1, 0)
+    assert stats['completion_tokens'] == len(pieces)
+
+
+def test_identical_concurrent_prompts_share_one_call(stub_llm_url):
+    gateway = LLMGateway(base_url=stub_llm_url, api_key='test')
+    upstream = FlakyPost(gateway._post, failures=0)
+    gateway._post = upstream
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: gateway.complete(QUESTION), range(8)))
+    assert results == [NIKE_SQL] * 8
+    # Stragglers arriving after the leader finished make their own call
+    assert upstream.calls + gateway.stats()['coalesced'] == 8
+    assert upstream.calls < 8
+
+
+def test_retries_then_succeeds(stub_llm_url, no_backoff):
+    gateway = LLMGateway(base_url=stub_llm_url, api_key='test', max_retries=3)
+    gateway._post = upstream = FlakyPost(gateway._post, failures=2)
+    assert gateway.complete(QUESTION) == NIKE_SQL
+    assert upstream.calls == 3
+    assert gateway.stats()['retries'] == 2
+    assert gateway.stats()['errors'] == 0
+
+
+def test_gives_up_after_max_retries(stub_llm_url, no_backoff):
+    gateway = LLMGateway(base_url=stub_llm_url, api_key='test', max_retries=2)
+    gateway._post = upstream = FlakyPost(gateway._post, failures=10)
+    with pytest.raises(LLMError) as raised:
+        gateway.complete(QUESTION)
+    assert raised.value.status == 503
+    assert upstream.calls == 3
+    assert gateway.stats()['errors'] == 1
+
+
+def test_client_errors_are_not_retried(stub_llm_url, no_backoff):
+    gateway = LLMGateway(base_url=stub_llm_url, api_key='test')
+    gateway._post = upstream = FlakyPost(gateway._post, failures=1, status=400)
+    with pytest.raises(LLMError) as raised:
+        gateway.complete(QUESTION)
+    assert raised.value.status == 400
+    assert upstream.calls == 1
+    assert gateway.stats()['retries'] == 0
+
+
+def test_unreachable_upstream(no_backoff):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    gateway = LLMGateway(base_url=f'http://127.0.0.1:{port}/v1', api_key='test', max_retries=1)
+    with pytest.raises(LLMError) as raised:
+        gateway.complete(QUESTION)
+    assert raised.value.status is None
+    assert gateway.stats()['retries'] == 1
+
+
+def test_async_complete(stub_llm_url):
+    async def main():
+        gateway = AsyncLLMGateway(base_url=stub_llm_url, api_key='test')
+        try:
+            results = await asyncio.gather(*[gateway.complete(QUESTION) for _ in range(4)])
+        finally:
+            await gateway.aclose()
+        return results, gateway.stats()
+
+    results, stats = asyncio.run(main())
+    assert results == [NIKE_SQL] * 4
+    assert (stats['calls'], stats['coalesced'], stats['in_flight']) == (1, 3, 0)
@@ -0,0 +1,40 @@
+from collections import deque
+
+import pytest
+
+import api_server
+import metrics
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(metrics, '_recent', deque(maxlen=metrics.RECENT_QUERIES))
+    for i in range(5):
+        metrics.record_query('sql', f'SELECT {i}', 'success', 0.01, rows=i)
+    return api_server.app.test_client()
+
+
+def queries(client, query=''):
+    response = client.get(f'/api/queries/recent{query}')
+    assert response.status_code == 200
+    return [q['query'] for q in response.get_json()]
+
+
+def test_recent_queries_newest_first(client):
+    assert queries(client) == [f'SELECT {i}' for i in range(4, -1, -1)]
+    assert queries(client, '?limit=2') == ['SELECT 4', 'SELECT 3']
+
+
+@pytest.mark.parametrize('limit', ['0', '-3'])
+def test_recent_queries_non_positive_limit_is_empty(client, limit):
+    assert queries(client, f'?limit={limit}') == []
+
+
+def test_recent_queries_limit_is_capped(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'RECENT_QUERIES', 3)
+    assert len(queries(client, '?limit=1000')) == 3
+
+
+def test_recent_queries_function_clamps():
+    assert metrics.recent_queries(0) == []
+    assert metrics.recent_queries(-3) == []
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+import api_server
+import nl_pipeline
+from db_router import ReplicaRouter
+from nl_pipeline import LLMStage, RouteStage, SchemaStage
+from question_cache import get_question_cache
+from result_format import format_nl_answer
+from sql_guard import QueryRejected
+
+SCHEMA = [('brand', "enum('Van Huesen','Levi','Nike','Adidas')"), ('stock_quantity', 'int')]
+PRIMARY = dict(api_server.DB_CONFIG)
+SQL = "SELECT brand, stock_quantity FROM t_shirts"
+COLUMNS = [('brand', None), ('stock_quantity', None)]
+ROWS = [{'brand': 'Nike', 'stock_quantity': 3}, {'brand': 'Levi', 'stock_quantity': 5},
+        {'brand': 'Adidas', 'stock_quantity': 8}]
+REJECTION = {'action': 'reject', 'estimated_rows': 10 ** 9}
+
+
+class StreamingGateway:
+    api_key = 'test'
+
+    def stream(self, prompt, **kwargs):
+        yield 'SELECT brand, '
+        yield 'stock_quantity FROM t_shirts'
+
+
+def fake_stream_result(db_config, sql, max_rows):
+    yield 'columns', COLUMNS
+    yield 'rows', ROWS[:2]
+    yield 'rows', ROWS[2:]
+    yield 'truncated', False
+
+
+def parse_events(text):
+    """[(event, data)] of an SSE body; every event must be a complete frame"""
+    assert text.endswith('\n\n')
+    events = []
+    for frame in text[:-2].split('\n\n'):
+        event, data = frame.split('\n')
+        assert event.startswith('event: ') and data.startswith('data: ')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+@pytest.fixture(params=['flask', 'asgi'])
+def ask(request, monkeypatch):
+    """POST a streamed question to the Flask or the ASGI server, both running
+    api_server.nl_answer_events over the pipeline minus MySQL and the LLM"""
+    get_question_cache(PRIMARY['database']).clear()
+    monkeypatch.setattr(nl_pipeline, 'guard', lambda db_config, sql, **kwargs: (sql, {'action': 'allow'}))
+    monkeypatch.setattr(nl_pipeline, 'stream_result', fake_stream_result)
+    pipeline = api_server.nl_query_pipeline.replace('schema', SchemaStage(lambda ctx: SCHEMA))
+    pipeline = pipeline.replace('llm', LLMStage(StreamingGateway(), api_server.NL_MODEL))
+    pipeline = pipeline.replace('route', RouteStage(ReplicaRouter(PRIMARY)))
+    monkeypatch.setattr(api_server, 'nl_query_pipeline', pipeline)
+
+    if request.param == 'flask':
+        client = api_server.app.test_client()
+    else:
+        pytest.importorskip('a2wsgi')
+        pytest.importorskip('starlette')
+        from starlette.testclient import TestClient
+
+        import asgi_server
+        client = TestClient(asgi_server.app)
+
+    def post(question='How much Nike and Levi stock?', cache=False):
+        response = client.post('/api/query', json={'query': question, 'stream': True, 'cache': cache})
+        assert response.status_code == 200
+        assert response.headers['Content-Type'].startswith('text/event-stream')
+        assert response.headers['Cache-Control'] == 'no-cache'
+        return parse_events(response.get_data(as_text=True) if request.param == 'flask' else response.text)
+
+    yield post
+    get_question_cache(PRIMARY['database']).clear()
+
+
+def test_event_sequence(ask):
+    events = ask()
+    names = [event for event, _ in events]
+    assert names == ['token', 'token', 'sql', 'guard', 'columns', 'rows', 'rows'] + \
+        ['answer'] * (len(names) - 8) + ['done']
+    data = dict(events)
+    assert ''.join(d['text'] for e, d in events if e == 'token') == SQL
+    assert data['sql'] == {'sql': SQL}
+    assert data['guard'] == {'action': 'allow'}
+    assert data['columns'] == {'columns': ['brand', 'stock_quantity']}
+    assert [d['rows'] for e, d in events if e == 'rows'] == [ROWS[:2], ROWS[2:]]
+    assert ''.join(d['text'] for e, d in events if e == 'answer') == format_nl_answer(ROWS, COLUMNS)
+
+    done = data['done']
+    assert (done['sql'], done['cache'], done['row_count'], done['truncated']) == (SQL, 'miss', 3, False)
+    assert done['query'] == 'How much Nike and Levi stock?'
+    assert {'llm', 'execute', 'total'} <= set(done['timings'])
+
+
+def test_cached_sql_streams_without_tokens(ask):
+    ask(cache=True)
+    names = [event for event, _ in ask(cache=True)]
+    assert names[:5] == ['sql', 'guard', 'columns', 'rows', 'rows']
+    assert 'token' not in names
+    assert names[-1] == 'done'
+
+
+def test_guard_rejection_is_an_error_event(ask, monkeypatch):
+    def reject(db_config, sql, **kwargs):
+        raise QueryRejected('Estimated 1000000000 rows to examine', REJECTION, status=403)
+
+    monkeypatch.setattr(nl_pipeline, 'guard', reject)
+    events = ask()
+    assert [event for event, _ in events] == ['token', 'token', 'sql', 'error']
+    assert events[-1][1] == {'error': 'Estimated 1000000000 rows to examine', 'status': 403,
+                             'stage': 'guard', 'guard': REJECTION}
+
+
+def test_failure_after_rows_is_an_error_event(ask, monkeypatch):
+    def broken_stream_result(db_config, sql, max_rows):
+        yield 'columns', COLUMNS
+        yield 'rows', ROWS[:2]
+        raise RuntimeError('connection lost')
+
+    monkeypatch.setattr(nl_pipeline, 'stream_result', broken_stream_result)
+    events = ask()
+    assert [event for event, _ in events][-3:] == ['columns', 'rows', 'error']
+    assert events[-1][1] == {'error': 'AI processing failed: connection lost', 'status': 500,
+                             'stage': 'execute', 'guard': {'action': 'allow'}}
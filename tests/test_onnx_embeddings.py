@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+for module in ('onnxruntime', 'tokenizers', 'sentence_transformers', 'langchain_community', 'faiss'):
+    pytest.importorskip(module)
+
+from embedding_backends import PARITY_QUESTIONS, retrieval_parity  # noqa: E402
+from embedding_service import load_embeddings  # noqa: E402
+from few_shot_index import example_text  # noqa: E402
+from few_shots import few_shots  # noqa: E402
+from langchain_helper import EMBEDDING_MODEL  # noqa: E402
+from onnx_embeddings import OnnxEmbeddings, model_files  # noqa: E402
+
+
+def _vectors(embeddings):
+    return {
+        'examples': np.asarray(embeddings.embed_documents([example_text(e) for e in few_shots]), dtype=np.float32),
+        'questions': np.asarray(embeddings.embed_documents(PARITY_QUESTIONS), dtype=np.float32),
+    }
+
+
+def _onnx(variant):
+    try:
+        model_files(EMBEDDING_MODEL, variant)
+    except Exception as e:   # offline and not in the HF cache
+        pytest.skip(f"ONNX {variant} model unavailable: {e}")
+    return OnnxEmbeddings(EMBEDDING_MODEL, variant=variant)
+
+
+@pytest.fixture(scope='module')
+def reference():
+    """sentence-transformers (torch) vectors, what the few-shot index was built with"""
+    return _vectors(load_embeddings(EMBEDDING_MODEL, 'huggingface'))
+
+
+def test_fp32_matches_sentence_transformers(reference):
+    onnx = _vectors(_onnx('fp32'))
+    np.testing.assert_allclose(onnx['examples'], reference['examples'], atol=1e-4)
+    np.testing.assert_allclose(onnx['questions'], reference['questions'], atol=1e-4)
+    assert retrieval_parity(reference, onnx)['topk_agreement'] == 1.0
+
+
+def test_int8_keeps_few_shot_retrieval(reference):
+    # Same thresholds as embedding_backends.py --check
+    parity = retrieval_parity(reference, _vectors(_onnx('int8')))
+    assert parity['min_cosine'] >= 0.98
+    assert parity['topk_agreement'] >= 0.9
+
+
+def test_vectors_are_unit_length():
+    onnx = _onnx('int8')
+    vectors = np.asarray(onnx.embed_documents(["short", "a much longer question about Levi's t-shirts\nin XS"]))
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+    assert onnx.embed_documents([]) == []
@@ -0,0 +1,91 @@
+import base64
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor, next_cursor, paginate_sql
+
+SQL = "SELECT t_shirt_id, brand FROM t_shirts WHERE brand = 'Nike';"
+ROWS = [{'t_shirt_id': i, 'brand': 'Nike'} for i in range(1, 24)]
+
+
+def fetch_keyset(state, page_size):
+    """What MySQL returns for the keyset page: rows after the cursor, page_size + 1"""
+    after = state.get('after', float('-inf'))
+    return [row for row in ROWS if row['t_shirt_id'] > after][:page_size + 1]
+
+
+def test_keyset_sql():
+    sql, state = paginate_sql(SQL, 10, order_by='t_shirt_id')
+    assert state == {}
+    assert sql == ("SELECT * FROM (SELECT t_shirt_id, brand FROM t_shirts WHERE brand = 'Nike') AS page "
+                   "ORDER BY `t_shirt_id` LIMIT 11")
+
+    sql, state = paginate_sql(SQL, 10, encode_cursor({'after': 10}), order_by='t_shirt_id')
+    assert state == {'after': 10}
+    assert sql == ("SELECT * FROM (SELECT t_shirt_id, brand FROM t_shirts WHERE brand = 'Nike') AS page "
+                   "WHERE `t_shirt_id` > 10 ORDER BY `t_shirt_id` LIMIT 11")
+
+
+def test_keyset_pages_cover_every_row_once():
+    pages, cursor = [], None
+    while True:
+        _, state = paginate_sql(SQL, 10, cursor, order_by='t_shirt_id')
+        rows, cursor = next_cursor(fetch_keyset(state, 10), 10, state, order_by='t_shirt_id')
+        pages.append([row['t_shirt_id'] for row in rows])
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [10, 10, 3]
+    assert sum(pages, []) == list(range(1, 24))
+
+
+def test_last_full_page_has_no_cursor():
+    rows, cursor = next_cursor(ROWS[:10], 10, {}, order_by='t_shirt_id')
+    assert len(rows) == 10
+    assert cursor is None
+
+
+def test_keyset_cursor_values_are_escaped():
+    cursor = encode_cursor({'after': "x' OR '1'='1"})
+    sql, _ = paginate_sql(SQL, 5, cursor, order_by='brand')
+    assert "WHERE `brand` > 'x\\' OR \\'1\\'=\\'1'" in sql
+
+
+def test_keyset_cursor_from_a_date_column():
+    import datetime
+    rows = [{'sold_at': datetime.datetime(2024, 1, day)} for day in range(1, 4)]
+    _, cursor = next_cursor(rows, 2, {}, order_by='sold_at')
+    assert decode_cursor(cursor) == {'after': '2024-01-02 00:00:00'}
+    sql, _ = paginate_sql(SQL, 2, cursor, order_by='sold_at')
+    assert "WHERE `sold_at` > '2024-01-02 00:00:00'" in sql
+
+
+@pytest.mark.parametrize('order_by', ['brand; DROP TABLE t_shirts', 'a`b', '1st', 'a b'])
+def test_rejects_bad_order_by(order_by):
+    with pytest.raises(ValueError, match='Invalid order_by'):
+        paginate_sql(SQL, 10, order_by=order_by)
+
+
+def test_offset_pages():
+    sql, state = paginate_sql(SQL, 10)
+    assert sql.endswith(') AS page LIMIT 11 OFFSET 0')
+    rows, cursor = next_cursor(ROWS[:11], 10, state)
+    assert len(rows) == 10
+    sql, state = paginate_sql(SQL, 10, cursor)
+    assert state == {'offset': 10}
+    assert sql.endswith(') AS page LIMIT 11 OFFSET 10')
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    base64.urlsafe_b64encode(b'not json').decode(),
+    encode_cursor([1, 2]),
+    encode_cursor({'offset': -10}),
+])
+def test_rejects_bad_cursors(cursor):
+    with pytest.raises(ValueError, match='Invalid pagination cursor'):
+        paginate_sql(SQL, 10, cursor)
+
+
+def test_rejects_empty_pages():
+    with pytest.raises(ValueError, match='page_size'):
+        paginate_sql(SQL, 0)
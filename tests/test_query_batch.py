@@ -0,0 +1,156 @@
+import re
+import threading
+import time
+
+import pytest
+
+import api_server
+import nl_pipeline
+from db_router import ReplicaRouter
+from nl_pipeline import (ExampleRetrieval, LLMStage, Pipeline, PromptStage, QuestionCacheLookup, RouteStage,
+                         SanitizeStage, SchemaStage)
+from question_cache import get_question_cache
+
+SCHEMA = [('brand', "enum('Van Huesen','Levi','Nike','Adidas')"), ('stock_quantity', 'int')]
+PRIMARY = dict(api_server.DB_CONFIG)
+
+
+class FakeGateway:
+    """LLMGateway stand-in: answers "question N" with SELECT N, later
+    questions faster, and "unanswerable" questions with no SQL"""
+    api_key = 'test'
+
+    def __init__(self, barrier=None):
+        self.prompts = []
+        self.barrier = barrier
+        self.lock = threading.Lock()
+
+    def complete(self, prompt, **kwargs):
+        with self.lock:
+            self.prompts.append(prompt)
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)    # raises unless the calls overlap
+        question = prompt.rsplit('Question: ', 1)[1].splitlines()[0]
+        if 'unanswerable' in question:
+            return '```sql\n```'
+        number = int(re.search(r'\d+', question).group())
+        time.sleep(0.002 * (10 - number))
+        return f'SELECT {number} AS n'
+
+
+def fake_fetch_result(db_config, sql, max_rows):
+    number = int(re.search(r'SELECT (\d+)', sql).group(1))
+    return [{'n': number}], False, [('n', None)]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    gateway = FakeGateway()
+    monkeypatch.setattr(nl_pipeline, 'guard', lambda db_config, sql, **kwargs: (sql, {'action': 'allow'}))
+    monkeypatch.setattr(nl_pipeline, 'fetch_result', fake_fetch_result)
+    pipeline = api_server.nl_query_pipeline.replace('schema', SchemaStage(lambda ctx: SCHEMA))
+    pipeline = pipeline.replace('llm', LLMStage(gateway, api_server.NL_MODEL))
+    pipeline = pipeline.replace('route', RouteStage(ReplicaRouter(PRIMARY)))
+    monkeypatch.setattr(api_server, 'nl_query_pipeline', pipeline)
+    return api_server.app.test_client(), gateway
+
+
+def ask(client, questions):
+    return client.post('/api/query/batch', json={'queries': questions, 'cache': False})
+
+
+def test_results_keep_the_question_order(server):
+    client, gateway = server
+    questions = [f'question {i}' for i in range(8)]
+    response = ask(client, questions)
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert (body['count'], body['failed']) == (8, 0)
+    assert [r['query'] for r in body['results']] == questions
+    assert [r['results'] for r in body['results']] == [[{'n': i}] for i in range(8)]
+    assert [r['sql'] for r in body['results']] == [f'SELECT {i} AS n' for i in range(8)]
+    assert len(gateway.prompts) == 8
+
+
+def test_one_failing_question_does_not_fail_the_batch(server):
+    client, _ = server
+    response = ask(client, ['question 1', 'an unanswerable question', 'question 3'])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['failed'] == 1
+    first, failed, last = body['results']
+    assert (first['status'], first['results']) == (200, [{'n': 1}])
+    assert (last['status'], last['results']) == (200, [{'n': 3}])
+    assert failed['query'] == 'an unanswerable question'
+    assert (failed['status'], failed['stage']) == (502, 'sanitize')
+    assert failed['error'] == 'The model did not return a SQL query'
+    assert 'results' not in failed
+
+
+def test_batch_size_limit(server, monkeypatch):
+    client, gateway = server
+    monkeypatch.setattr(api_server, 'QUERY_BATCH_MAX', 3)
+    response = ask(client, [f'question {i}' for i in range(4)])
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'At most 3 questions per batch'}
+    assert gateway.prompts == []
+    assert ask(client, [f'question {i}' for i in range(3)]).status_code == 200
+
+
+@pytest.mark.parametrize('body', [{}, {'queries': []}, {'queries': 'question 1'}, {'queries': ['question 1', ' ']}])
+def test_invalid_batches_are_rejected(server, body):
+    client, gateway = server
+    assert client.post('/api/query/batch', json=body).status_code == 400
+    assert gateway.prompts == []
+
+
+class Selector:
+    def __init__(self):
+        self.batches = []
+
+    def select_examples_batch(self, inputs):
+        self.batches.append(inputs)
+        return [[] for _ in inputs]
+
+
+def test_run_batch_groups_embedding_schema_and_llm_calls():
+    namespace = 'test_query_batch'
+    cache = get_question_cache(namespace)
+    cache.clear()
+    cache.put('question 0', 'SELECT 0 AS n')
+    embedded, schemas = [], []
+
+    def embed_many(texts):
+        embedded.append(list(texts))
+        return [None for _ in texts]
+
+    def schema(ctx):
+        schemas.append(ctx.question)
+        return SCHEMA
+
+    gateway = FakeGateway(barrier=threading.Barrier(3))
+    selector = Selector()
+    pipeline = Pipeline([
+        QuestionCacheLookup(namespace, batch_embedder=lambda: embed_many),
+        SchemaStage(schema),
+        ExampleRetrieval(selector),
+        PromptStage(lambda ctx: api_server.build_nl_prompt(ctx.schema, ctx.question)),
+        LLMStage(gateway, api_server.NL_MODEL),
+        SanitizeStage(),
+    ])
+    try:
+        contexts = pipeline.run_batch([f'question {i}' for i in range(4)])
+    finally:
+        cache.clear()
+
+    assert [ctx.error for ctx in contexts] == [None] * 4
+    assert [ctx.sql for ctx in contexts] == [f'SELECT {i} AS n' for i in range(4)]
+    assert contexts[0].cache_tier == 'exact'
+    # One embedding call for the whole batch
+    assert embedded == [[f'question {i}' for i in range(4)]]
+    # Schema and retrieval once for the generating questions; the three LLM calls
+    # ran at the same time (the barrier needs all three)
+    assert len(schemas) == 1
+    assert [[inputs['input'] for inputs in batch] for batch in selector.batches] == [
+        ['question 1', 'question 2', 'question 3']]
+    assert len(gateway.prompts) == 3
@@ -0,0 +1,155 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import api_server
+from nl_pipeline import QueryContext, QuestionCacheLookup
+from question_cache import QuestionCache, get_question_cache, normalize_question
+
+NIKE_SQL = "SELECT sum(stock_quantity) FROM t_shirts WHERE brand = 'Nike'"
+VOCABULARY = ['how', 'many', 'nike', 'levi', 't-shirts', 'shirts', 'tees', 'white', 'black', 'in', 'stock', 'left']
+
+
+class BagOfWords:
+    """Deterministic embed_query stand-in that counts its calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        words = text.split()
+        return np.array([words.count(word) for word in VOCABULARY], dtype=np.float32)
+
+
+@pytest.fixture
+def embed():
+    return BagOfWords()
+
+
+@pytest.mark.parametrize('question, normalized', [
+    ("How many Nike T-shirts?", "how many nike t-shirts"),
+    ("  how   many\nnike t-shirts ?! ", "how many nike t-shirts"),
+    ("How many Levi’s shirts?", "how many levi's shirts"),
+])
+def test_normalize_question(question, normalized):
+    assert normalize_question(question) == normalized
+
+
+def test_exact_tier_does_not_embed(embed):
+    cache = QuestionCache(max_entries=10, ttl=60, threshold=0.9)
+    cache.put("How many Nike t-shirts in stock?", NIKE_SQL)
+    assert cache.get("how many nike t-shirts in stock", embed=embed) == (NIKE_SQL, 'exact', None)
+    assert embed.calls == []
+    assert cache.stats()['exact_hits'] == 1
+
+
+def test_semantic_tier_above_threshold(embed):
+    cache = QuestionCache(max_entries=10, ttl=60, threshold=0.9)
+    sql, tier, vector = cache.get("how many nike t-shirts in stock", embed=embed)
+    assert (sql, tier) == (None, None)
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+    cache.put("how many nike t-shirts in stock", NIKE_SQL, vector=vector)
+
+    # Same words plus one more: cosine 6/sqrt(42) ~ 0.93
+    sql, tier, _ = cache.get("how many nike t-shirts left in stock", embed=embed)
+    assert (sql, tier) == (NIKE_SQL, 'semantic')
+    stats = cache.stats()
+    assert (stats['semantic_hits'], stats['misses']) == (1, 1)
+
+
+def test_semantic_tier_below_threshold_is_a_miss(embed):
+    cache = QuestionCache(max_entries=10, ttl=60, threshold=0.9)
+    _, _, vector = cache.get("how many white nike shirts", embed=embed)
+    cache.put("how many white nike shirts", NIKE_SQL + " AND color = 'White'", vector=vector)
+    # One word differs: cosine 0.8, needs different SQL
+    assert cache.get("how many black nike shirts", embed=embed)[:2] == (None, None)
+
+
+def test_without_an_embedder_only_exact_matches(embed):
+    cache = QuestionCache(max_entries=10, ttl=60, threshold=0.5)
+    cache.put("how many nike t-shirts in stock", NIKE_SQL, vector=np.ones(len(VOCABULARY), dtype=np.float32))
+    assert cache.get("how many nike t-shirts left in stock") == (None, None, None)
+
+
+def test_bypass_and_disabled(embed, monkeypatch):
+    cache = QuestionCache(max_entries=10, ttl=60)
+    cache.put("how many nike t-shirts", NIKE_SQL)
+    assert cache.get("how many nike t-shirts", embed=embed, bypass=True) == (None, None, None)
+    assert embed.calls == []
+    assert cache.stats()['bypassed'] == 1
+
+    monkeypatch.setenv('QUESTION_CACHE_ENABLED', 'false')
+    disabled = QuestionCache(max_entries=10, ttl=60)
+    disabled.put("how many nike t-shirts", NIKE_SQL)
+    assert disabled.get("how many nike t-shirts") == (None, None, None)
+    assert disabled.stats()['size'] == 0
+
+
+def test_expired_entries_miss_on_both_tiers(embed):
+    cache = QuestionCache(max_entries=10, ttl=-1, threshold=0.9)
+    _, _, vector = cache.get("how many nike t-shirts in stock", embed=embed)
+    cache.put("how many nike t-shirts in stock", NIKE_SQL, vector=vector)
+    assert cache.get("how many nike t-shirts in stock", embed=embed)[:2] == (None, None)
+    assert cache.stats()['size'] == 0    # the exact lookup dropped it
+    cache.put("how many nike t-shirts in stock", NIKE_SQL, vector=vector)
+    assert cache.get("how many nike t-shirts left in stock", embed=embed)[:2] == (None, None)
+
+
+def test_lru_eviction_also_leaves_the_semantic_tier(embed):
+    cache = QuestionCache(max_entries=2, ttl=60, threshold=0.9)
+    for question in ("how many nike t-shirts in stock", "how many levi shirts", "how many black tees"):
+        _, _, vector = cache.get(question, embed=embed)
+        cache.put(question, f"-- {question}", vector=vector)
+    assert cache.stats()['evictions'] == 1
+    assert cache.get("how many nike t-shirts left in stock", embed=embed)[:2] == (None, None)
+    assert cache.get("how many levi shirts", embed=embed)[1] == 'exact'
+
+
+def test_lookup_stage_batches_embeddings(embed, monkeypatch):
+    namespace = 'test_question_cache'
+    cache = get_question_cache(namespace)
+    cache.clear()
+    monkeypatch.setattr(cache, 'threshold', 0.9)
+    try:
+        vector = embed("how many nike t-shirts in stock")
+        cache.put("how many nike t-shirts in stock", NIKE_SQL, vector=vector / np.linalg.norm(vector))
+        batches = []
+
+        def embed_many(texts):
+            batches.append(list(texts))
+            return [embed(text) for text in texts]
+
+        stage = QuestionCacheLookup(namespace, batch_embedder=lambda: embed_many)
+        contexts = [QueryContext("How many Nike t-shirts in stock?"),
+                    QueryContext("How many Nike t-shirts left in stock?"),
+                    QueryContext("How many black tees?"),
+                    QueryContext("How many Nike t-shirts in stock?", use_cache=False)]
+        stage.run_batch(contexts)
+        assert len(batches) == 1
+        assert [ctx.cache_tier for ctx in contexts] == ['exact', 'semantic', None, None]
+        assert contexts[2].question_vector is not None     # handed back to RememberStage
+        assert contexts[3].question_vector is None
+    finally:
+        cache.clear()
+
+
+def test_api_uses_a_preloaded_model_before_any_chain(monkeypatch):
+    class Preloaded:
+        def embed_query(self, text):
+            return [1.0]
+
+        def embed_documents(self, texts):
+            return [[1.0] for _ in texts]
+
+    preloaded = Preloaded()
+    service = types.SimpleNamespace(loaded_embeddings=lambda: preloaded)
+    assert not api_server.ai_helper.loaded
+    monkeypatch.setitem(sys.modules, 'embedding_service', service)
+    assert api_server._question_embedder() == preloaded.embed_query
+    assert api_server._question_batch_embedder() == preloaded.embed_documents
+
+    monkeypatch.setattr(service, 'loaded_embeddings', lambda: None)
+    assert api_server._question_embedder() is None
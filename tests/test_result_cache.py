@@ -0,0 +1,113 @@
+import pytest
+
+from result_cache import (MemoryBackend, ResultCache, SQLiteBackend, _estimate_bytes, normalize_sql,
+                          referenced_tables)
+
+ROWS = [{'brand': 'Nike', 'total': 91}]
+
+
+@pytest.mark.parametrize('sql, tables', [
+    ("SELECT * FROM t_shirts", {'t_shirts'}),
+    ("select * from T_Shirts where brand = 'Nike'", {'t_shirts'}),
+    ("SELECT * FROM `atliq_tshirts`.`t_shirts` AS t", {'t_shirts'}),
+    ("SELECT * FROM t_shirts t, discounts AS d WHERE t.t_shirt_id = d.t_shirt_id", {'t_shirts', 'discounts'}),
+    ("SELECT * FROM t_shirts, discounts", {'t_shirts', 'discounts'}),
+    ("SELECT * FROM t_shirts JOIN discounts ON 1", {'t_shirts', 'discounts'}),
+    ("SELECT * FROM t_shirts\nJOIN\n\tdiscounts USING (t_shirt_id)", {'t_shirts', 'discounts'}),
+    ("SELECT * FROM t_shirts NATURAL JOIN discounts", {'t_shirts', 'discounts'}),
+    ("SELECT * FROM t_shirts t LEFT JOIN discounts d ON t.t_shirt_id = d.t_shirt_id", {'t_shirts', 'discounts'}),
+    ("SELECT * FROM t_shirts USE INDEX (brand) JOIN discounts ON 1", {'t_shirts', 'discounts'}),
+    ("SELECT sum(a.total) FROM (SELECT price AS total, t_shirt_id FROM t_shirts) a "
+     "LEFT JOIN discounts ON a.t_shirt_id = discounts.t_shirt_id", {'t_shirts', 'discounts'}),
+    ("SELECT * FROM t_shirts WHERE t_shirt_id IN (SELECT t_shirt_id FROM discounts)", {'t_shirts', 'discounts'}),
+    ("SELECT 'pick from secret' AS note FROM t_shirts", {'t_shirts'}),
+    ("SELECT 1", set()),
+])
+def test_referenced_tables(sql, tables):
+    assert referenced_tables(sql) == tables
+
+
+@pytest.mark.parametrize('sql, normalized', [
+    ("SELECT *\n  FROM t_shirts ;", "SELECT * FROM t_shirts"),
+    ("  SELECT  brand FROM\tt_shirts;", "SELECT brand FROM t_shirts"),
+    ("SELECT * FROM t_shirts WHERE brand = 'Van  Huesen'", "SELECT * FROM t_shirts WHERE brand = 'Van  Huesen'"),
+    ('SELECT "a  b", `c  d` FROM t', 'SELECT "a  b", `c  d` FROM t'),
+    ("SELECT * FROM t WHERE a = 'it\\'s  ok'", "SELECT * FROM t WHERE a = 'it\\'s  ok'"),
+])
+def test_normalize_sql(sql, normalized):
+    assert normalize_sql(sql) == normalized
+
+
+def test_whitespace_variants_share_a_key():
+    assert ResultCache.cache_key("SELECT *\nFROM t_shirts;") == ResultCache.cache_key("SELECT * FROM t_shirts")
+    assert ResultCache.cache_key("SELECT * FROM t WHERE a = 'x y'") != ResultCache.cache_key(
+        "SELECT * FROM t WHERE a = 'x  y'")
+
+
+class Versions:
+    def __init__(self, **versions):
+        self.versions = versions
+
+    def __call__(self):
+        return dict(self.versions)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteBackend(1024 * 1024, str(tmp_path / 'results.sqlite'))
+    return MemoryBackend(1024 * 1024)
+
+
+def test_hit_until_a_referenced_table_changes(backend):
+    versions = Versions(t_shirts=1, discounts=1)
+    cache = ResultCache(versions, backend, ttl=60)
+    sql = "SELECT * FROM t_shirts JOIN discounts USING (t_shirt_id)"
+    assert cache.get(sql) is None
+    assert cache.put(sql, ROWS, 12)
+    assert cache.get(sql + ';') == (ROWS, 12)
+
+    versions.versions['discounts'] = 2
+    assert cache.get(sql) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['invalidations'], stats['entries']) == (1, 2, 1, 0)
+
+
+def test_unrelated_table_change_keeps_the_entry(backend):
+    versions = Versions(t_shirts=1, discounts=1)
+    cache = ResultCache(versions, backend, ttl=60)
+    cache.put("SELECT * FROM t_shirts", ROWS, 5)
+    versions.versions['discounts'] = 2
+    assert cache.get("SELECT * FROM t_shirts") == (ROWS, 5)
+
+
+def test_ttl_expires_entries(backend):
+    cache = ResultCache(Versions(t_shirts=1), backend, ttl=-1)   # already expired when stored
+    cache.put("SELECT * FROM t_shirts", ROWS, 5)
+    assert cache.get("SELECT * FROM t_shirts") is None
+
+
+def test_uncacheable_queries():
+    cache = ResultCache(Versions(t_shirts=1), MemoryBackend(1024 * 1024), ttl=60)
+    # Not invalidated by any table version
+    assert not cache.put("SELECT NOW(), brand FROM t_shirts", ROWS, 1)
+    assert cache.get("SELECT NOW(), brand FROM t_shirts") is None
+    assert cache.stats()['bypassed'] == 1
+    # Table we have no version for
+    assert not cache.put("SELECT * FROM other_db.orders", ROWS, 1)
+    # Larger than max_entry_bytes
+    assert not ResultCache(Versions(t_shirts=1), MemoryBackend(1024 * 1024), ttl=60,
+                           max_entry_bytes=10).put("SELECT * FROM t_shirts", ROWS, 1)
+
+
+def test_memory_backend_evicts_least_recently_used():
+    rows = [[{'id': i}] for i in range(3)]
+    cache = ResultCache(Versions(t_shirts=1), MemoryBackend(2 * _estimate_bytes(rows[0])), ttl=60,
+                        max_entry_bytes=10 ** 6)
+    cache.put("SELECT 0 FROM t_shirts", rows[0], 1)
+    cache.put("SELECT 1 FROM t_shirts", rows[1], 1)
+    cache.get("SELECT 0 FROM t_shirts")
+    cache.put("SELECT 2 FROM t_shirts", rows[2], 1)
+    assert cache.get("SELECT 0 FROM t_shirts") is not None
+    assert cache.get("SELECT 1 FROM t_shirts") is None
+    assert cache.stats()['evictions'] == 1
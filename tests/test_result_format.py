@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+import result_format
+from format_benchmark import SHAPES, legacy_format_chain_answer, legacy_format_nl_answer, make_results
+from result_format import chain_answer_chunks, format_chain_answer, format_nl_answer, nl_answer_chunks
+
+COUNTS = [0, 1, 2, 5, 6, 250]
+
+# Results the benchmark shapes don't produce, each with its cursor.description types
+EDGE_CASES = {
+    'single_value': ([{'total': 91}], [('total', FIELD_TYPE.NEWDECIMAL)]),
+    'single_null': ([{'total': None}], [('total', FIELD_TYPE.LONGLONG)]),
+    'one_column': ([{'brand': b} for b in ['Nike', 'Levi', 'Adidas']], [('brand', FIELD_TYPE.VAR_STRING)]),
+    'one_column_many': ([{'n': i} for i in range(8)], [('n', FIELD_TYPE.LONG)]),
+    'one_row': ([{'brand': 'Nike', 'stock': 3}], [('brand', FIELD_TYPE.VAR_STRING), ('stock', FIELD_TYPE.LONG)]),
+    'float_stock': ([{'size': 'S', 'avg': 2.75}, {'size': 'M', 'avg': 10.5}],
+                    [('size', FIELD_TYPE.VAR_STRING), ('avg', FIELD_TYPE.DOUBLE)]),
+    'decimal_stock': ([{'size': 'S', 'revenue': Decimal('12.50')}, {'size': 'M', 'revenue': Decimal('3.10')}],
+                      [('size', FIELD_TYPE.VAR_STRING), ('revenue', FIELD_TYPE.NEWDECIMAL)]),
+    'negative_total': ([{'size': 'S', 'delta': -5}, {'size': 'M', 'delta': 2}],
+                       [('size', FIELD_TYPE.VAR_STRING), ('delta', FIELD_TYPE.LONG)]),
+    'bool_values': ([{'brand': 'Nike', 'in_stock': True}, {'brand': 'Levi', 'in_stock': False}],
+                    [('brand', FIELD_TYPE.VAR_STRING), ('in_stock', FIELD_TYPE.TINY)]),
+    'three_columns': ([{'brand': 'Nike', 'color': 'Red', 'stock': 4}, {'brand': 'Levi', 'color': None, 'stock': 7}],
+                      [('brand', FIELD_TYPE.VAR_STRING), ('color', FIELD_TYPE.VAR_STRING),
+                       ('stock', FIELD_TYPE.LONGLONG)]),
+    'all_null_stock': ([{'size': 'S', 'stock': None}, {'size': 'M', 'stock': None}],
+                       [('size', FIELD_TYPE.VAR_STRING), ('stock', FIELD_TYPE.LONGLONG)]),
+    'leading_null_stock': ([{'size': 'S', 'stock': None}, {'size': 'M', 'stock': 4}],
+                           [('size', FIELD_TYPE.VAR_STRING), ('stock', FIELD_TYPE.LONGLONG)]),
+    'full_rows_null_stock': ([{'t_shirt_id': 1, 'brand': 'Nike', 'color': 'Red', 'size': 'S', 'price': 20,
+                               'stock_quantity': None},
+                              {'t_shirt_id': 2, 'brand': 'Levi', 'color': 'Blue', 'size': 'M', 'price': 25,
+                               'stock_quantity': 8}],
+                             [('t_shirt_id', FIELD_TYPE.LONG), ('brand', FIELD_TYPE.STRING),
+                              ('color', FIELD_TYPE.STRING), ('size', FIELD_TYPE.STRING),
+                              ('price', FIELD_TYPE.LONG), ('stock_quantity', FIELD_TYPE.LONG)]),
+}
+
+
+RESULTS = [pytest.param(*make_results(shape, count), id=f'{shape}-{count}') for shape in SHAPES for count in COUNTS]
+RESULTS += [pytest.param(rows, columns, id=name) for name, (rows, columns) in EDGE_CASES.items()]
+
+
+@pytest.fixture(params=[1000, 7], ids=['chunk1000', 'chunk7'])
+def chunk_lines(request, monkeypatch):
+    monkeypatch.setattr(result_format, 'STREAM_CHUNK_LINES', request.param)
+    return request.param
+
+
+@pytest.mark.parametrize('rows, columns', RESULTS)
+@pytest.mark.parametrize('typed', [True, False], ids=['description', 'values'])
+def test_chain_answer_matches_row_by_row(rows, columns, typed, chunk_lines):
+    columns = columns if typed else None
+    expected = legacy_format_chain_answer(rows)
+    assert format_chain_answer(rows, columns) == expected
+    assert ''.join(chain_answer_chunks(rows, columns)) == expected
+
+
+@pytest.mark.parametrize('rows, columns', RESULTS)
+def test_nl_answer_matches_row_by_row(rows, columns):
+    expected = legacy_format_nl_answer(rows)
+    assert format_nl_answer(rows, columns) == expected
+    assert ''.join(nl_answer_chunks(rows, columns)) == expected
+
+
+def test_long_results_stream_in_chunks(monkeypatch):
+    monkeypatch.setattr(result_format, 'STREAM_CHUNK_LINES', 10)
+    rows, columns = make_results('size_stock', 95)
+    chunks = list(chain_answer_chunks(rows, columns))
+    assert len(chunks) == 10 + 1      # 95 lines in tens, then the total
+    assert chunks[-1].startswith('\n\n**Total Stock: ')
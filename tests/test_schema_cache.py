@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+
+import pytest
+
+import schema_cache
+from schema_cache import COLUMNS_CHECKSUM_SQL, COLUMNS_SQL, FINGERPRINT_SQL, SchemaCache
+
+
+class FakeDatabase:
+    """Answers the schema cache's information_schema queries from attributes"""
+
+    def __init__(self):
+        self.tables = [('t_shirts', 'c1', 'u1'), ('discounts', 'c1', 'u1')]
+        self.checksum = (8, 12345)
+        self.columns = [('t_shirts', 'brand', 'varchar(32)', '', ''),
+                        ('discounts', 'pct_discount', 'decimal(5,2)', '', '')]
+        self.queries = []
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params=None):
+        self.queries.append(sql)
+        self._rows = {
+            FINGERPRINT_SQL: self.tables,
+            COLUMNS_CHECKSUM_SQL: [self.checksum],
+            COLUMNS_SQL: self.columns,
+        }.get(sql, [])
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(schema_cache, 'get_pool', lambda config: database)
+    return database
+
+
+@pytest.fixture
+def cache(db):
+    return SchemaCache({'database': 'atliq_tshirts'}, ttl=3600, poll_interval=3600)
+
+
+def test_data_writes_keep_derived_state(db, cache):
+    builds = []
+    cache.derived('index', lambda: builds.append(1) or 'index-v1')
+    assert cache.table_versions()['t_shirts'] == ('c1', 'u1')
+
+    db.tables = [('t_shirts', 'c1', 'u2'), ('discounts', 'c1', 'u1')]
+    cache._check_for_changes()
+
+    assert cache.table_versions()['t_shirts'] == ('c1', 'u2')
+    assert cache.derived('index', lambda: builds.append(1) or 'index-v2') == 'index-v1'
+    assert builds == [1]
+    assert cache.stats()['invalidations'] == 0
+
+
+@pytest.mark.parametrize('change', ['column', 'recreate'])
+def test_ddl_changes_drop_derived_state(db, cache, change):
+    cache.derived('index', lambda: 'index-v1')
+    if change == 'column':
+        db.checksum = (9, 999)
+        db.columns = db.columns + [('t_shirts', 'material', 'varchar(32)', '', '')]
+    else:
+        db.tables = [('t_shirts', 'c2', None), ('discounts', 'c1', 'u1')]
+    cache._check_for_changes()
+
+    assert cache.stats()['invalidations'] == 1
+    assert cache.derived('index', lambda: 'index-v2') == 'index-v2'
+    if change == 'column':
+        assert [name for name, _ in cache.columns('t_shirts')] == ['brand', 'material']
+    else:
+        assert cache.table_versions()['t_shirts'] == ('c2', None)
+
+
+def test_table_info_survives_data_writes(db, cache):
+    renders = []
+    assert cache.table_info(lambda: renders.append(1) or 'CREATE TABLE t_shirts') == 'CREATE TABLE t_shirts'
+    db.tables = [('t_shirts', 'c1', 'u9'), ('discounts', 'c1', 'u1')]
+    cache._check_for_changes()
+    cache.table_info(lambda: renders.append(1) or 'rendered again')
+    assert renders == [1]
+
+
+def test_table_versions_max_age_rereads_versions(db, cache):
+    assert cache.table_versions(max_age=60)['t_shirts'] == ('c1', 'u1')
+    db.tables = [('t_shirts', 'c1', 'u2'), ('discounts', 'c1', 'u1')]
+
+    # Within max_age (and the poll interval) the cached versions are used
+    assert cache.table_versions(max_age=60)['t_shirts'] == ('c1', 'u1')
+    assert cache.table_versions()['t_shirts'] == ('c1', 'u1')
+
+    cache._versions_at -= 61
+    queries = len(db.queries)
+    assert cache.table_versions(max_age=60)['t_shirts'] == ('c1', 'u2')
+    assert db.queries[queries:] == [FINGERPRINT_SQL]
+    assert cache.stats()['invalidations'] == 0
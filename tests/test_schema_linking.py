@@ -0,0 +1,119 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from nl_pipeline import QueryContext, SchemaLinkStage
+from schema_linking import SchemaLinker
+
+DIMENSION = 1024
+COLUMNS = {
+    't_shirts': [('t_shirt_id', 'int', 'PRI', ''), ('brand', 'varchar(32)', '', ''), ('color', 'varchar(16)', '', ''),
+                 ('size', 'varchar(4)', '', ''), ('price', 'int', '', ''), ('stock_quantity', 'int', '', '')],
+    'discounts': [('discount_id', 'int', 'PRI', ''), ('t_shirt_id', 'int', 'MUL', ''),
+                  ('pct_discount', 'decimal(5,2)', '', '')],
+    'orders': [('order_id', 'int', 'PRI', ''), ('customer_id', 'int', 'MUL', ''), ('placed_at', 'datetime', '', '')],
+}
+for filler in ('customer', 'invoice', 'payment', 'shipment', 'supplier', 'warehouse', 'employee', 'campaign'):
+    COLUMNS[filler] = [(f'{filler}_id', 'int', 'PRI', ''), ('name', 'varchar(64)', '', ''),
+                       ('created_at', 'datetime', '', '')]
+DETAILS = {
+    'tables': {table: '' for table in COLUMNS},
+    'columns': COLUMNS,
+    'foreign_keys': [('discounts', 't_shirt_id', 't_shirts', 't_shirt_id'),
+                     ('orders', 'customer_id', 'customer', 'customer_id')],
+}
+
+
+class HashedWords:
+    """Deterministic embeddings stand-in: unit bag of hashed words"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        vectors = np.zeros((len(texts), DIMENSION), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode('utf-8')).hexdigest(), 16) % DIMENSION] += 1
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class StaticSchemaCache:
+    """The parts of SchemaCache a SchemaLinker uses, over fixed metadata"""
+
+    def __init__(self, details):
+        self._details = details
+        self._derived = {}
+
+    def tables(self):
+        return list(self._details['tables'])
+
+    def details(self):
+        return self._details
+
+    def derived(self, key, build):
+        if key not in self._derived:
+            self._derived[key] = build()
+        return self._derived[key]
+
+
+@pytest.fixture
+def embeddings():
+    return HashedWords()
+
+
+def make_linker(embeddings, top_k=1, min_tables=0, min_score=0.3, **kwargs):
+    return SchemaLinker(StaticSchemaCache(DETAILS), embeddings, 'test', top_k=top_k, min_tables=min_tables,
+                        min_score=min_score, **kwargs)
+
+
+def test_links_the_tables_a_question_is_about(embeddings):
+    linked = make_linker(embeddings).link("stock quantity and price of t shirts by brand")
+    assert linked.tables == ['t_shirts']
+    assert linked.text == ('t_shirts(t_shirt_id int PK, brand varchar(32), color varchar(16), size varchar(4), '
+                           'price int, stock_quantity int)')
+    assert linked.stats() == {'tables': ['t_shirts'], 'tokens': linked.tokens, 'full_tokens': linked.full_tokens}
+    assert linked.tokens < linked.full_tokens / 5
+
+    # A picked table that is also referenced is listed once
+    assert make_linker(embeddings, top_k=2).link("orders placed at customer").tables == ['orders', 'customer']
+
+
+def test_adds_the_tables_foreign_keys_reference(embeddings):
+    linked = make_linker(embeddings).link("average pct discount of discounts")
+    assert linked.tables == ['discounts', 't_shirts']
+    assert 'discounts(discount_id int PK, t_shirt_id int -> t_shirts.t_shirt_id, pct_discount decimal(5,2))' \
+        in linked.text
+    assert '\nt_shirts(t_shirt_id int PK, ' in linked.text
+
+    # Every picked table's references, not only the best one's
+    linked = make_linker(embeddings, top_k=2).link("stock quantity of t shirts by brand")
+    assert linked.tables == ['t_shirts', 'orders', 'customer']
+
+
+def test_low_confidence_sends_the_whole_schema(embeddings):
+    linker = make_linker(embeddings)
+    confident, unsure = linker.link_many(["stock quantity of t shirts by brand", "quarterly revenue forecast"])
+    assert confident.tables == ['t_shirts']
+    assert unsure is None
+
+    stage = SchemaLinkStage(linker, lambda ctx: 'FULL SCHEMA')
+    contexts = [QueryContext("stock quantity of t shirts by brand"), QueryContext("quarterly revenue forecast")]
+    stage.run_batch(contexts)
+    assert contexts[0].schema.startswith('t_shirts(')
+    assert contexts[0].schema_link['tables'] == ['t_shirts']
+    assert (contexts[1].schema, contexts[1].schema_link) == ('FULL SCHEMA', None)
+
+
+def test_small_schemas_are_not_linked(embeddings):
+    linker = make_linker(embeddings, min_tables=len(COLUMNS))
+    assert linker.link_many(["stock quantity of t shirts", "pct discount"]) == [None, None]
+    assert embeddings.calls == 0
+
+
+def test_wide_tables_keep_keys_and_the_closest_columns(embeddings):
+    linked = make_linker(embeddings, max_columns=2).link("stock quantity of t shirts")
+    assert linked.text == 't_shirts(t_shirt_id int PK, stock_quantity int)'
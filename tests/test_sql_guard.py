@@ -0,0 +1,231 @@
+import pytest
+
+import sql_guard
+from sql_guard import QueryRejected, check_statement, guard, limit_bounds_work, rewrite, scan
+
+DB_CONFIG = {'host': 'localhost', 'port': 3306, 'database': 't_shirts'}
+
+
+def plan(rows, access_type='ALL', cost=None):
+    """Minimal EXPLAIN FORMAT=JSON output for one table"""
+    block = {'table': {'table_name': 't_shirts', 'access_type': access_type,
+                       'rows_examined_per_scan': rows, 'rows_produced_per_join': rows}}
+    if cost is not None:
+        block['cost_info'] = {'query_cost': str(cost)}
+    return {'query_block': block}
+
+
+@pytest.fixture
+def explained(monkeypatch):
+    """Stubs EXPLAIN with a plan examining `rows` rows, and clears the decision cache"""
+    state = {'plan': plan(10), 'calls': 0}
+
+    def explain(db_config, sql):
+        state['calls'] += 1
+        return state['plan']
+
+    monkeypatch.setattr(sql_guard, 'explain', explain)
+    monkeypatch.setattr(sql_guard, 'SQL_GUARD_MODE', 'enforce')
+    monkeypatch.setattr(sql_guard, 'MAX_ESTIMATED_ROWS', 1000)
+    monkeypatch.setattr(sql_guard, 'MAX_QUERY_COST', 0)
+    sql_guard._decisions.clear()
+    yield state
+    sql_guard._decisions.clear()
+
+
+# ============================================================================
+# STATEMENT CHECKS
+# ============================================================================
+
+@pytest.mark.parametrize('sql', [
+    "SELECT * FROM t_shirts",
+    "select brand, count(*) from t_shirts group by brand;",
+    "WITH s AS (SELECT * FROM t_shirts) SELECT * FROM s",
+    "SELECT * FROM t_shirts WHERE brand = 'x; DROP TABLE t_shirts'",
+    "SELECT * FROM t_shirts WHERE brand = ')'",
+    "SELECT * FROM t_shirts -- ; DELETE FROM t_shirts",
+    "SELECT (SELECT MAX(price) FROM t_shirts) AS top",
+])
+def test_check_statement_accepts_single_select(sql):
+    check_statement(sql)
+
+
+@pytest.mark.parametrize('sql, message', [
+    ("DELETE FROM t_shirts", 'Only SELECT'),
+    ("SELECT 1; DELETE FROM t_shirts", 'one SQL statement'),
+    ("WITH s AS (SELECT 1) DELETE FROM t_shirts", 'Only SELECT'),
+    ("SELECT * FROM t_shirts INTO OUTFILE '/tmp/x'", 'INTO'),
+    ("SELECT * FROM t_shirts FOR UPDATE", 'Locking'),
+    ("SELECT * FROM t_shirts LOCK IN SHARE MODE", 'Locking'),
+    ("", 'Only SELECT'),
+])
+def test_check_statement_rejects(sql, message):
+    with pytest.raises(ValueError, match=message):
+        check_statement(sql)
+
+
+@pytest.mark.parametrize('sql', [
+    # A stray ")" used to push the depth negative and hide everything after it
+    "SELECT 1) ; DELETE FROM t_shirts",
+    "SELECT * FROM t_shirts WHERE (price > 10)) INTO OUTFILE '/tmp/x'",
+    "SELECT * FROM t_shirts WHERE (price > 10",
+])
+def test_check_statement_rejects_unbalanced_parentheses(sql):
+    with pytest.raises(ValueError, match='Unbalanced parentheses'):
+        check_statement(sql)
+
+
+def test_scan_skips_nested_words_and_literals():
+    words, semicolons = scan("SELECT (SELECT x FROM y) FROM t WHERE a = 'LIMIT;'")
+    assert [w for w, _, _ in words] == ['SELECT', 'FROM', 'T', 'WHERE', 'A']
+    assert semicolons == []
+
+
+# ============================================================================
+# REWRITES
+# ============================================================================
+
+def test_rewrite_adds_limit_and_hint():
+    sql, rewrites, _ = rewrite("SELECT * FROM t_shirts;", limit=50, max_execution_ms=2000)
+    assert sql == "SELECT /*+ MAX_EXECUTION_TIME(2000) */ * FROM t_shirts\nLIMIT 50"
+    assert rewrites == ['limit 50', 'max_execution_time 2000ms']
+
+
+def test_rewrite_keeps_existing_limit_and_hint():
+    original = "SELECT /*+ MAX_EXECUTION_TIME(5) */ * FROM t_shirts LIMIT 3"
+    sql, rewrites, _ = rewrite(original, limit=50, max_execution_ms=2000)
+    assert sql == original
+    assert rewrites == []
+
+
+def test_rewrite_puts_hint_on_main_select_of_cte():
+    sql, _, _ = rewrite("WITH s AS (SELECT 1 AS a) SELECT a FROM s", max_execution_ms=100)
+    assert sql == "WITH s AS (SELECT 1 AS a) SELECT /*+ MAX_EXECUTION_TIME(100) */ a FROM s"
+
+
+@pytest.mark.parametrize('sql, bounded', [
+    ("SELECT * FROM t_shirts LIMIT 10", True),
+    ("SELECT * FROM t_shirts", False),
+    ("SELECT * FROM t_shirts WHERE color = 'Red' LIMIT 10", False),
+    ("SELECT * FROM t_shirts ORDER BY price LIMIT 10", False),
+    ("SELECT DISTINCT brand FROM t_shirts LIMIT 10", False),
+    ("SELECT COUNT(*) FROM t_shirts LIMIT 10", False),
+    ("SELECT brand FROM t_shirts GROUP BY brand LIMIT 10", False),
+    ("SELECT * FROM t_shirts WHERE id IN (SELECT 1) LIMIT 10", False),
+])
+def test_limit_bounds_work(sql, bounded):
+    _, _, words = rewrite(sql)
+    assert limit_bounds_work(words) is bounded
+
+
+def test_limit_bounds_work_when_appended():
+    _, _, words = rewrite("SELECT * FROM t_shirts")
+    assert limit_bounds_work(words, limited=True)
+
+
+# ============================================================================
+# DECISIONS
+# ============================================================================
+
+def test_guard_allows_under_budget(explained):
+    sql, decision = guard(DB_CONFIG, "SELECT * FROM t_shirts", limit=100, max_execution_ms=1000)
+    assert decision['action'] == 'rewrite'
+    assert decision['estimated_rows'] == 10
+    assert decision['full_scans'] == ['t_shirts']
+    assert 'LIMIT 100' in sql and 'MAX_EXECUTION_TIME(1000)' in sql
+
+
+def test_guard_rejects_filtered_scan_over_budget(explained):
+    explained['plan'] = plan(5000)
+    with pytest.raises(QueryRejected) as e:
+        guard(DB_CONFIG, "SELECT * FROM t_shirts WHERE color = 'Red'", limit=100)
+    assert e.value.status == 422
+    assert e.value.decision['action'] == 'reject'
+    assert '5,000 rows' in e.value.decision['reason']
+
+
+def test_guard_lets_limit_bound_a_plain_scan(explained):
+    explained['plan'] = plan(5000)
+    _, decision = guard(DB_CONFIG, "SELECT * FROM t_shirts", limit=100)
+    assert decision['bounded_by_limit'] is True
+    assert decision['action'] == 'rewrite'
+
+
+def test_guard_rejects_over_cost_budget(explained, monkeypatch):
+    monkeypatch.setattr(sql_guard, 'MAX_QUERY_COST', 100)
+    explained['plan'] = plan(10, cost=250)
+    with pytest.raises(QueryRejected, match='estimated cost 250'):
+        guard(DB_CONFIG, "SELECT brand FROM t_shirts GROUP BY brand")
+
+
+def test_guard_report_mode_never_rejects(explained, monkeypatch):
+    monkeypatch.setattr(sql_guard, 'SQL_GUARD_MODE', 'report')
+    explained['plan'] = plan(5000)
+    _, decision = guard(DB_CONFIG, "SELECT * FROM t_shirts ORDER BY price")
+    assert decision['would_reject'] is True
+
+
+def test_guard_rejects_writes_with_403(explained):
+    with pytest.raises(QueryRejected) as e:
+        guard(DB_CONFIG, "DROP TABLE t_shirts")
+    assert e.value.status == 403
+    assert explained['calls'] == 0
+
+
+
+@pytest.mark.parametrize('sql', [
+    # MySQL executes the contents of /*! ... */, so they would hide INTO, FOR
+    # UPDATE or a WHERE (which decides whether a LIMIT bounds the scan)
+    "SELECT * FROM t_shirts /*! INTO OUTFILE '/tmp/x' */",
+    "SELECT * FROM t_shirts /*!80000 FOR UPDATE */",
+    "SELECT * FROM t /*! WHERE a=1 */",
+    # "--" without whitespace after it is two minus signs, not a comment
+    "SELECT 1--1 INTO OUTFILE '/tmp/x'",
+])
+def test_guard_rejects_hidden_clauses(explained, sql):
+    with pytest.raises(QueryRejected) as e:
+        guard(DB_CONFIG, sql, limit=10)
+    assert e.value.status == 403
+    assert explained['calls'] == 0
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT 1 -- trailing comment",
+    "SELECT 1 --",
+    "SELECT 1 --\tcomment",
+    "SELECT /*+ MAX_EXECUTION_TIME(100) */ 1",
+    "SELECT 1 /* plain comment */",
+])
+def test_check_statement_accepts_comments(sql):
+    check_statement(sql)
+
+def test_guard_caches_decisions(explained):
+    guard(DB_CONFIG, "SELECT * FROM t_shirts", limit=10)
+    _, decision = guard(DB_CONFIG, "SELECT * FROM t_shirts", limit=10)
+    assert decision['cached'] is True
+    assert explained['calls'] == 1
+
+    explained['plan'] = plan(5000)
+    for _ in range(2):
+        with pytest.raises(QueryRejected):
+            guard(DB_CONFIG, "SELECT * FROM t_shirts ORDER BY price")
+    assert explained['calls'] == 2
+
+
+def test_guard_keeps_limit_and_hint_without_estimate(explained, monkeypatch):
+    def explain(db_config, sql):
+        raise RuntimeError('EXPLAIN unavailable')
+
+    monkeypatch.setattr(sql_guard, 'explain', explain)
+    sql, decision = guard(DB_CONFIG, "SELECT * FROM t_shirts", limit=5, max_execution_ms=100)
+    assert decision['explain_error'] == 'EXPLAIN unavailable'
+    assert sql.endswith('LIMIT 5') and 'MAX_EXECUTION_TIME(100)' in sql
+
+
+def test_guard_off_still_sets_execution_time(explained, monkeypatch):
+    monkeypatch.setattr(sql_guard, 'SQL_GUARD_MODE', 'off')
+    explained['plan'] = plan(5000)
+    sql, decision = guard(DB_CONFIG, "SELECT * FROM t_shirts ORDER BY price;", limit=5, max_execution_ms=700)
+    assert sql == "SELECT /*+ MAX_EXECUTION_TIME(700) */ * FROM t_shirts ORDER BY price"
+    assert decision == {'action': 'off', 'rewrites': ['max_execution_time 700ms']}
+    assert explained['calls'] == 0
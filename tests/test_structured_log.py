@@ -0,0 +1,36 @@
+import threading
+import time
+
+import structured_log
+from structured_log import log_slow_query, logging_stats
+
+DB_CONFIG = {'host': 'localhost', 'database': 'atliq_tshirts'}
+
+
+def test_slow_query_explains_are_bounded(monkeypatch):
+    release = threading.Event()
+    explained = []
+
+    def explain(db_config, sql):
+        release.wait(5)
+        explained.append(sql)
+        return {'query_block': {}}
+
+    monkeypatch.setattr(structured_log, '_explain', explain)
+    monkeypatch.setattr(structured_log, 'SLOW_QUERY_MS', 100)
+    monkeypatch.setattr(structured_log, 'SLOW_QUERY_EXPLAIN', True)
+    monkeypatch.setattr(structured_log, 'SLOW_QUERY_EXPLAIN_BACKLOG', 2)
+    skipped = logging_stats()['slow_query_explains_skipped']
+
+    assert not log_slow_query(DB_CONFIG, "SELECT 1", 0.05)
+    for i in range(5):
+        assert log_slow_query(DB_CONFIG, f"SELECT {i}", 2.0)
+    assert logging_stats()['slow_query_explains_pending'] == 2
+    assert logging_stats()['slow_query_explains_skipped'] == skipped + 3
+
+    release.set()
+    deadline = time.time() + 5
+    while logging_stats()['slow_query_explains_pending'] and time.time() < deadline:
+        time.sleep(0.01)
+    assert explained == ["SELECT 0", "SELECT 1"]
+    assert logging_stats()['slow_query_explains_pending'] == 0